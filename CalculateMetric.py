@@ -1,87 +1,65 @@
 import pandas as pd
 import os
+from MetricsAggregator import MetricsAggregator
+
+
+def metrics_file_name(landscape=None, input_file=None):
+    """
+    Name of the metrics CSV file of a run.
+
+    Args:
+        landscape (str or None): 'lunar' or 'mars'.
+        input_file (str or None): Input HDF5 file or catalog directory the metrics were computed on.
+
+    Returns:
+        str: e.g. 'lunar_metrics.csv', or 'train_lunar_metrics.csv' for the input file 'train.h5'.
+    """
+    parts = []
+    if input_file:
+        parts.append(os.path.splitext(os.path.basename(os.path.normpath(input_file)))[0])
+    if landscape:
+        parts.append(landscape)
+    return '_'.join(parts + ['metrics']) + '.csv'
+
 
 class Metrics:
     """
     Class to calculate and save performance metrics for seismic data onset predictions.
     """
-    def __init__(self, results, saved_dir):
+    def __init__(self, results, saved_dir, landscape=None, input_file=None, confidence_level=0.95):
         """
         Initialize the Metrics class.
 
         Args:
-            results (pandas.DataFrame): DataFrame containing onset predictions, ground truth, and audio durations.
+            results (pandas.DataFrame, iterable or MetricsAggregator): DataFrame containing onset predictions,
+                ground truth, and audio durations, an iterable of such DataFrames (e.g. chunks of a results file),
+                or an aggregator that already consumed them.
             saved_dir (str): Directory where the metrics will be saved as a CSV file.
+            landscape (str or None): Landscape of the results, used in the name of the CSV file.
+            input_file (str or None): Input file of the results, used in the name of the CSV file.
+            confidence_level (float): Level of the bootstrap confidence intervals saved with the metrics.
         """
-        self.results = results
+        if isinstance(results, MetricsAggregator):
+            self.aggregator = results
+        else:
+            self.aggregator = MetricsAggregator()
+            for chunk in [results] if isinstance(results, pd.DataFrame) else results:
+                self.aggregator.update(chunk)
         self.saved_dir = saved_dir
+        self.file_name = metrics_file_name(landscape, input_file)
+        self.confidence_level = confidence_level
 
-    def _calculate_median_send_signal_percentage_predicted(self):
+    def compute_metrics(self):
         """
-        Calculate the median send signal percentage based on predicted onset times.
+        Calculate all metrics without printing or saving them.
 
         Args:
             None
 
         Returns:
-            float: The median send signal percentage for predicted onset times.
-        """
-        self.results['median_send_signal_persantage_predicted'] = 100 - (
-                    (self.results['onset_time_predicted'] / self.results['audio_duration']) * 100)
-        return self.results['median_send_signal_persantage_predicted'].median()
-
-    def _calculate_median_send_signal_percentage_truth(self):
+            dict: The calculated metrics, keyed by the column names of the metrics CSV file.
         """
-        Calculate the median send signal percentage based on ground truth onset times.
-
-        Args:
-            None
-
-        Returns:
-            float: The median send signal percentage for ground truth onset times.
-        """
-        self.results['mean_send_signal_persantage_truth'] = 100 - (
-                (self.results['onset_time_ground_truth'] / self.results['audio_duration']) * 100)
-        return self.results['mean_send_signal_persantage_truth'].median()
-
-    def _calculate_median_percentage_difference(self, median_predicted, median_truth):
-        """
-        Calculate the difference between the median percentages of predicted and ground truth onset times.
-
-        Args:
-            median_predicted (float): Median send signal percentage for predicted onset times.
-            median_truth (float): Median send signal percentage for ground truth onset times.
-
-        Returns:
-            float: The difference between the truth and predicted median send signal percentages.
-        """
-        return median_truth - median_predicted
-
-    def _calculate_median_time_deviation_predicted(self):
-        """
-        Calculate the median time deviation between predicted and ground truth onset times.
-
-        Args:
-            None
-
-        Returns:
-            float: The median time deviation between predicted and ground truth onset times.
-        """
-        self.results['onset_time_deviation'] = abs(self.results['onset_time_ground_truth'] - self.results['onset_time_predicted'])
-        median_deviation = self.results['onset_time_deviation'].median()
-        return median_deviation
-
-    def _calculate_median_signal_reduction(self, median_predicted):
-        """
-        Calculate the median reduction of send signal based on predicted onset times.
-
-        Args:
-            median_predicted (float): Median send signal percentage for predicted onset times.
-
-        Returns:
-            float: The median reduction in send signal for predicted onset times.
-        """
-        return 100 - median_predicted
+        return self.aggregator.compute_metrics()
 
     def calculate_metrics(self):
         """
@@ -91,6 +69,7 @@ class Metrics:
             - Median percentage difference.
             - Median reduction of send signal.
 
+        Each metric gets bootstrap confidence bounds (`<metric>_ci_low` and `<metric>_ci_high` columns).
         The metrics are saved as a CSV file in the specified directory.
 
         Args:
@@ -99,27 +78,14 @@ class Metrics:
         Returns:
             pandas.DataFrame: A DataFrame containing the calculated metrics.
         """
-        # Calculate median deviation
-        median_deviation = self._calculate_median_time_deviation_predicted()
-
-        # Calculate median send signal percentages for both predicted and ground truth
-        median_predicted = self._calculate_median_send_signal_percentage_predicted()
-        median_truth = self._calculate_median_send_signal_percentage_truth()
-
-        # Calculate the difference between predicted and ground truth median percentages
-        median_difference = self._calculate_median_percentage_difference(median_predicted, median_truth)
-
-        # Calculate the median reduction in send signal for predicted onset times
-        median_signal_reduction = self._calculate_median_signal_reduction(median_predicted)
-
         # Prepare metrics dictionary
-        metrics = {
-            'median_send_signal_percentage_predicted': median_predicted,
-            'median_send_signal_percentage_truth': median_truth,
-            'median_percentage_difference': median_difference,
-            'median_time_deviation': median_deviation,
-            'median_signal_reduction': median_signal_reduction
-        }
+        metrics = self.compute_metrics()
+        intervals = self.aggregator.confidence_intervals(self.confidence_level)
+        median_deviation = metrics['median_time_deviation']
+        median_predicted = metrics['median_send_signal_percentage_predicted']
+        median_truth = metrics['median_send_signal_percentage_truth']
+        median_difference = metrics['median_percentage_difference']
+        median_signal_reduction = metrics['median_signal_reduction']
 
         # Output to console for verification
         print(f"Median deviation: {median_deviation} sec.")
@@ -127,8 +93,14 @@ class Metrics:
         print(f"Median send signal percentage (Truth): {median_truth} %")
         print(f"Median percentage difference: {median_difference} %")
         print(f"Median signal reduction: {median_signal_reduction} %")
+        print(f"{self.confidence_level:.0%} bootstrap confidence intervals over {self.aggregator.num_events} events:")
+        for name, (low, high) in intervals.items():
+            print(f"  {name}: [{low:.2f}, {high:.2f}]")
 
         # Saving the metrics to a CSV file
+        for name, (low, high) in intervals.items():
+            metrics[f'{name}_ci_low'] = low
+            metrics[f'{name}_ci_high'] = high
         metrics_df = pd.DataFrame([metrics])
-        metrics_df.to_csv(os.path.join(self.saved_dir, 'mars_metrics.csv'), index=False)
+        metrics_df.to_csv(os.path.join(self.saved_dir, self.file_name), index=False)
         return metrics_df
@@ -0,0 +1,142 @@
+import pandas as pd
+from RaggedCatalog import RaggedCatalog
+
+# Keys used by the dataset_creation scripts, in order of preference
+HDF_KEYS = ['catalog_data', 'mars_training', 'processed_data']
+
+
+class CatalogIterator:
+    """
+    Event-at-a-time reader of an HDF5 catalog written by the dataset_creation scripts.
+
+    The scripts write pandas' fixed format, which pickles all trace arrays into one blob (the
+    table format cannot store arrays at all) and cannot be read by row range. The whole file is
+    therefore loaded before the first event is yielded, so peak memory and the time to the first
+    event grow with the catalog as when reading it with pandas.read_hdf; only the traces already
+    yielded are released as the catalog is processed. Converting the file with RaggedCatalog.py
+    gives constant memory from the first event on.
+    """
+
+    def __init__(self, path, key=None, batch_size=64):
+        """
+        Initialize the CatalogIterator class.
+
+        Args:
+            path (str): Path to the input HDF5 file (*.h5).
+            key (str or None): Key of the data, None to pick the first of HDF_KEYS present in the file.
+            batch_size (int): Number of events in each batch yielded by batches().
+        """
+        self.path = path
+        self.batch_size = batch_size
+        with pd.HDFStore(path, mode='r') as store:
+            keys = [k.lstrip('/') for k in store.keys()]
+            if key is None:
+                key = next((k for k in HDF_KEYS if k in keys), keys[0] if len(keys) == 1 else None)
+            if key not in keys:
+                raise ValueError(f"No catalog key found in {path}, expected one of {HDF_KEYS}.")
+        self.key = key
+
+    def __len__(self):
+        # Tables record their row count and the fixed format stores the index as its own array,
+        # both read without the traces
+        with pd.HDFStore(self.path, mode='r') as store:
+            storer = store.get_storer(self.key)
+            if storer.is_table:
+                return storer.nrows
+            node = store.get_node(self.key)
+            for index_name in ('axis1', 'index'):
+                if index_name in node._v_children:
+                    return len(node._v_children[index_name])
+        return len(pd.read_hdf(self.path, key=self.key))
+
+    def batches(self):
+        """
+        Iterate over the catalog in small batches.
+
+        Yields:
+            pandas.DataFrame: Consecutive rows of the catalog, at most batch_size of them.
+        """
+        batch = []
+        for index, row in self.iterrows():
+            batch.append(pd.Series(row, name=index))
+            if len(batch) == self.batch_size:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
+
+    def iterrows(self, start=0, stop=None):
+        """
+        Iterate over the events like pandas.DataFrame.iterrows.
+
+        Args:
+            start (int): Position of the first event.
+            stop (int or None): Position to stop at (default is the end of the catalog).
+
+        Yields:
+            tuple: Catalog index and row of each event.
+        """
+        # The fixed format is read whole; the columns of the selected events are then taken out of
+        # the frame so that each trace is only referenced by its list entry, and the traces of the
+        # other events are released at once
+        data = pd.read_hdf(self.path, key=self.key).iloc[start:stop]
+        index = data.index
+        columns = {column: data[column].tolist() for column in data.columns}
+        del data
+
+        for i in range(len(index)):
+            yield index[i], {column: values[i] for column, values in columns.items()}
+            for values in columns.values():
+                values[i] = None
+
+
+class CatalogSlice:
+    """
+    Consecutive events of a catalog, selected by position, e.g. one shard of a sharded run.
+    """
+
+    def __init__(self, catalog, start=0, stop=None):
+        """
+        Initialize the CatalogSlice class.
+
+        Args:
+            catalog (RaggedCatalog or CatalogIterator): Catalog to slice.
+            start (int): Position of the first event.
+            stop (int or None): Position to stop at (default is the end of the catalog).
+        """
+        self.catalog = catalog
+        self.start, self.stop, _ = slice(start, stop).indices(len(catalog))
+
+    def __len__(self):
+        return max(0, self.stop - self.start)
+
+    def iterrows(self):
+        """
+        Iterate over the events of the slice like pandas.DataFrame.iterrows.
+
+        Yields:
+            tuple: Catalog index and row of each event.
+        """
+        return self.catalog.iterrows(self.start, self.stop)
+
+
+def open_catalog(path, key=None, batch_size=64):
+    """
+    Open a catalog for event-at-a-time iteration.
+
+    Ragged catalogs are memory-mapped and read one event at a time. HDF5 files are loaded whole
+    when iterated (see CatalogIterator), which is reported with a hint to convert them.
+
+    Args:
+        path (str): Path to an HDF5 file (*.h5) or a ragged catalog directory.
+        key (str or None): Key of the data in an HDF5 file, None to detect it.
+        batch_size (int): Number of events in each batch yielded by CatalogIterator.batches().
+
+    Returns:
+        RaggedCatalog or CatalogIterator: Catalog exposing iterrows().
+    """
+    if RaggedCatalog.is_catalog(path):
+        return RaggedCatalog(path)
+    print(f"{path} is an HDF5 file and is loaded whole before its first event; convert it once with "
+          f"RaggedCatalog.py to read it one event at a time in constant memory.")
+    return CatalogIterator(path, key=key, batch_size=batch_size)
@@ -0,0 +1,395 @@
+from SpectralFluxMethod import SpectralFlux, COMPUTE_DTYPES
+from FFTBackend import FFT_BACKENDS, available_backends
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from collections import deque
+import numpy as np
+import argparse
+import asyncio
+import json
+import time
+
+# Landscapes the service keeps a detector for
+LANDSCAPES = ['lunar', 'mars']
+
+# Largest accepted request body, in bytes
+MAX_BODY_BYTES = 256 * 1024 ** 2
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """
+    Invalid request, answered with an HTTP error status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """
+    Groups concurrent requests of the same shape into batches computed together.
+
+    The first request of a shape opens a batch. After `max_delay` seconds (by default at the next
+    turn of the event loop) the batch is due, and it runs as soon as the compute thread is free;
+    while that thread is busy, due batches keep taking requests, so an idle service answers at once
+    and batches grow with the load instead of queueing up. A batch holding
+    `max_batch_size` requests is closed and runs before the due ones. Batches are computed on a
+    single background thread, so the event loop keeps accepting requests while one runs.
+    """
+
+    def __init__(self, run_batch, max_batch_size=32, max_delay=0.0):
+        """
+        Initialize the MicroBatcher class.
+
+        Args:
+            run_batch (callable): Function called with a batch key and the list of request items,
+                returning one result per item; an exception returned as the result of an item fails
+                that request only.
+            max_batch_size (int): Largest number of requests in a batch.
+            max_delay (float): Seconds a request waits for others of the same shape.
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.num_batches = 0
+        self.num_requests = 0
+        self._open = {}  # batch key -> (items, futures, timer) of the batch taking requests
+        self._due = deque()  # keys of open batches whose delay has passed, oldest first
+        self._full = deque()  # (key, items, futures) of closed batches waiting for the compute thread
+        self._busy = False
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def submit(self, key, item):
+        """
+        Queue a request and wait for its result.
+
+        Args:
+            key (tuple): Batch key; only requests with equal keys are batched together.
+            item: Request data passed to run_batch.
+
+        Returns:
+            tuple: Result of the request, size of its batch and seconds spent computing the batch.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key not in self._open:
+            self._open[key] = ([], [], loop.call_later(self.max_delay, self._make_due, key))
+        items, futures, timer = self._open[key]
+        items.append(item)
+        futures.append(future)
+        if len(items) >= self.max_batch_size:
+            timer.cancel()
+            del self._open[key]
+            if key in self._due:
+                self._due.remove(key)
+            self._full.append((key, items, futures))
+            self._dispatch()
+        return await future
+
+    def _make_due(self, key):
+        if key in self._open and key not in self._due:
+            self._due.append(key)
+            self._dispatch()
+
+    def _dispatch(self):
+        # Start the next batch on the compute thread, if it is free
+        if self._busy:
+            return
+        if self._full:
+            key, items, futures = self._full.popleft()
+        elif self._due:
+            key = self._due.popleft()
+            items, futures, _ = self._open.pop(key)
+        else:
+            return
+        self._busy = True
+        self.num_batches += 1
+        self.num_requests += len(items)
+        task = asyncio.get_running_loop().run_in_executor(self._executor, self._timed_batch, key, items)
+        task.add_done_callback(lambda done: self._deliver(done, futures))
+
+    def _timed_batch(self, key, items):
+        start = time.perf_counter()
+        results = self.run_batch(key, items)
+        return results, time.perf_counter() - start
+
+    def _deliver(self, done, futures):
+        # Hand each request its result or error, or the error of the whole batch, and start the next batch
+        self._busy = False
+        if done.exception() is not None:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(done.exception())
+        else:
+            results, seconds = done.result()
+            for future, result in zip(futures, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result((result, len(futures), seconds))
+        self._dispatch()
+
+    def close(self):
+        """
+        Wait for the running batch and stop the compute thread.
+        """
+        self._executor.shutdown()
+
+
+class DetectionService:
+    """
+    Local HTTP service answering onset detection requests from a long-running process.
+
+    One detector per landscape lives for the whole process, so filter designs, flux engines and
+    FFT plans are created by the first request of each shape and reused by all later ones.
+
+    Endpoints:
+        POST /detect?fs=<Hz>&landscape=<lunar|mars>[&dtype=<float64|float32>]: the body holds the raw
+            little-endian samples of one trace in the given dtype (default float64). The response is
+            JSON with the onset time in seconds from the start of the trace (null if none was found),
+            the size of the batch the request was computed in, and its queueing and compute times in ms.
+        GET /health: JSON with the number of requests and batches served so far.
+    """
+
+    def __init__(self, dtype='float64', fft_backend='scipy', fft_workers=1, max_batch_size=32, max_delay=0.0):
+        """
+        Initialize the DetectionService class.
+
+        Args:
+            dtype (str): Precision of the detection, 'float64' or 'float32'.
+            fft_backend (str): FFT implementation, see SpectralFlux.
+            fft_workers (int): Number of threads of each batch of FFTs.
+            max_batch_size (int): Largest number of requests computed together.
+            max_delay (float): Seconds a request waits for others of the same shape.
+        """
+        self.detectors = {landscape: SpectralFlux(None, None, landscape, dtype=dtype, fft_backend=fft_backend,
+                                                  fft_workers=fft_workers)
+                          for landscape in LANDSCAPES}
+        self.batcher = MicroBatcher(self._run_batch, max_batch_size, max_delay)
+        self.started = time.time()
+
+    def _run_batch(self, key, traces):
+        """
+        Detect the onsets of a batch of requests of the same shape.
+
+        Args:
+            key (tuple): Landscape, sampling frequency and number of samples of the traces.
+            traces (list): Samples of each request.
+
+        If the batch cannot be computed together, each trace is detected on its own, so that a
+        request never fails because of the samples of another one.
+
+        Returns:
+            list: Onset time in seconds or None for each request, or the error raised by its trace.
+        """
+        landscape, fs, _ = key
+        detector = self.detectors[landscape]
+        try:
+            onsets = detector.detect_onsets(np.stack(traces), fs)
+        except Exception:
+            onsets = []
+            for trace in traces:
+                try:
+                    onsets.append(detector.detect_onset(trace, fs))
+                except Exception as e:
+                    onsets.append(e)
+        return [onset if onset is None or isinstance(onset, Exception) else float(onset) for onset in onsets]
+
+    async def detect(self, query, body):
+        """
+        Answer a detection request.
+
+        Args:
+            query (dict): Query parameters of the request.
+            body (bytes): Raw samples of the trace.
+
+        Returns:
+            dict: JSON response.
+
+        Raises:
+            RequestError: If the parameters or the samples are invalid.
+        """
+        landscape = query.get('landscape', [None])[0]
+        if landscape not in self.detectors:
+            raise RequestError(400, f"landscape must be one of {LANDSCAPES}.")
+        try:
+            fs = float(query['fs'][0])
+        except (KeyError, ValueError):
+            raise RequestError(400, "fs must be given as a number.")
+        if not np.isfinite(fs) or fs <= 0:
+            raise RequestError(400, "fs must be positive.")
+        dtype = query.get('dtype', ['float64'])[0]
+        if dtype not in COMPUTE_DTYPES:
+            raise RequestError(400, f"dtype must be one of {COMPUTE_DTYPES}.")
+        dtype = np.dtype(dtype).newbyteorder('<')
+        if len(body) == 0 or len(body) % dtype.itemsize != 0:
+            raise RequestError(400, f"The body must hold a whole, non-zero number of {dtype.name} samples.")
+
+        samples = np.frombuffer(body, dtype=dtype)
+        if len(samples) < 2:
+            raise RequestError(400, "A trace needs at least two samples.")
+        start = time.perf_counter()
+        try:
+            onset, batch_size, compute_time = await self.batcher.submit((landscape, fs, len(samples)), samples)
+        except ValueError as e:
+            raise RequestError(400, str(e))
+        total_time = time.perf_counter() - start
+        return {
+            'onset_time': onset,
+            'batch_size': batch_size,
+            'queue_ms': (total_time - compute_time) * 1e3,
+            'compute_ms': compute_time * 1e3
+        }
+
+    def health(self):
+        """
+        State of the service.
+
+        Returns:
+            dict: JSON response.
+        """
+        return {
+            'status': 'ok',
+            'uptime': time.time() - self.started,
+            'requests': self.batcher.num_requests,
+            'batches': self.batcher.num_batches
+        }
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve the HTTP/1.1 requests of one connection, keeping it open between requests.
+
+        Args:
+            reader (asyncio.StreamReader): Incoming stream.
+            writer (asyncio.StreamWriter): Outgoing stream.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': f"Bodies are limited to {MAX_BODY_BYTES} bytes."},
+                                        False)
+                    break
+                body = await reader.readexactly(length) if length > 0 else b''
+
+                status, response = await self._route(method, target, body)
+                await self._respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        # Dispatch a request to its endpoint, turning errors into JSON responses
+        url = urlsplit(target)
+        try:
+            if url.path == '/detect':
+                if method != 'POST':
+                    raise RequestError(405, "Use POST to send a trace.")
+                return 200, await self.detect(parse_qs(url.query), body)
+            if url.path == '/health':
+                return 200, self.health()
+            raise RequestError(404, f"Unknown path {url.path}.")
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': repr(e)}
+
+    @staticmethod
+    async def _respond(writer, status, response, keep_alive):
+        payload = json.dumps(response).encode()
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        """
+        Accept connections until the process is stopped.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving onset detection on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.batcher.close()
+
+
+def parse_args():
+    # Set up argument parser to get command-line arguments
+    parser = argparse.ArgumentParser(description="Serve onset detection over HTTP from a long-running process.")
+
+    # Arguments for the address to listen on
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on (default is 127.0.0.1).')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on (default is 8080).')
+
+    # Optional arguments to batch concurrent requests of the same shape
+    parser.add_argument(
+        '--max_batch_size',
+        type=int,
+        default=32,
+        help='Largest number of requests of the same shape computed together (default is 32).'
+    )
+    parser.add_argument(
+        '--max_delay_ms',
+        type=float,
+        default=0.0,
+        help='Milliseconds a request waits for others of the same shape even when the service is idle; requests '
+             'arriving while a batch is computed are always batched (default is 0).'
+    )
+
+    # Optional arguments for the precision and FFT implementation of the detection
+    parser.add_argument('--dtype', type=str, default='float64', choices=COMPUTE_DTYPES,
+                        help='Precision of the detection (default is float64).')
+    parser.add_argument('--fft_backend', type=str, default='scipy', choices=FFT_BACKENDS,
+                        help='FFT implementation of the spectral flux (default is scipy).')
+    parser.add_argument('--fft_workers', type=int, default=1,
+                        help='Number of threads of each batch of FFTs (default is 1).')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.fft_backend not in available_backends():
+        print(f"FFT backend {args.fft_backend} is not installed.")
+        return
+    service = DetectionService(args.dtype, args.fft_backend, args.fft_workers, args.max_batch_size,
+                               args.max_delay_ms / 1e3)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Service stopped.")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import numpy as np
+import scipy.fft
+
+# Implementations the real FFT of the spectral flux can run on
+FFT_BACKENDS = ['scipy', 'numpy', 'pyfftw']
+
+# Rows of the largest pyFFTW plan; longer batches are split into blocks of this many frames
+PLAN_ROWS = 4096
+
+
+def available_backends():
+    """
+    FFT backends that can be used in this environment.
+
+    Returns:
+        list: Names of the backends whose libraries are installed, in the order of FFT_BACKENDS.
+    """
+    backends = ['scipy', 'numpy']
+    try:
+        import pyfftw  # noqa: F401
+        backends.append('pyfftw')
+    except ImportError:
+        pass
+    return backends
+
+
+class FFTBackend:
+    """
+    Magnitude spectra of batches of real frames on a selectable FFT implementation.
+
+    'scipy' (scipy.fft) splits a batch over `workers` threads and caches its plans internally; 'numpy'
+    (numpy.fft) is single-threaded. 'pyfftw' plans each batch shape once with FFTW and keeps the plans,
+    so all events sharing a window size reuse them: batches are run in blocks of PLAN_ROWS frames, and
+    a shorter remainder in blocks of powers of two, which bounds the number of plans per window size.
+    With `pad`, frames are zero-padded to the next length with only small prime factors, which is
+    faster for awkward window sizes but changes the spectra, and therefore the flux, slightly.
+    """
+
+    def __init__(self, name='scipy', workers=1, pad=False, planner_effort='FFTW_MEASURE'):
+        """
+        Initialize the FFTBackend class.
+
+        Args:
+            name (str): Implementation to use, 'scipy', 'numpy' or 'pyfftw'.
+            workers (int): Number of threads computing a batch of frames ('scipy' and 'pyfftw').
+            pad (bool): Zero-pad the frames to a fast FFT length.
+            planner_effort (str): FFTW planner flag of the 'pyfftw' plans.
+
+        Raises:
+            ValueError: If the backend is unknown.
+            ImportError: If the 'pyfftw' backend is selected but pyFFTW is not installed.
+        """
+        if name not in FFT_BACKENDS:
+            raise ValueError(f"Unknown FFT backend: {name}")
+        if name == 'pyfftw':
+            import pyfftw.builders
+            self._builders = pyfftw.builders
+        self.name = name
+        self.workers = workers
+        self.pad = pad
+        self.planner_effort = planner_effort
+        self._plans = {}
+
+    def fft_size(self, window_size):
+        """
+        Length of the FFT of a frame.
+
+        Args:
+            window_size (int): Number of samples of a frame.
+
+        Returns:
+            int: The window size, or the next fast length at or above it when padding.
+        """
+        return scipy.fft.next_fast_len(window_size, real=True) if self.pad else window_size
+
+    def magnitude(self, frames, n=None):
+        """
+        Magnitude of the real FFT of each frame.
+
+        Args:
+            frames (numpy.ndarray): Frames along the last axis, e.g. of shape (num_frames, window_size).
+            n (int or None): Length of the FFT, frames being zero-padded to it (default is the window size).
+
+        Returns:
+            numpy.ndarray: Magnitude spectra with n // 2 + 1 bins along the last axis, float32 for float32
+                frames and float64 otherwise.
+        """
+        if self.name == 'scipy':
+            return np.abs(scipy.fft.rfft(frames, n=n, axis=-1, workers=self.workers))
+        if self.name == 'numpy':
+            return np.abs(np.fft.rfft(frames, n=n, axis=-1))
+
+        frames = np.asarray(frames)
+        if frames.dtype != np.float32:
+            frames = frames.astype(float, copy=False)
+        if frames.ndim != 2:
+            # Plans are made for 2-D blocks of frames
+            spectra = self.magnitude(frames.reshape(-1, frames.shape[-1]), n)
+            return spectra.reshape(frames.shape[:-1] + spectra.shape[-1:])
+        n = frames.shape[-1] if n is None else n
+        spectra = np.empty((len(frames), n // 2 + 1), dtype=frames.dtype)
+        start = 0
+        while start < len(frames):
+            rows = min(PLAN_ROWS, 1 << ((len(frames) - start).bit_length() - 1))
+            plan = self._plan(rows, frames.shape[-1], n, frames.dtype)
+            # The plan returns its own output array, reused by the next call
+            np.abs(plan(frames[start:start + rows]), out=spectra[start:start + rows])
+            start += rows
+        return spectra
+
+    def _plan(self, rows, window_size, n, dtype):
+        """
+        FFTW plan of the real FFT of a block of frames, created on first use.
+
+        Args:
+            rows (int): Number of frames of the block.
+            window_size (int): Number of samples of a frame.
+            n (int): Length of the FFT.
+            dtype (numpy.dtype): Precision of the frames.
+
+        Returns:
+            callable: Plan called with a block of frames, returning their complex spectra.
+        """
+        key = (rows, window_size, n, dtype)
+        if key not in self._plans:
+            self._plans[key] = self._builders.rfft(np.zeros((rows, window_size), dtype=dtype), n=n, axis=-1,
+                                                   threads=self.workers, planner_effort=self.planner_effort)
+        return self._plans[key]
@@ -1,6 +1,10 @@
-import pandas as pd
 from SpectralFluxMethod import SpectralFlux
-from CalculateMetric import Metrics
+from RaggedCatalog import RaggedCatalog
+from CatalogReader import open_catalog
+from Profiler import StageProfiler
+from ResultCache import ResultCache
+from ResultWriter import write_detections
+from FFTBackend import FFT_BACKENDS, available_backends
 import argparse
 import os
 
@@ -14,7 +18,7 @@ def parse_args():
         '--input_file',
         type=str,
         required=True,
-        help='Path to the input HDF5 file (*.h5)'
+        help='Path to the input HDF5 file (*.h5) or ragged catalog directory'
     )
 
     # Argument for the folder where the results will be saved
@@ -43,6 +47,138 @@ def parse_args():
         help='Specify whether you want to use this algorithm for prediction (train) or for testing against labeled data and measuring metrics (test).'
     )
 
+    # Optional argument to run events in a process pool
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of processes used to run events in parallel (default is 1, serial).'
+    )
+
+    # Optional argument to overlap reading and writing with the detection
+    parser.add_argument(
+        '--prefetch',
+        type=int,
+        default=0,
+        help='Number of events a reader thread loads ahead of the detection, results and images being written '
+             'by a writer thread (default is 0, reading, detection and writing in turn).'
+    )
+
+    # Optional argument to choose which events get images
+    parser.add_argument(
+        '--plots',
+        type=str,
+        default='all',
+        choices=['none', 'sample', 'all'],
+        help='Render images for no event, one event in ten (sample) or every event (default is all).'
+    )
+
+    # Optional argument to size the background render pool
+    parser.add_argument(
+        '--plot_workers',
+        type=int,
+        default=1,
+        help='Number of processes rendering images in the background (default is 1).'
+    )
+
+    # Optional arguments to profile the run
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time each stage and write a JSON report (profile.json) to the output folder.'
+    )
+    parser.add_argument(
+        '--profile_top',
+        type=int,
+        default=0,
+        help='With --profile, dump cProfile stats of the N slowest events to the profiles subfolder.'
+    )
+
+    # Optional argument to run the spectral flux at a reduced sampling rate
+    parser.add_argument(
+        '--decimate',
+        action='store_true',
+        help='Decimate filtered traces to just above twice the cutoff before computing the spectral flux.'
+    )
+
+    # Optional argument to restrict the spectral flux to STA/LTA candidate regions
+    parser.add_argument(
+        '--prescreen',
+        action='store_true',
+        help='Compute the spectral flux only around regions found by an STA/LTA pre-screen.'
+    )
+
+    # Optional argument to process long traces in overlapping blocks
+    parser.add_argument(
+        '--chunk_time',
+        type=float,
+        default=None,
+        help='Filter and compute the spectral flux of traces longer than this many seconds in overlapping '
+             'blocks of that length, keeping one block in memory at a time (default is whole traces).'
+    )
+
+    # Optional argument to run the detection in single precision
+    parser.add_argument(
+        '--dtype',
+        type=str,
+        default='float64',
+        choices=['float64', 'float32'],
+        help='Precision of the filtering, spectral flux and peak picking (default is float64).'
+    )
+
+    # Optional arguments to select and tune the FFT implementation of the spectral flux
+    parser.add_argument(
+        '--fft_backend',
+        type=str,
+        default='scipy',
+        choices=FFT_BACKENDS,
+        help='FFT implementation of the spectral flux (default is scipy; pyfftw requires pyFFTW).'
+    )
+    parser.add_argument(
+        '--fft_workers',
+        type=int,
+        default=1,
+        help='Number of threads of each batch of FFTs (scipy and pyfftw backends, default is 1).'
+    )
+    parser.add_argument(
+        '--fft_pad',
+        action='store_true',
+        help='Zero-pad the FFT frames to a fast length; faster for awkward window sizes, slightly changes the flux.'
+    )
+
+    # Optional arguments to stream the results and resume an interrupted run
+    parser.add_argument(
+        '--results_format',
+        type=str,
+        default='csv',
+        choices=['csv', 'parquet'],
+        help='Format of the per-event results (default is csv; parquet requires pyarrow).'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip the events completed by a previous run into the same output folder.'
+    )
+
+    # Optional arguments to configure the persistent result cache
+    parser.add_argument(
+        '--no_cache',
+        action='store_true',
+        help='Run detection on every event instead of serving unchanged events from the result cache.'
+    )
+    parser.add_argument(
+        '--cache_dir',
+        type=str,
+        default='.result_cache',
+        help='Directory of the result cache (default is .result_cache).'
+    )
+    parser.add_argument(
+        '--cache_max_mb',
+        type=float,
+        default=256,
+        help='Disk usage in MB above which the least recently used cache entries are evicted (default is 256).'
+    )
+
     return parser.parse_args()
 
 
@@ -51,45 +187,69 @@ def main():
     args = parse_args()
 
     # Check if the input file exists
-    if not os.path.isfile(args.input_file):
+    if not os.path.isfile(args.input_file) and not RaggedCatalog.is_catalog(args.input_file):
         print(f"Input file {args.input_file} does not exist.")
         return
 
+    # Blocks are padded for the filter only, so they cannot be decimated or pre-screened
+    if args.chunk_time is not None and (args.decimate or args.prescreen):
+        print("--chunk_time cannot be combined with --decimate or --prescreen.")
+        return
+
+    if args.fft_backend not in available_backends():
+        print(f"FFT backend {args.fft_backend} is not installed.")
+        return
+
     # Check if the output folder exists, if not - create it
     if not os.path.exists(args.output_folder):
         os.makedirs(args.output_folder)
         print(f"Output folder {args.output_folder} created.")
 
-    # Read data from the input HDF5 file
-    data = pd.read_hdf(args.input_file)
+    profiler = StageProfiler(enabled=args.profile, top_events=args.profile_top)
+
+    # Open the input: ragged catalogs are read one event at a time while they are processed, HDF5 files are
+    # loaded whole first
+    with profiler.stage('main.open_catalog'):
+        data = open_catalog(args.input_file)
+
+    # Serve events whose trace and detection parameters are unchanged from the result cache
+    cache = None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_mb * 2 ** 20))
 
     # Initialize and run spectral flux onset detection
-    results = SpectralFlux(args.output_folder, data, args.landscape).onset_detection()
+    with profiler.stage('main.onset_detection'):
+        results = SpectralFlux(args.output_folder, data, args.landscape, args.workers,
+                               args.plots, args.plot_workers, profiler, cache,
+                               args.decimate, args.prescreen, args.results_format,
+                               args.resume, args.chunk_time, args.dtype, args.fft_backend,
+                               args.fft_workers, args.fft_pad, args.prefetch).onset_detection()
 
     # Process the file and save the results
     print(f"Processing file: {args.input_file}")
 
     # If spectral flux onset detection was successful, calculate metrics
     if results is not None and args.mode == 'train':
-        calculate_metric = Metrics(results, args.output_folder)
-        calculate_metric.calculate_metrics()
-    # Select only the columns: 'filename', 'time_abs', and 'time_rel'
-    detect_df = results[['filename', 'detection_time_abs', 'detection_time_rel']]
-
-    # Rename columns to match the desired format
-    detect_df = detect_df.rename(columns={
-        'detection_time_abs': 'time_abs(%Y-%m-%dT%H:%M:%S.%f)',
-        'detection_time_rel': 'time_rel(sec)'
-    })
-
-    # Save the filtered DataFrame to a CSV file
+        with profiler.stage('main.metrics'):
+            from CalculateMetric import Metrics  # Evaluation code is loaded only for labelled runs
+            # Aggregate the metrics one chunk of results at a time
+            chunks = results.iter_chunks(['filename', 'onset_time_ground_truth', 'audio_duration',
+                                          'onset_time_predicted'])
+            calculate_metric = Metrics(chunks, args.output_folder, args.landscape, args.input_file)
+            calculate_metric.calculate_metrics()
+
+    # Save the columns 'filename', 'time_abs' and 'time_rel' to a CSV file, one chunk of results at a time
     detect_file_path = os.path.join(args.output_folder, "detections.csv")
-    detect_df.to_csv(detect_file_path, index=False)
+    with profiler.stage('main.detections_csv'):
+        write_detections(results, detect_file_path)
 
     print(f"Detections DataFrame saved to {detect_file_path}")
     # Print message indicating where the results are saved
     print(f"Saving results to folder: {args.output_folder}")
 
+    if args.profile:
+        profile_path = os.path.join(args.output_folder, 'profile.json')
+        profiler.report(profile_path, os.path.join(args.output_folder, 'profiles'))
+        print(f"Profile report saved to {profile_path}")
+
 
 # Entry point for the script
 if __name__ == "__main__":
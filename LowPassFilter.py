@@ -1,39 +1,130 @@
-from scipy.signal import butter, filtfilt
+from scipy.signal import butter, filtfilt, lfilter, sosfilt, sosfiltfilt
+import numpy as np
+
+# Relative amplitude below which the impulse response of a filter is considered to have died out
+SETTLING_TOLERANCE = 1e-12
 
 
 class LPassFilter:
     """
     Class to apply a low-pass Butterworth filter to the input signal.
+
+    Filter designs are cached in a filter bank keyed by (cutoff, fs, order, dtype), since these are
+    almost always the same for all events of a landscape. Designs are computed in float64 and
+    stored in the precision of the data, so that float32 traces are filtered in float32.
     """
 
-    def filtering(self, data, cutoff, fs, order=4):
+    def __init__(self, method='sos'):
         """
-        Apply a low-pass filter to the input data.
+        Initialize the LPassFilter class.
+
+        Args:
+            method (str): 'sos' to filter with second-order sections (faster and numerically
+                more robust), or 'ba' to filter with transfer function coefficients as before.
+        """
+        if method not in ('sos', 'ba'):
+            raise ValueError(f"Unknown filter method: {method}")
+        self.method = method
+        self._filter_bank = {}
+        self._settling = {}
+
+    def design(self, cutoff, fs, order=4, dtype=np.float64):
+        """
+        Design a low-pass Butterworth filter, reusing a cached design when available.
+
+        Args:
+            cutoff (float): The cutoff frequency for the filter.
+            fs (float): The sampling frequency of the input data.
+            order (int): The order of the filter (default is 4).
+            dtype (numpy.dtype): Precision of the coefficients (default is float64).
+
+        Returns:
+            numpy.ndarray or tuple: Second-order sections, or (b, a) coefficients for the 'ba' method.
+
+        Raises:
+            ValueError: If the cutoff frequency is invalid (e.g., less than or equal to zero).
+        """
+        key = (cutoff, fs, order, np.dtype(dtype))
+        if key not in self._filter_bank:
+            nyquist = 0.5 * fs  # Calculate the Nyquist frequency
+            low = cutoff / nyquist  # Normalize the cutoff frequency
+
+            # Ensure the frequency range is within valid bounds
+            low = min(low, 1.0)
+            if low <= 0:
+                raise ValueError("Invalid cutoff frequency for lowpass filter.")
+
+            # Design a Butterworth low-pass filter
+            if self.method == 'sos':
+                self._filter_bank[key] = butter(order, low, btype='low', output='sos').astype(dtype)
+            else:
+                self._filter_bank[key] = tuple(c.astype(dtype) for c in butter(order, low, btype='low'))
+        return self._filter_bank[key]
+
+    def settling_samples(self, cutoff, fs, order=4, tolerance=SETTLING_TOLERANCE):
+        """
+        Number of samples after which the impulse response of the filter stays below a tolerance.
+
+        Filtering a block of a trace padded by this many samples on each side gives the same
+        samples inside the block as filtering the whole trace, up to the tolerance relative to
+        the amplitude of the signal, since the transients of the block edges have died out.
 
         Args:
-            data (numpy.ndarray): The input signal data.
             cutoff (float): The cutoff frequency for the filter.
             fs (float): The sampling frequency of the input data.
             order (int): The order of the filter (default is 4).
+            tolerance (float): Amplitude of the impulse response, relative to its peak, considered zero.
 
         Returns:
-            numpy.ndarray: The filtered signal.
+            int: Settling length in samples.
 
         Raises:
             ValueError: If the cutoff frequency is invalid (e.g., less than or equal to zero).
         """
-        nyquist = 0.5 * fs  # Calculate the Nyquist frequency
-        low = cutoff / nyquist  # Normalize the cutoff frequency
+        key = (cutoff, fs, order, tolerance)
+        if key not in self._settling:
+            coefficients = self.design(cutoff, fs, order)
+            length = 1024
+            while True:
+                impulse = np.zeros(length)
+                impulse[0] = 1
+                if self.method == 'sos':
+                    response = np.abs(sosfilt(coefficients, impulse))
+                else:
+                    response = np.abs(lfilter(*coefficients, impulse))
+                above = np.flatnonzero(response > tolerance * response.max())
+                # Double the length until the response has died out before its end
+                if above[-1] < length // 2:
+                    break
+                length *= 2
+            self._settling[key] = int(above[-1]) + 1
+        return self._settling[key]
+
+    def filtering(self, data, cutoff, fs, order=4, axis=-1):
+        """
+        Apply a low-pass filter to the input data.
 
-        # Ensure the frequency range is within valid bounds
-        low = min(low, 1.0)
-        if low <= 0:
-            raise ValueError("Invalid cutoff frequency for lowpass filter.")
+        Args:
+            data (numpy.ndarray): The input signal data, a single trace or a 2-D batch of equal-length traces.
+            cutoff (float): The cutoff frequency for the filter.
+            fs (float): The sampling frequency of the input data.
+            order (int): The order of the filter (default is 4).
+            axis (int): Axis of the data along which to filter (default is the last one).
 
-        # Design a Butterworth low-pass filter
-        b, a = butter(order, low, btype='low')
+        Returns:
+            numpy.ndarray: The filtered signal, float32 for float32 data and float64 otherwise.
+
+        Raises:
+            ValueError: If the cutoff frequency is invalid (e.g., less than or equal to zero).
+        """
+        data = np.asarray(data)
+        coefficients = self.design(cutoff, fs, order, dtype=np.result_type(data.dtype, np.float32))
 
-        # Apply the filter using filtfilt for zero-phase filtering
-        y = filtfilt(b, a, data)
+        # Apply the filter forward and backward for zero-phase filtering
+        if self.method == 'sos':
+            y = sosfiltfilt(coefficients, data, axis=axis)
+        else:
+            b, a = coefficients
+            y = filtfilt(b, a, data, axis=axis)
 
         return y
@@ -0,0 +1,372 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+
+# Per-event quantities whose medians make up the metrics
+EVENT_QUANTITIES = ['onset_time_deviation', 'send_signal_percentage_predicted', 'send_signal_percentage_truth']
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of a stream of values.
+
+    Values are kept exactly until more than `capacity` of them have been seen. After that, the sketch
+    is a stack of levels where each item of level h stands for 2**h values: a level holding more than
+    `capacity` items is sorted and every other item, starting at a random offset, is promoted to the
+    next level. Memory is O(capacity * log(count / capacity)) and the rank error of a quantile is of
+    the order of log(count / capacity) / capacity. Two sketches are merged by concatenating their levels.
+    """
+
+    def __init__(self, capacity=4096, seed=0):
+        """
+        Initialize the QuantileSketch class.
+
+        Args:
+            capacity (int): Number of items a level holds before it is compacted.
+            seed (int): Seed of the compaction offsets.
+        """
+        self.capacity = capacity
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.exact = True
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """
+        Add values to the sketch, ignoring NaN.
+
+        Args:
+            values (array-like): New values.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other):
+        """
+        Add the values summarized by another sketch.
+
+        Args:
+            other (QuantileSketch): Sketch to merge into this one.
+        """
+        for h, items in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate((self.levels[h], items))
+        self.count += other.count
+        self.exact = self.exact and other.exact
+        self._compress()
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self.capacity:
+                # An odd item out stays at this level with its weight
+                items = np.sort(items)
+                paired = len(items) - len(items) % 2
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                offset = self.rng.integers(2)
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], items[offset:paired:2]))
+                self.levels[h] = items[paired:]
+                self.exact = False
+            h += 1
+
+    def quantile(self, q):
+        """
+        Estimate a quantile of the values.
+
+        Args:
+            q (float): Quantile in [0, 1].
+
+        Returns:
+            float: The quantile, exact (with the linear interpolation of numpy.quantile) while no level has
+                been compacted; NaN if the sketch is empty.
+        """
+        if self.count == 0:
+            return np.nan
+        if self.exact:
+            if q == 0.5:
+                return float(np.median(self.levels[0]))
+            return float(np.quantile(self.levels[0], q))
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[order][min(position, len(items) - 1)])
+
+    def median(self):
+        """
+        Estimate the median of the values.
+
+        Returns:
+            float: The median, NaN if the sketch is empty.
+        """
+        return self.quantile(0.5)
+
+    def to_dict(self):
+        """
+        Serializable state of the sketch.
+
+        Returns:
+            dict: Capacity, count, exactness and levels.
+        """
+        return {
+            'capacity': self.capacity,
+            'count': self.count,
+            'exact': self.exact,
+            'levels': [level.tolist() for level in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, state, seed=0):
+        """
+        Restore a sketch from to_dict.
+
+        Args:
+            state (dict): Serialized sketch.
+            seed (int): Seed of the further compaction offsets.
+
+        Returns:
+            QuantileSketch: The restored sketch.
+        """
+        sketch = cls(state['capacity'], seed)
+        sketch.count = state['count']
+        sketch.exact = state['exact']
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in state['levels']]
+        return sketch
+
+
+class MetricsAggregator:
+    """
+    Incremental, mergeable aggregator of the onset metrics.
+
+    Each chunk of results is reduced to the per-event time deviation and send signal percentages, which
+    feed one QuantileSketch each, so the medians (and any other percentile) are available in bounded
+    memory however many events stream in. A uniform sample of the events is kept alongside to compute
+    bootstrap confidence intervals: each event gets a pseudo-random key hashed from the event itself and the
+    seed, and the `reservoir_size` smallest keys are kept. Since an event gets the same key whichever
+    aggregator sees it, the sample of aggregators of different shards merged together is the sample of the
+    whole catalog, uniform over its events.
+    """
+
+    # Columns identifying an event, in order of preference, from which its sample key is hashed
+    KEY_COLUMNS = ['filename', 'evid']
+
+    def __init__(self, sketch_capacity=4096, reservoir_size=10000, seed=0):
+        """
+        Initialize the MetricsAggregator class.
+
+        Args:
+            sketch_capacity (int): Capacity of the quantile sketches; medians are exact up to this many events.
+            reservoir_size (int): Number of events sampled for the bootstrap.
+            seed (int): Seed of the sketches, the sample keys and the bootstrap; aggregators that are merged
+                should share it.
+        """
+        self.sketch_capacity = sketch_capacity
+        self.reservoir_size = reservoir_size
+        self.seed = seed
+        self.sketches = {quantity: QuantileSketch(sketch_capacity, seed) for quantity in EVENT_QUANTITIES}
+        self.num_events = 0
+        self.sample_keys = np.empty(0)
+        self.sample = np.empty((0, len(EVENT_QUANTITIES)))
+
+    @staticmethod
+    def event_quantities(results):
+        """
+        Per-event quantities of a results table.
+
+        Args:
+            results (pandas.DataFrame): Columns 'onset_time_ground_truth', 'audio_duration' and
+                'onset_time_predicted'; missing predictions are NaN or None.
+
+        Returns:
+            numpy.ndarray: One row per event and one column per EVENT_QUANTITIES entry.
+        """
+        truth = pd.to_numeric(results['onset_time_ground_truth'], errors='coerce').to_numpy(dtype=np.float64)
+        duration = pd.to_numeric(results['audio_duration'], errors='coerce').to_numpy(dtype=np.float64)
+        predicted = pd.to_numeric(results['onset_time_predicted'], errors='coerce').to_numpy(dtype=np.float64)
+        return np.column_stack((
+            abs(truth - predicted),
+            100 - ((predicted / duration) * 100),
+            100 - ((truth / duration) * 100)
+        ))
+
+    def update(self, results):
+        """
+        Add a chunk of results.
+
+        Args:
+            results (pandas.DataFrame): Chunk of results, see event_quantities.
+        """
+        quantities = self.event_quantities(results)
+        for column, quantity in enumerate(EVENT_QUANTITIES):
+            self.sketches[quantity].update(quantities[:, column])
+        self.num_events += len(quantities)
+        self._sample(self.event_keys(results, quantities, self.seed), quantities)
+
+    @classmethod
+    def event_keys(cls, results, quantities, seed):
+        """
+        Sample keys of the events of a results table, uniform in [0, 1).
+
+        The key is a hash of the first KEY_COLUMNS column of the table, or of the per-event quantities when
+        there is none, so it depends only on the event and the seed.
+
+        Args:
+            results (pandas.DataFrame): Chunk of results.
+            quantities (numpy.ndarray): Per-event quantities of the chunk, see event_quantities.
+            seed (int): Seed of the keys.
+
+        Returns:
+            numpy.ndarray: One key per event.
+        """
+        column = next((column for column in cls.KEY_COLUMNS if column in results.columns), None)
+        if column is not None:
+            identity = pd.DataFrame({'event': results[column].astype(str).to_numpy()})
+        else:
+            identity = pd.DataFrame(quantities)
+        identity['seed'] = seed
+        hashes = pd.util.hash_pandas_object(identity, index=False).to_numpy(dtype=np.uint64)
+        return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+    def merge(self, other):
+        """
+        Add the results aggregated by another aggregator, e.g. of another shard.
+
+        Args:
+            other (MetricsAggregator): Aggregator to merge into this one.
+        """
+        for quantity in EVENT_QUANTITIES:
+            self.sketches[quantity].merge(other.sketches[quantity])
+        self.num_events += other.num_events
+        self._sample(other.sample_keys, other.sample)
+
+    def _sample(self, keys, rows):
+        # Keep the events with the smallest keys
+        self.sample_keys = np.concatenate((self.sample_keys, keys))
+        self.sample = np.concatenate((self.sample, rows))
+        if len(self.sample_keys) > self.reservoir_size:
+            keep = np.argpartition(self.sample_keys, self.reservoir_size)[:self.reservoir_size]
+            self.sample_keys = self.sample_keys[keep]
+            self.sample = self.sample[keep]
+
+    @staticmethod
+    def _metrics(median_deviation, median_predicted, median_truth):
+        return {
+            'median_send_signal_percentage_predicted': median_predicted,
+            'median_send_signal_percentage_truth': median_truth,
+            'median_percentage_difference': median_truth - median_predicted,
+            'median_time_deviation': median_deviation,
+            'median_signal_reduction': 100 - median_predicted
+        }
+
+    def compute_metrics(self):
+        """
+        Metrics of the results aggregated so far.
+
+        Returns:
+            dict: The metrics, keyed by the column names of the metrics CSV file.
+        """
+        return self._metrics(*(self.sketches[quantity].median() for quantity in EVENT_QUANTITIES))
+
+    def quantiles(self, q):
+        """
+        Percentiles of the per-event quantities.
+
+        Args:
+            q (list): Quantiles in [0, 1].
+
+        Returns:
+            dict: For each EVENT_QUANTITIES entry, the list of its quantiles.
+        """
+        return {quantity: [self.sketches[quantity].quantile(value) for value in q] for quantity in EVENT_QUANTITIES}
+
+    def confidence_intervals(self, level=0.95, num_resamples=1000, batch_size=100):
+        """
+        Percentile bootstrap confidence intervals of the metrics, from the sampled events.
+
+        Args:
+            level (float): Confidence level.
+            num_resamples (int): Number of bootstrap resamples.
+            batch_size (int): Number of resamples drawn at once.
+
+        Returns:
+            dict: (low, high) bounds of each metric, NaN if no event was aggregated.
+        """
+        rng = np.random.default_rng(self.seed)
+        num_sampled = len(self.sample)
+        if num_sampled == 0:
+            return {name: (np.nan, np.nan) for name in self._metrics(np.nan, np.nan, np.nan)}
+
+        medians = []
+        for start in range(0, num_resamples, batch_size):
+            count = min(batch_size, num_resamples - start)
+            resampled = self.sample[rng.integers(0, num_sampled, (count, num_sampled))]
+            with np.errstate(invalid='ignore'):
+                medians.append(_nanmedian(resampled))
+        medians = np.concatenate(medians)
+
+        resampled_metrics = self._metrics(medians[:, 0], medians[:, 1], medians[:, 2])
+        tail = (1 - level) / 2 * 100
+        return {name: tuple(np.nanpercentile(values, [tail, 100 - tail])) if not np.all(np.isnan(values))
+                else (np.nan, np.nan) for name, values in resampled_metrics.items()}
+
+    def save(self, path):
+        """
+        Save the aggregator as JSON, e.g. for a shard to be merged later.
+
+        Args:
+            path (str): Output file.
+        """
+        state = {
+            'sketch_capacity': self.sketch_capacity,
+            'reservoir_size': self.reservoir_size,
+            'seed': self.seed,
+            'num_events': self.num_events,
+            'sketches': {quantity: sketch.to_dict() for quantity, sketch in self.sketches.items()},
+            'sample_keys': self.sample_keys.tolist(),
+            'sample': self.sample.tolist()
+        }
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an aggregator saved by save.
+
+        Args:
+            path (str): Input file.
+
+        Returns:
+            MetricsAggregator: The restored aggregator.
+        """
+        with open(path) as f:
+            state = json.load(f)
+        aggregator = cls(state['sketch_capacity'], state['reservoir_size'], state['seed'])
+        aggregator.num_events = state['num_events']
+        aggregator.sketches = {quantity: QuantileSketch.from_dict(sketch, state['seed'])
+                               for quantity, sketch in state['sketches'].items()}
+        aggregator.sample_keys = np.asarray(state['sample_keys'], dtype=np.float64)
+        aggregator.sample = np.asarray(state['sample'], dtype=np.float64).reshape(-1, len(EVENT_QUANTITIES))
+        return aggregator
+
+
+def _nanmedian(values):
+    # Median over axis 1 ignoring NaN: sorting moves NaN to the end of each column
+    values = np.sort(values, axis=1)
+    valid = np.sum(~np.isnan(values), axis=1)
+    low = np.take_along_axis(values, (np.maximum(valid - 1, 0) // 2)[:, None], axis=1)[:, 0]
+    high = np.take_along_axis(values, np.minimum(valid // 2, values.shape[1] - 1)[:, None], axis=1)[:, 0]
+    median = (low + high) / 2
+    median[valid == 0] = np.nan
+    return median
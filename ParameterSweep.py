@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from SpectralFluxMethod import SpectralFlux
+from CalculateMetric import Metrics
+from CatalogReader import open_catalog
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import argparse
+import os
+
+
+def sweep_event(detector, csv_data, fs, grid):
+    """
+    Detect the onset of one trace for every configuration of a parameter grid.
+
+    Work is shared between configurations: the trace is filtered once per cutoff, the spectral
+    flux is computed once per (window, hop) size in samples, and only peak picking runs for each
+    (height factor, peak distance) pair.
+
+    Args:
+        detector (SpectralFlux): Detector providing the filter, the flux engine and the peak picking.
+        csv_data (numpy.ndarray): Velocity samples of the trace.
+        fs (float): Sampling frequency.
+        grid (dict): Lists of values for 'cutoff', 'window_time', 'hop_time', 'height_factor'
+            and 'min_time_between_peaks'.
+
+    Returns:
+        dict: Onset time (or None) for each configuration tuple, in the order of the grid keys above.
+    """
+    onsets = {}
+    for cutoff in grid['cutoff']:
+        try:
+            filtered = detector.butter_bandpass_filter.filtering(csv_data, cutoff, fs, order=detector.filter_order)
+        except ValueError:
+            filtered = None
+
+        flux_cache = {}
+        for window_time, hop_time in product(grid['window_time'], grid['hop_time']):
+            window_size = max(1, int(window_time * fs))
+            hop_size = max(1, int(hop_time * fs))
+            if filtered is not None and (window_size, hop_size) not in flux_cache:
+                flux_cache[(window_size, hop_size)] = detector._compute_spectral_flux(filtered, fs, window_size,
+                                                                                      hop_size)
+
+            for height_factor, min_time_between_peaks in product(grid['height_factor'],
+                                                                  grid['min_time_between_peaks']):
+                config = (cutoff, window_time, hop_time, height_factor, min_time_between_peaks)
+                if filtered is None:
+                    onsets[config] = None
+                    continue
+                spectral_flux, time_vals = flux_cache[(window_size, hop_size)]
+                onsets[config] = detector.pick_onset(spectral_flux, time_vals, fs, height_factor,
+                                                     min_time_between_peaks)
+    return onsets
+
+
+def _sweep_row(args):
+    """
+    Sweep one catalog row, in the main process or in a worker of the pool.
+
+    Args:
+        args (tuple): Landscape, parameter grid, catalog index and row.
+
+    Returns:
+        dict or None: Ground truth, duration and onsets of the event, or None if it was skipped.
+    """
+    landscape, grid, index, row = args
+    csv_times = np.asarray(row['np_time_rel(sec)'])
+    csv_data = np.asarray(row['np_velocity(m/s)'])
+    if len(csv_times) < 2 or len(csv_data) < 2:
+        print(f"Skipping row {index} due to insufficient data.")
+        return None
+
+    fs = 1 / (csv_times[1] - csv_times[0])
+    detector = SpectralFlux(None, None, landscape)
+    return {
+        'onset_time_ground_truth': row['time_rel(sec)'],
+        'audio_duration': csv_times[-1] - csv_times[0],
+        'onsets': sweep_event(detector, csv_data, fs, grid)
+    }
+
+
+def run_sweep(data, landscape, grid, workers=1):
+    """
+    Evaluate the Metrics of every configuration of a parameter grid on a labelled catalog.
+
+    Args:
+        data: Catalog exposing iterrows(), e.g. from open_catalog.
+        landscape (str): Type of landscape, 'lunar' or 'mars'.
+        grid (dict): Lists of values for 'cutoff', 'window_time', 'hop_time', 'height_factor'
+            and 'min_time_between_peaks'.
+        workers (int): Number of processes sweeping events in parallel.
+
+    Returns:
+        pandas.DataFrame: One row per configuration with its parameters and metrics.
+    """
+    tasks = ((landscape, grid, index, row) for index, row in data.iterrows())
+    if workers <= 1:
+        events = [_sweep_row(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            events = list(executor.map(_sweep_row, tasks))
+    events = [event for event in events if event is not None]
+
+    truth = [event['onset_time_ground_truth'] for event in events]
+    duration = [event['audio_duration'] for event in events]
+    rows = []
+    for config in product(grid['cutoff'], grid['window_time'], grid['hop_time'], grid['height_factor'],
+                          grid['min_time_between_peaks']):
+        predicted = [event['onsets'][config] for event in events]
+        results = pd.DataFrame({
+            'onset_time_ground_truth': truth,
+            'audio_duration': duration,
+            'onset_time_predicted': predicted
+        })
+        metrics = Metrics(results, None).compute_metrics()
+        rows.append({
+            'cutoff': config[0],
+            'window_time': config[1],
+            'hop_time': config[2],
+            'height_factor': config[3],
+            'min_time_between_peaks': config[4],
+            'num_detected': sum(onset is not None for onset in predicted),
+            **metrics
+        })
+    return pd.DataFrame(rows)
+
+
+def parse_args():
+    # Set up argument parser to get command-line arguments
+    parser = argparse.ArgumentParser(description="Sweep detection parameters on a labelled catalog.")
+
+    # Argument for the path to the *.h5 input file
+    parser.add_argument(
+        '--input_file',
+        type=str,
+        required=True,
+        help='Path to the training HDF5 file (*.h5) or ragged catalog directory'
+    )
+
+    # Argument for the CSV file the sweep will be saved to
+    parser.add_argument(
+        '--output_file',
+        type=str,
+        default='sweep_results.csv',
+        help='CSV file to save the metrics of each configuration'
+    )
+
+    # Optional argument to specify the landscape type (default is 'lunar')
+    parser.add_argument(
+        '--landscape',
+        type=str,
+        default='lunar',
+        choices=['lunar', 'mars'],
+        help='Specify landscape type.'
+    )
+
+    # Parameter grid, each defaulting to the value used by SpectralFlux
+    parser.add_argument('--cutoffs', type=float, nargs='+', default=None,
+                        help='Low-pass cutoff frequencies (default is the landscape cutoff).')
+    parser.add_argument('--window_times', type=float, nargs='+', default=[0.2],
+                        help='FFT window lengths in seconds.')
+    parser.add_argument('--hop_times', type=float, nargs='+', default=[0.05],
+                        help='Steps between FFT windows in seconds.')
+    parser.add_argument('--height_factors', type=float, nargs='+', default=[0.3],
+                        help='Fractions of the maximum flux a peak must reach.')
+    parser.add_argument('--peak_distances', type=float, nargs='+', default=[0.1],
+                        help='Minimum times between peaks in seconds.')
+
+    # Optional argument to sweep events in a process pool
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of processes sweeping events in parallel (default is 1, serial).'
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cutoffs = args.cutoffs or [SpectralFlux(None, None, args.landscape).cutoff]
+    grid = {
+        'cutoff': cutoffs,
+        'window_time': args.window_times,
+        'hop_time': args.hop_times,
+        'height_factor': args.height_factors,
+        'min_time_between_peaks': args.peak_distances
+    }
+    num_configs = np.prod([len(values) for values in grid.values()])
+    print(f"Sweeping {num_configs} configurations on {args.input_file}")
+
+    sweep = run_sweep(open_catalog(args.input_file), args.landscape, grid, args.workers)
+    output_dir = os.path.dirname(args.output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    sweep.to_csv(args.output_file, index=False)
+
+    best = sweep.sort_values('median_time_deviation').iloc[0]
+    print(f"Lowest median time deviation: {best['median_time_deviation']} sec. with cutoff {best['cutoff']}, "
+          f"window {best['window_time']}, hop {best['hop_time']}, height factor {best['height_factor']}, "
+          f"peak distance {best['min_time_between_peaks']}")
+    print(f"Sweep saved to {args.output_file}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
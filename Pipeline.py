@@ -0,0 +1,200 @@
+import numpy as np
+import mmap
+import queue
+import threading
+import time
+
+# Marker closing the queue of a BackgroundConsumer
+_DONE = object()
+
+# Seconds a blocked queue operation waits before checking whether the other side stopped
+_POLL_INTERVAL = 0.1
+
+
+def warm_pages(array):
+    """
+    Read one element of every page of a memory-mapped array, so that its samples are in memory.
+
+    Only the page cache fills up: no copy of the array is made, and arrays that are not memory
+    maps are left alone.
+
+    Args:
+        array: Any value; only numpy.memmap arrays and views of them are touched.
+    """
+    if not isinstance(array, np.memmap) or array.size == 0:
+        return
+    step = max(1, mmap.PAGESIZE // array.itemsize)
+    np.add.reduce(array.ravel()[::step])
+
+
+def warm_row(item):
+    """
+    Prefetch the memory-mapped arrays of an event yielded by SpectralFlux._iter_rows.
+
+    Args:
+        item (tuple): Index, row and load time of the event.
+
+    Returns:
+        tuple: The same item, with the time spent reading the pages added to its load time.
+    """
+    index, row, load_time = item
+    start = time.perf_counter()
+    for _, value in row.items():
+        warm_pages(value)
+    return index, row, load_time + time.perf_counter() - start
+
+
+class _EndOfItems:
+    # Last entry of the queue of a Prefetcher, carrying the error that ended the reading, if any
+    def __init__(self, error=None):
+        self.error = error
+
+
+class Prefetcher:
+    """
+    Iterator reading ahead of its consumer on a background thread.
+
+    Up to `depth` items are prepared while the consumer works on the current one; the reader
+    blocks when the queue is full, which bounds the memory held by prefetched items. Exceptions
+    raised while reading are re-raised by the consumer at the position they occurred.
+    """
+
+    def __init__(self, iterable, depth, prepare=None):
+        """
+        Initialize the Prefetcher class and start its reader thread.
+
+        Args:
+            iterable: Source of the items, iterated on the reader thread only.
+            depth (int): Maximum number of items read ahead.
+            prepare (callable or None): Function applied to each item on the reader thread, e.g. warm_row.
+        """
+        self.wait_time = 0.0  # Seconds the consumer spent waiting for the reader
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read, args=(iter(iterable), prepare), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # Block while the queue is full, unless the consumer has stopped
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, iterator, prepare):
+        try:
+            for item in iterator:
+                if not self._put(prepare(item) if prepare is not None else item):
+                    return
+        except BaseException as e:
+            self._put(_EndOfItems(e))
+            return
+        self._put(_EndOfItems())
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        item = self._queue.get()
+        self.wait_time += time.perf_counter() - start
+        if isinstance(item, _EndOfItems):
+            self._queue.put(item)  # Keep ending the iteration if called again
+            if item.error is not None:
+                raise item.error
+            raise StopIteration
+        return item
+
+    def close(self):
+        """
+        Stop the reader thread, discarding the items read ahead.
+        """
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BackgroundConsumer:
+    """
+    Bounded queue of items handled in order by a background thread.
+
+    submit() returns as soon as the item is queued and blocks while `max_pending` items wait,
+    which bounds the memory held by pending items. If the handler fails, the error is re-raised
+    by the next call to submit() or by close().
+    """
+
+    def __init__(self, handler, max_pending):
+        """
+        Initialize the BackgroundConsumer class and start its thread.
+
+        Args:
+            handler (callable): Function called on the background thread with the arguments of each submit().
+            max_pending (int): Maximum number of items waiting to be handled.
+        """
+        self.busy_time = 0.0  # Seconds spent in the handler
+        self.wait_time = 0.0  # Seconds submit() spent blocked on a full queue
+        self._handler = handler
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._error = None
+        self._failed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            args = self._queue.get()
+            if args is _DONE:
+                return
+            if self._failed:
+                continue  # Drain the queue after a failure so that submit() never blocks
+            start = time.perf_counter()
+            try:
+                self._handler(*args)
+            except BaseException as e:
+                self._error, self._failed = e, True
+            self.busy_time += time.perf_counter() - start
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, *args):
+        """
+        Queue an item for the handler.
+
+        Args:
+            *args: Arguments of the handler call.
+
+        Raises:
+            Exception: The error of a previous handler call, if any.
+        """
+        self._raise_error()
+        start = time.perf_counter()
+        self._queue.put(args)
+        self.wait_time += time.perf_counter() - start
+
+    def close(self):
+        """
+        Handle all queued items and stop the thread.
+
+        Raises:
+            Exception: The error of a handler call, if any.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_DONE)
+            self._thread.join()
+        self._raise_error()
@@ -0,0 +1,216 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from Utils import array_digest
+import os
+
+# Plot modes: no images, images for one event in PLOT_SAMPLE_EVERY, or images for every event
+PLOT_MODES = ['none', 'sample', 'all']
+PLOT_SAMPLE_EVERY = 10
+
+
+def _pyplot():
+    """
+    Import matplotlib on first use, so that runs without images never load it.
+
+    Returns:
+        module: matplotlib.pyplot, rendering to files only.
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Render to files only, never through an interactive backend
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class SaveImages:
+    """
+    Class for saving images of time-domain plots with additional event markers.
+    """
+
+    def create_dir(self, dir):
+        """
+        Create a directory if it doesn't already exist.
+
+        Args:
+            dir (str): Path to the directory to be created.
+        """
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+
+    def save_image(self, csv_times, csv_data, line_time, output_image_path, color):
+        """
+        Save a time-domain plot of the signal with an event line.
+
+        Args:
+            csv_times (numpy.ndarray): Array of time values.
+            csv_data (numpy.ndarray): Array of velocity (m/s) values.
+            line_time (float): Time of the event onset.
+            output_image_path (str): Path where the image will be saved.
+            color (str): Color of the event line.
+
+        Returns:
+            None: Saves the image to the specified path.
+
+        """
+        plt = _pyplot()
+
+        # Create the plot
+        plt.figure(figsize=(10, 6))
+        plt.plot(csv_times, csv_data, label='Velocity (m/s)')
+        plt.axvline(x=line_time, color=color, linestyle='--', label='Event Time')  # Highlight the event time
+        plt.title(f'Time Domain Plot')
+        plt.xlabel('Time (sec)')
+        plt.ylabel('Velocity (m/s)')
+        plt.legend()
+
+        # Save the plot as an image
+        plt.savefig(output_image_path)
+        plt.close()  # Close the figure to avoid display overlap
+
+    def plot_onset_original_data(self, csv_times, csv_data, onset_time, output_image_path):
+        """
+        Save a time-domain plot of the original signal with an event onset marker.
+
+        Args:
+            csv_times (numpy.ndarray): Array of time values.
+            csv_data (numpy.ndarray): Array of velocity (m/s) values.
+            onset_time (float or None): Time of the event onset, if detected.
+            output_image_path (str): Path where the image will be saved.
+
+        Returns:
+            None: Saves the image to the specified path.
+        """
+        plt = _pyplot()
+
+        # Create the plot
+        plt.figure(figsize=(10, 6))
+
+        # Plot the original time-domain signal
+        plt.plot(csv_times, csv_data, label='Velocity (m/s)', color='blue')
+
+        # Highlight the event onset time
+        if onset_time is not None:
+            plt.axvline(x=onset_time, color='red', linestyle='--', label='Event Time')
+
+        # Add plot details
+        plt.title('Time Domain Plot')
+        plt.xlabel('Time (sec)')
+        plt.ylabel('Velocity (m/s)')
+        plt.legend(loc="upper right")
+
+        # Save the plot as an image
+        plt.savefig(output_image_path)
+        plt.close()  # Close the figure to avoid display overlap
+
+
+def _render_job(method, kwargs, key_path=None, key=None):
+    """
+    Render one image in a worker process of the render pool.
+
+    Args:
+        method (str): Name of the SaveImages method to call.
+        kwargs (dict): Keyword arguments of that method, including output_image_path.
+        key_path (str or None): Path of the file recording the inputs the image was rendered from.
+        key (str or None): Digest of those inputs.
+    """
+    saver = SaveImages()
+    saver.create_dir(os.path.dirname(kwargs['output_image_path']))
+    getattr(saver, method)(**kwargs)
+    if key_path is not None:
+        with open(key_path, 'w') as f:
+            f.write(key)
+
+
+class PlotRenderer:
+    """
+    Background render queue for the per-event images.
+
+    Images are rendered by a dedicated process pool so that onset detection never waits on
+    matplotlib; only a bounded number of jobs is kept pending so that queued traces do not
+    accumulate in memory.
+    """
+
+    def __init__(self, mode='all', workers=1, max_pending=None):
+        """
+        Initialize the PlotRenderer class.
+
+        Args:
+            mode (str): 'none', 'sample' (one event in PLOT_SAMPLE_EVERY) or 'all'.
+            workers (int): Number of render processes.
+            max_pending (int or None): Maximum number of queued jobs before submitting waits (default 8 per worker).
+        """
+        if mode not in PLOT_MODES:
+            raise ValueError(f"Unknown plot mode: {mode}")
+        self.mode = mode
+        self.max_pending = max_pending or 8 * workers
+        self._executor = ProcessPoolExecutor(max_workers=workers) if mode != 'none' else None
+        self._pending = deque()
+
+    def wants(self, position):
+        """
+        Check whether the images of an event should be rendered.
+
+        Args:
+            position (int): Position of the event in the catalog.
+
+        Returns:
+            bool: True if the event is plotted in the current mode.
+        """
+        if self.mode == 'all':
+            return True
+        return self.mode == 'sample' and position % PLOT_SAMPLE_EVERY == 0
+
+    def _submit(self, method, kwargs, key_path=None, key=None):
+        # Backpressure: wait for the oldest job when too many are queued
+        while len(self._pending) >= self.max_pending:
+            self._wait(self._pending.popleft())
+        self._pending.append(self._executor.submit(_render_job, method, kwargs, key_path, key))
+
+    def _wait(self, future):
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Error rendering image: {e!r}")
+
+    def submit_truth(self, csv_times, csv_data, line_time, output_image_path, color='red'):
+        """
+        Queue the ground truth image of an event, unless it exists and its inputs are unchanged.
+
+        Args:
+            csv_times (numpy.ndarray): Array of time values.
+            csv_data (numpy.ndarray): Array of velocity (m/s) values.
+            line_time (float): Time of the event onset.
+            output_image_path (str): Path where the image will be saved.
+            color (str): Color of the event line.
+        """
+        key = array_digest(csv_times, csv_data, line_time, color)
+        key_path = f'{output_image_path}.key'
+        if os.path.exists(output_image_path) and os.path.exists(key_path):
+            with open(key_path) as f:
+                if f.read() == key:
+                    return
+        kwargs = dict(csv_times=csv_times, csv_data=csv_data, line_time=line_time,
+                      output_image_path=output_image_path, color=color)
+        self._submit('save_image', kwargs, key_path, key)
+
+    def submit_onset(self, csv_times, csv_data, onset_time, output_image_path):
+        """
+        Queue the image of an event with its detected onset.
+
+        Args:
+            csv_times (numpy.ndarray): Array of time values.
+            csv_data (numpy.ndarray): Array of velocity (m/s) values.
+            onset_time (float or None): Time of the event onset, if detected.
+            output_image_path (str): Path where the image will be saved.
+        """
+        kwargs = dict(csv_times=csv_times, csv_data=csv_data, onset_time=onset_time,
+                      output_image_path=output_image_path)
+        self._submit('plot_onset_original_data', kwargs)
+
+    def close(self):
+        """
+        Wait for all queued images and shut the render pool down.
+        """
+        while self._pending:
+            self._wait(self._pending.popleft())
+        if self._executor is not None:
+            self._executor.shutdown()
@@ -0,0 +1,172 @@
+import numpy as np
+from contextlib import contextmanager, nullcontext
+import cProfile
+import heapq
+import json
+import marshal
+import os
+import time
+
+
+class StageProfiler:
+    """
+    Low-overhead per-stage wall-clock timers.
+
+    Stage times measured between start_event and end_event belong to the current event and reach
+    the run totals through add_event, which also accepts events timed in worker processes. Other
+    stage times go straight to the run totals. When disabled, stage() returns a shared no-op
+    context manager.
+    """
+
+    def __init__(self, enabled=False, top_events=0):
+        """
+        Initialize the StageProfiler class.
+
+        Args:
+            enabled (bool): Whether timers are active.
+            top_events (int): Number of slowest events to keep a cProfile dump of (0 disables cProfile).
+        """
+        self.enabled = enabled
+        self.top_events = top_events if enabled else 0
+        self.totals = {}
+        self.counts = {}
+        self.events = []  # (event id, total seconds, stage timings)
+        self._event_timings = None
+        self._cprofile = None
+        self._slowest = []  # heap of (total seconds, order, event id, marshalled cProfile stats)
+        self._noop = nullcontext()
+
+    def stage(self, name):
+        """
+        Time a stage of the pipeline.
+
+        Args:
+            name (str): Name of the stage.
+
+        Returns:
+            contextmanager: Context timing its body.
+        """
+        if not self.enabled:
+            return self._noop
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        """
+        Add a measured duration to a stage.
+
+        Args:
+            name (str): Name of the stage.
+            seconds (float): Duration in seconds.
+        """
+        if self._event_timings is not None:
+            self._event_timings[name] = self._event_timings.get(name, 0.0) + seconds
+        else:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def start_event(self):
+        """
+        Start collecting the stage timings of an event, under cProfile if slowest events are dumped.
+        """
+        if not self.enabled:
+            return
+        self._event_timings = {}
+        if self.top_events > 0:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def end_event(self):
+        """
+        Stop collecting the stage timings of the current event.
+
+        Returns:
+            tuple or None: Stage timings of the event and its marshalled cProfile stats (or None),
+                None if the profiler is disabled.
+        """
+        if not self.enabled:
+            return None
+        stats = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.create_stats()
+            stats = marshal.dumps(self._cprofile.stats)
+            self._cprofile = None
+        timings, self._event_timings = self._event_timings, None
+        return timings, stats
+
+    def add_event(self, event_id, profile):
+        """
+        Record the timings of a finished event, possibly measured in another process.
+
+        Args:
+            event_id (str): Identifier of the event.
+            profile (tuple or None): Value returned by end_event.
+        """
+        if not self.enabled or profile is None:
+            return
+        timings, stats = profile
+        for name, seconds in timings.items():
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+        total = sum(timings.values())
+        self.events.append((event_id, total, timings))
+        if stats is not None:
+            entry = (total, len(self.events), event_id, stats)
+            if len(self._slowest) < self.top_events:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+
+    def report(self, path, profile_dir=None):
+        """
+        Write the JSON report with per-stage totals and per-event percentiles.
+
+        Args:
+            path (str): Path of the JSON report.
+            profile_dir (str or None): Directory for the cProfile dumps of the slowest events.
+
+        Returns:
+            dict: The report.
+        """
+        def percentiles(values):
+            values = np.asarray(values)
+            return {
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'p99': float(np.percentile(values, 99)),
+                'max': float(np.max(values))
+            }
+
+        stage_names = sorted({name for _, _, timings in self.events for name in timings})
+        report = {
+            'stages': {name: {'total': self.totals[name], 'count': self.counts[name]} for name in self.totals},
+            'events': {
+                'count': len(self.events),
+                'total': percentiles([total for _, total, _ in self.events]) if self.events else None,
+                'stages': {name: percentiles([timings.get(name, 0.0) for _, _, timings in self.events])
+                           for name in stage_names}
+            },
+            'slowest_events': []
+        }
+
+        # Dump the cProfile stats of the slowest events, loadable with pstats
+        for total, _, event_id, stats in sorted(self._slowest, reverse=True):
+            entry = {'event': str(event_id), 'seconds': total}
+            if profile_dir is not None:
+                os.makedirs(profile_dir, exist_ok=True)
+                entry['profile'] = os.path.join(profile_dir, f'{event_id}.prof')
+                with open(entry['profile'], 'wb') as f:
+                    f.write(stats)
+            report['slowest_events'].append(entry)
+
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,361 @@
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import os
+
+# Column names holding the per-event arrays, for catalogs (training) and plain recordings (test)
+ARRAY_COLUMN_LAYOUTS = [
+    ('np_time_rel(sec)', 'np_velocity(m/s)'),
+    ('time_rel(sec)', 'velocity(m/s)'),
+]
+
+
+class RaggedCatalogWriter:
+    """
+    Writer of the columnar, memory-mappable catalog format.
+
+    A catalog is a directory holding:
+        - velocity.bin: the velocity samples of all events, concatenated in one flat array;
+        - offsets.npy and lengths.npy: position and number of samples of each event in that array;
+        - start_time.npy and sampling_rate.npy: relative time of the first sample and sampling
+          frequency of each event, which replace the per-event time arrays;
+        - catalog.csv: the scalar metadata of each event (filename, evid, onset time, ...);
+        - meta.json: dtype and original column names, written last to mark the catalog complete.
+
+    Offsets do not have to be contiguous: in append mode the samples already in velocity.bin stay
+    in place, new traces are added after them, and the index is rebuilt from reused and new events.
+    Samples no longer referenced are reclaimed by compact_catalog.
+    """
+
+    def __init__(self, path, time_column='np_time_rel(sec)', velocity_column='np_velocity(m/s)', dtype='float64',
+                 append=False):
+        """
+        Initialize the RaggedCatalogWriter class.
+
+        Args:
+            path (str): Directory of the catalog, created if needed.
+            time_column (str): Name of the column the time arrays are exposed as when reading.
+            velocity_column (str): Name of the column the velocity arrays are exposed as when reading.
+            dtype (str): Data type of the stored velocity samples.
+            append (bool): Keep the samples of an existing catalog so its events can be reused.
+
+        Raises:
+            ValueError: If appending with a dtype different from the existing catalog.
+        """
+        self.path = path
+        self.time_column = time_column
+        self.velocity_column = velocity_column
+        self.dtype = np.dtype(dtype)
+        os.makedirs(path, exist_ok=True)
+
+        velocity_path = os.path.join(path, 'velocity.bin')
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                if append and np.dtype(json.load(f)['dtype']) != self.dtype:
+                    raise ValueError(f"Cannot append {self.dtype} samples to the catalog in {path}.")
+            # The catalog is incomplete until close() writes the new index and meta.json
+            os.remove(meta_path)
+
+        if append and os.path.exists(velocity_path):
+            self._velocity_file = open(velocity_path, 'ab')
+            self._num_samples = os.path.getsize(velocity_path) // self.dtype.itemsize
+        else:
+            self._velocity_file = open(velocity_path, 'wb')
+            self._num_samples = 0
+        self._offsets = []
+        self._lengths = []
+        self._start_times = []
+        self._sampling_rates = []
+        self._metadata = []
+
+    def append(self, metadata, times, velocity):
+        """
+        Append one event to the catalog.
+
+        Args:
+            metadata (dict): Scalar metadata of the event.
+            times (numpy.ndarray): Relative time of each sample, assumed evenly spaced.
+            velocity (numpy.ndarray): Velocity samples of the event.
+        """
+        velocity = np.asarray(velocity, dtype=self.dtype)
+        times = np.asarray(times)
+        velocity.tofile(self._velocity_file)
+
+        self._offsets.append(self._num_samples)
+        self._lengths.append(len(velocity))
+        self._start_times.append(times[0] if len(times) > 0 else np.nan)
+        self._sampling_rates.append(1 / (times[1] - times[0]) if len(times) > 1 else np.nan)
+        self._metadata.append(metadata)
+        self._num_samples += len(velocity)
+
+    def reuse(self, catalog, i, metadata):
+        """
+        Append an event whose samples are already stored in the catalog being appended to.
+
+        Args:
+            catalog (RaggedCatalog): The catalog as it was before this writer was opened.
+            i (int): Position of the event in that catalog.
+            metadata (dict): Scalar metadata of the event.
+        """
+        self._offsets.append(int(catalog.offsets[i]))
+        self._lengths.append(int(catalog.lengths[i]))
+        self._start_times.append(catalog.start_time[i])
+        self._sampling_rates.append(catalog.sampling_rate[i])
+        self._metadata.append(metadata)
+
+    def close(self):
+        """
+        Write the index arrays and metadata, completing the catalog.
+        """
+        self._velocity_file.close()
+        np.save(os.path.join(self.path, 'offsets.npy'), np.array(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.path, 'lengths.npy'), np.array(self._lengths, dtype=np.int64))
+        np.save(os.path.join(self.path, 'start_time.npy'), np.array(self._start_times, dtype=np.float64))
+        np.save(os.path.join(self.path, 'sampling_rate.npy'), np.array(self._sampling_rates, dtype=np.float64))
+        pd.DataFrame(self._metadata).to_csv(os.path.join(self.path, 'catalog.csv'), index=False)
+
+        meta = {
+            'format_version': 1,
+            'dtype': self.dtype.str,
+            'time_column': self.time_column,
+            'velocity_column': self.velocity_column
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RaggedCatalog:
+    """
+    Reader of the columnar catalog format written by RaggedCatalogWriter.
+
+    Velocity traces are returned as zero-copy slices of a read-only memory map, so
+    reading one event only touches the pages of that event.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the RaggedCatalog class.
+
+        Args:
+            path (str): Directory of the catalog.
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.time_column = meta['time_column']
+        self.velocity_column = meta['velocity_column']
+
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        self.lengths = np.load(os.path.join(path, 'lengths.npy'))
+        self.start_time = np.load(os.path.join(path, 'start_time.npy'))
+        self.sampling_rate = np.load(os.path.join(path, 'sampling_rate.npy'))
+        self.catalog = pd.read_csv(os.path.join(path, 'catalog.csv'), float_precision='round_trip')
+
+        dtype = np.dtype(meta['dtype'])
+        velocity_path = os.path.join(path, 'velocity.bin')
+        if os.path.getsize(velocity_path) > 0:
+            self.velocity = np.memmap(velocity_path, dtype=dtype, mode='r')
+        else:
+            # np.memmap cannot map an empty file
+            self.velocity = np.zeros(0, dtype=dtype)
+
+    @staticmethod
+    def is_catalog(path):
+        """
+        Check whether a path is a complete ragged catalog directory.
+
+        Args:
+            path (str): Path to check.
+
+        Returns:
+            bool: True if the path holds a catalog.
+        """
+        return os.path.isfile(os.path.join(path, 'meta.json'))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def dead_samples(self):
+        """
+        Number of samples in velocity.bin no event refers to, left by updates in append mode.
+        """
+        return len(self.velocity) - int(self.lengths.sum())
+
+    def trace(self, i):
+        """
+        Velocity samples of an event.
+
+        Args:
+            i (int): Position of the event in the catalog.
+
+        Returns:
+            numpy.memmap: Zero-copy view of the samples.
+        """
+        return self.velocity[self.offsets[i]:self.offsets[i] + self.lengths[i]]
+
+    def times(self, i):
+        """
+        Relative time of each sample of an event, rebuilt from its start time and sampling rate.
+
+        Args:
+            i (int): Position of the event in the catalog.
+
+        Returns:
+            numpy.ndarray: Time values in seconds.
+        """
+        if self.lengths[i] == 0:
+            return np.zeros(0)
+        if self.lengths[i] == 1:
+            return np.array([self.start_time[i]])
+        return self.start_time[i] + np.arange(self.lengths[i]) / self.sampling_rate[i]
+
+    def row(self, i):
+        """
+        Metadata and arrays of an event, with the same keys as a row of the original HDF5 file.
+
+        Args:
+            i (int): Position of the event in the catalog.
+
+        Returns:
+            dict: Event row.
+        """
+        row = self.catalog.iloc[i].to_dict()
+        row[self.time_column] = self.times(i)
+        row[self.velocity_column] = self.trace(i)
+        return row
+
+    def iterrows(self, start=0, stop=None):
+        """
+        Iterate over the events like pandas.DataFrame.iterrows.
+
+        Args:
+            start (int): Position of the first event.
+            stop (int or None): Position to stop at (default is the end of the catalog).
+
+        Yields:
+            tuple: Catalog index and row of each event.
+        """
+        for i in range(*slice(start, stop).indices(len(self))):
+            yield self.catalog.index[i], self.row(i)
+
+
+def compact_catalog(path):
+    """
+    Rewrite velocity.bin with only the samples of the current events, in catalog order.
+
+    Args:
+        path (str): Directory of the catalog.
+
+    Returns:
+        int: Number of samples reclaimed.
+    """
+    catalog = RaggedCatalog(path)
+    reclaimed = catalog.dead_samples
+    offsets = np.zeros(len(catalog), dtype=np.int64)
+    temp_path = os.path.join(path, 'velocity.bin.tmp')
+    with open(temp_path, 'wb') as f:
+        position = 0
+        for i in range(len(catalog)):
+            catalog.trace(i).tofile(f)
+            offsets[i] = position
+            position += catalog.lengths[i]
+
+    meta_path = os.path.join(path, 'meta.json')
+    with open(meta_path) as f:
+        meta = json.load(f)
+    del catalog
+
+    # Mark the catalog incomplete while the samples and their offsets are swapped
+    os.remove(meta_path)
+    os.replace(temp_path, os.path.join(path, 'velocity.bin'))
+    np.save(os.path.join(path, 'offsets.npy'), offsets)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return reclaimed
+
+
+def convert_h5(input_file, output_dir, key=None, dtype='float64'):
+    """
+    Convert an HDF5 file written by the dataset_creation scripts to a ragged catalog.
+
+    Args:
+        input_file (str): Path to the input HDF5 file (*.h5).
+        output_dir (str): Directory of the catalog to create.
+        key (str or None): Key of the data in the HDF5 file, None if it holds a single object.
+        dtype (str): Data type of the stored velocity samples.
+
+    Returns:
+        int: Number of converted events.
+    """
+    data = pd.read_hdf(input_file, key=key)
+    for time_column, velocity_column in ARRAY_COLUMN_LAYOUTS:
+        if time_column in data.columns and velocity_column in data.columns:
+            break
+    else:
+        raise ValueError(f"No time and velocity array columns found in {input_file}.")
+
+    metadata = data.drop(columns=[time_column, velocity_column])
+    with RaggedCatalogWriter(output_dir, time_column, velocity_column, dtype) as writer:
+        for i in range(len(data)):
+            writer.append(metadata.iloc[i].to_dict(), data[time_column].iloc[i], data[velocity_column].iloc[i])
+    return len(data)
+
+
+def parse_args():
+    # Set up argument parser to get command-line arguments
+    parser = argparse.ArgumentParser(description="Convert an HDF5 catalog to the memory-mappable ragged format.")
+
+    # Argument for the path to the *.h5 input file
+    parser.add_argument(
+        '--input_file',
+        type=str,
+        required=True,
+        help='Path to the input HDF5 file (*.h5)'
+    )
+
+    # Argument for the directory of the converted catalog
+    parser.add_argument(
+        '--output_dir',
+        type=str,
+        required=True,
+        help='Directory to write the ragged catalog to'
+    )
+
+    # Optional argument to select the HDF5 key
+    parser.add_argument(
+        '--key',
+        type=str,
+        default=None,
+        help='Key of the data in the HDF5 file (catalog_data, mars_training or processed_data).'
+    )
+
+    # Optional argument to store the velocity samples in single precision
+    parser.add_argument(
+        '--dtype',
+        type=str,
+        default='float64',
+        choices=['float64', 'float32'],
+        help='Precision of the stored velocity samples (float32 suits Inference.py --dtype float32).'
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    num_events = convert_h5(args.input_file, args.output_dir, key=args.key, dtype=args.dtype)
+    print(f"Converted {num_events} events from {args.input_file} to {args.output_dir}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+from Utils import array_digest
+import json
+import os
+import tempfile
+
+# Bump when a change of the detection code alters its results, so that older entries are never served
+CACHE_VERSION = 1
+
+
+class ResultCache:
+    """
+    Persistent, content-addressed cache of per-event detection results.
+
+    Each entry is a small JSON file named after the digest of the trace samples, the sampling
+    frequency and every detection parameter, so any change of the data or of the configuration
+    misses the cache. Entries are written atomically, which lets the worker processes of a pool
+    share the cache. Hits refresh the modification time of their file, and evict() deletes the
+    least recently used entries once the cache exceeds its size bound.
+    """
+
+    def __init__(self, path, max_bytes=256 * 2 ** 20):
+        """
+        Initialize the ResultCache class.
+
+        Args:
+            path (str): Directory of the cache, created if needed.
+            max_bytes (int): Disk usage above which evict() removes the least recently used entries.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(csv_data, fs, parameters):
+        """
+        Cache key of the detection of a trace.
+
+        Args:
+            csv_data (numpy.ndarray): Velocity samples of the trace.
+            fs (float): Sampling frequency.
+            parameters (tuple): Detection parameters, from SpectralFlux.detection_parameters.
+
+        Returns:
+            str: Hexadecimal digest.
+        """
+        return array_digest(csv_data, fs, CACHE_VERSION, *parameters)
+
+    def _entry_path(self, key):
+        # Spread entries over 256 subdirectories to keep directories small
+        return os.path.join(self.path, key[:2], f'{key}.json')
+
+    def get(self, key):
+        """
+        Look up the detection result of a key.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            tuple: Whether the key was found, and the cached onset time (None if no onset was detected).
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path) as f:
+                onset = json.load(f)['onset']
+        except (OSError, ValueError, KeyError):
+            return False, None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return True, onset
+
+    def put(self, key, onset):
+        """
+        Store the detection result of a key.
+
+        Args:
+            key (str): Cache key.
+            onset (float or None): Detected onset time in seconds, None if no onset was detected.
+        """
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'onset': None if onset is None else float(onset)}, f)
+        os.replace(temp_path, entry_path)
+
+    def evict(self):
+        """
+        Delete the least recently used entries until the cache fits in its size bound.
+
+        Returns:
+            int: Number of deleted entries.
+        """
+        entries = []
+        total = 0
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                stat = entry.stat()
+                # Count allocated blocks, since every entry takes at least one on disk
+                size = stat.st_blocks * 512 if hasattr(stat, 'st_blocks') else stat.st_size
+                entries.append((stat.st_mtime, size, entry.path))
+                total += size
+
+        removed = 0
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+
+# Output formats of the result writer
+RESULT_FORMATS = ['csv', 'parquet']
+
+# Columns of detections.csv, and the result columns they are taken from
+DETECTION_COLUMNS = {
+    'filename': 'filename',
+    'detection_time_abs': 'time_abs(%Y-%m-%dT%H:%M:%S.%f)',
+    'detection_time_rel': 'time_rel(sec)'
+}
+
+
+class ResultWriter:
+    """
+    Streaming, crash-resumable writer of per-event results.
+
+    Results are buffered in small batches and appended to the output: rows of a CSV file, or one
+    part file per batch in a Parquet directory. After every batch, a checkpoint records how many
+    events of the catalog are done (including skipped ones), the last of them, and the size of the
+    output at that point. On resume, the output is cut back to the checkpoint, which drops a batch
+    that was partly written when the previous run died, and the done events are skipped.
+    """
+
+    def __init__(self, output_dir, name, columns, float_columns=(), output_format='csv', batch_size=256,
+                 resume=False):
+        """
+        Initialize the ResultWriter class.
+
+        Args:
+            output_dir (str): Directory of the output and its checkpoint.
+            name (str): Base name of the output, e.g. 'results' for results.csv.
+            columns (list): Columns of the output, in order.
+            float_columns (iterable): Columns stored as floats, missing values becoming NaN.
+            output_format (str): 'csv', or 'parquet' (requires pyarrow).
+            batch_size (int): Number of events buffered before a batch is written.
+            resume (bool): Continue the output of a previous run from its checkpoint.
+
+        Raises:
+            ValueError: If the format is unknown or differs from the checkpoint of the resumed run.
+            ImportError: If Parquet output is requested without pyarrow.
+        """
+        if output_format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format: {output_format}")
+        if output_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet results require pyarrow (pip install pyarrow).")
+
+        self.columns = list(columns)
+        self.float_columns = set(float_columns)
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.path = os.path.join(output_dir, f'{name}.{output_format}')
+        self.checkpoint_path = os.path.join(output_dir, f'{name}.checkpoint.json')
+        self._records = []
+        self._pending_events = 0
+        self._last_event = None
+
+        checkpoint = None
+        if resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint['format'] != output_format:
+                raise ValueError(f"Cannot resume {checkpoint['format']} results as {output_format}.")
+
+        if checkpoint is not None:
+            self.num_done = checkpoint['num_events']
+            self.last_done = checkpoint['last_event']
+            self._size = checkpoint['size']
+            self._truncate()
+        else:
+            self.num_done = 0
+            self.last_done = None
+            self._start()
+            self._save_checkpoint()
+
+    def _start(self):
+        # Create an empty output, with the header only for CSV
+        if self.output_format == 'csv':
+            pd.DataFrame(columns=self.columns).to_csv(self.path, index=False)
+            self._size = os.path.getsize(self.path)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            for part in os.listdir(self.path):
+                os.remove(os.path.join(self.path, part))
+            self._size = 0
+
+    def _truncate(self):
+        # Drop whatever was written after the checkpoint
+        if self.output_format == 'csv':
+            with open(self.path, 'r+b') as f:
+                f.truncate(self._size)
+        else:
+            for part in os.listdir(self.path):
+                if part.endswith('.parquet') and int(part.split('-')[1].split('.')[0]) >= self._size:
+                    os.remove(os.path.join(self.path, part))
+
+    def _save_checkpoint(self):
+        checkpoint = {
+            'format': self.output_format,
+            'num_events': self.num_done,
+            'last_event': self.last_done,
+            'size': self._size  # bytes of the CSV file, or number of Parquet parts
+        }
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def add(self, event_id, record):
+        """
+        Record a finished event.
+
+        Args:
+            event_id: Identifier of the event, checked against the catalog when resuming.
+            record (dict or None): Result entry of the event, None if it was skipped or failed.
+        """
+        if record is not None:
+            self._records.append(record)
+        self._pending_events += 1
+        self._last_event = str(event_id)
+        if self._pending_events >= self.batch_size:
+            self.flush()
+
+    def _batch_frame(self):
+        batch = pd.DataFrame({column: [record[column] for record in self._records] for column in self.columns})
+        for column in self.float_columns:
+            batch[column] = pd.to_numeric(batch[column], errors='coerce').astype(np.float64)
+        return batch
+
+    def _write_batch(self, batch):
+        if self.output_format == 'csv':
+            with open(self.path, 'a', newline='') as f:
+                batch.to_csv(f, header=False, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            self._size = os.path.getsize(self.path)
+        else:
+            batch.to_parquet(os.path.join(self.path, f'part-{self._size:06d}.parquet'), index=False)
+            self._size += 1
+
+    def flush(self):
+        """
+        Write the buffered results and checkpoint the events done so far.
+        """
+        if self._pending_events == 0:
+            return
+        if self._records:
+            self._write_batch(self._batch_frame())
+
+        self.num_done += self._pending_events
+        self.last_done = self._last_event
+        self._records = []
+        self._pending_events = 0
+        self._save_checkpoint()
+
+    def extend(self, results, num_events, last_event):
+        """
+        Write a table of results at once, e.g. the results of a shard, and checkpoint its events.
+
+        Args:
+            results (pandas.DataFrame): Results with the columns of the writer.
+            num_events (int): Number of catalog events the table covers, including skipped ones.
+            last_event: Identifier of the last of these events.
+        """
+        self.flush()
+        if len(results) > 0:
+            batch = results[self.columns].copy()
+            for column in self.float_columns:
+                batch[column] = pd.to_numeric(batch[column], errors='coerce').astype(np.float64)
+            self._write_batch(batch)
+        self.num_done += num_events
+        self.last_done = str(last_event)
+        self._save_checkpoint()
+
+    def close(self):
+        """
+        Write the remaining results.
+        """
+        self.flush()
+
+    def iter_chunks(self, columns=None, chunksize=10000):
+        """
+        Read the written results back, a chunk at a time.
+
+        Args:
+            columns (list or None): Columns to read (default is all).
+            chunksize (int): Number of CSV rows per chunk (Parquet is read one part at a time).
+
+        Yields:
+            pandas.DataFrame: Chunk of results.
+        """
+        if self.output_format == 'csv':
+            yield from pd.read_csv(self.path, usecols=columns, chunksize=chunksize, float_precision='round_trip')
+        else:
+            for part in sorted(os.listdir(self.path)):
+                if part.endswith('.parquet'):
+                    yield pd.read_parquet(os.path.join(self.path, part), columns=columns)
+
+    def read(self, columns=None):
+        """
+        Read the written results back.
+
+        Args:
+            columns (list or None): Columns to read (default is all).
+
+        Returns:
+            pandas.DataFrame: All results.
+        """
+        chunks = list(self.iter_chunks(columns))
+        if not chunks:
+            return pd.DataFrame(columns=columns or self.columns)
+        return pd.concat(chunks, ignore_index=True)
+
+
+def write_detections(results, detect_file_path):
+    """
+    Save the file name and the absolute and relative detection times of the results, one chunk at a time.
+
+    Args:
+        results (ResultWriter): Writer of the results to read back.
+        detect_file_path (str): Path of the detections CSV file.
+    """
+    header = True
+    for chunk in results.iter_chunks(list(DETECTION_COLUMNS)):
+        # Rename columns to match the desired format
+        detect_df = chunk[list(DETECTION_COLUMNS)].rename(columns=DETECTION_COLUMNS)
+        detect_df.to_csv(detect_file_path, index=False, mode='w' if header else 'a', header=header)
+        header = False
+    if header:
+        pd.DataFrame(columns=list(DETECTION_COLUMNS.values())).to_csv(detect_file_path, index=False)
@@ -0,0 +1,483 @@
+from SpectralFluxMethod import SpectralFlux, RESULT_COLUMNS, RESULT_FLOAT_COLUMNS
+from CalculateMetric import Metrics
+from MetricsAggregator import MetricsAggregator
+from CatalogReader import open_catalog, CatalogSlice, CatalogIterator
+from RaggedCatalog import RaggedCatalog, convert_h5
+from ResultWriter import ResultWriter, write_detections
+from ResultCache import ResultCache
+from FFTBackend import FFT_BACKENDS
+import threading
+import argparse
+import socket
+import json
+import time
+import uuid
+import os
+
+# Shard plan written by the planner into the shard directory
+SHARD_MANIFEST = 'shards.json'
+
+# Ragged catalog an HDF5 input is converted to, inside the shard directory
+SHARD_CATALOG = 'catalog'
+
+# Result columns the metrics are computed from; the file name keys the bootstrap sample of each event, so
+# the samples of the shards merge into the sample of the whole catalog
+METRIC_COLUMNS = ['filename', 'onset_time_ground_truth', 'audio_duration', 'onset_time_predicted']
+
+
+def _write_json(path, value):
+    # Write a JSON file atomically, so readers on other hosts never see it half written
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(value, f, indent=1)
+    os.replace(temp_path, path)
+
+
+class ShardLock:
+    """
+    Lock file claiming a shard for one worker, shared through the filesystem.
+
+    The lock is created with O_CREAT | O_EXCL, which is atomic on local filesystems and on NFSv3 or
+    later, so exactly one worker of any host gets a shard. While it is held, a background thread
+    refreshes the modification time of the file. With a timeout, a lock whose file has not been
+    refreshed for that long is treated as left by a dead worker and broken, so that its shard can be
+    claimed again; the new owner resumes the shard from its results checkpoint.
+    """
+
+    def __init__(self, path, owner, timeout=None):
+        """
+        Initialize the ShardLock class.
+
+        Args:
+            path (str): Path of the lock file.
+            owner (str): Identifier of the worker, recorded in the lock file.
+            timeout (float or None): Seconds without a refresh after which a lock is stale (None never breaks locks).
+        """
+        self.path = path
+        self.owner = owner
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def acquire(self):
+        """
+        Try to claim the lock, without waiting.
+
+        Returns:
+            bool: True if the lock is now held by this worker.
+        """
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if self.timeout is None or not self._break_stale():
+                return False
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'owner': self.owner, 'token': self.token}, f)
+
+        if self.timeout is not None:
+            self._heartbeat = threading.Thread(target=self._refresh, daemon=True)
+            self._heartbeat.start()
+        return True
+
+    def _refresh(self):
+        while not self._stop.wait(self.timeout / 4):
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def _break_stale(self):
+        # Move a stale lock aside; only one of the workers racing for it can rename it
+        try:
+            age = time.time() - os.stat(self.path).st_mtime
+            with open(self.path) as f:
+                content = f.read()
+        except FileNotFoundError:
+            return True
+        if age < self.timeout:
+            return False
+        aside = f'{self.path}.{self.token}.stale'
+        try:
+            os.rename(self.path, aside)
+        except FileNotFoundError:
+            return True
+
+        # Another worker may have broken the stale lock and claimed the shard in the meantime
+        with open(aside) as f:
+            if f.read() != content:
+                try:
+                    os.link(aside, self.path)
+                except FileExistsError:
+                    pass
+                os.remove(aside)
+                return False
+        os.remove(aside)
+        print(f"Broke stale lock {self.path} ({age:.0f} s old): {content.strip()}")
+        return True
+
+    def release(self):
+        """
+        Release the lock if it is still held by this worker.
+        """
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        try:
+            with open(self.path) as f:
+                if json.load(f)['token'] != self.token:
+                    return
+            os.remove(self.path)
+        except (OSError, ValueError, KeyError):
+            pass
+
+
+def load_manifest(shard_dir):
+    """
+    Load the shard plan of a shard directory.
+
+    Args:
+        shard_dir (str): Shard directory written by plan_shards.
+
+    Returns:
+        dict: Input file, landscape, mode, detection options, number of events and shards.
+    """
+    with open(os.path.join(shard_dir, SHARD_MANIFEST)) as f:
+        return json.load(f)
+
+
+def plan_shards(input_file, shard_dir, landscape='lunar', mode='test', shard_size=1000, decimate=False,
+                prescreen=False, chunk_time=None, results_format='csv', dtype='float64', fft_backend='scipy',
+                fft_pad=False):
+    """
+    Split the events of a catalog into shards of consecutive events and write the plan.
+
+    An HDF5 input is converted once to a ragged catalog in the shard directory, which the shards read
+    instead: the traces of an HDF5 file are one pickled blob, which every shard would otherwise unpickle
+    whole to read its own events.
+
+    Args:
+        input_file (str): HDF5 file or ragged catalog directory, on the filesystem shared by the workers.
+        shard_dir (str): Directory of the plan, the locks and the partial results of the shards.
+        landscape (str): 'lunar' or 'mars'.
+        mode (str): 'train' to compute metrics, or 'test'.
+        shard_size (int): Number of events per shard.
+        decimate (bool): Detector option, see SpectralFlux.
+        prescreen (bool): Detector option, see SpectralFlux.
+        chunk_time (float or None): Detector option, see SpectralFlux.
+        results_format (str): Format of the results, 'csv' or 'parquet'.
+        dtype (str): Detector option, see SpectralFlux.
+        fft_backend (str): Detector option, see SpectralFlux; it must be installed on every worker host.
+        fft_pad (bool): Detector option, see SpectralFlux.
+
+    Returns:
+        dict: The shard plan.
+
+    Raises:
+        ValueError: If the detector options cannot be combined, or the directory already holds another plan.
+    """
+    # Check the options before any worker runs with them
+    SpectralFlux(None, None, landscape, decimate=decimate, prescreen=prescreen, chunk_time=chunk_time, dtype=dtype,
+                 fft_backend=fft_backend, fft_pad=fft_pad)
+
+    manifest_path = os.path.join(shard_dir, SHARD_MANIFEST)
+    existing = load_manifest(shard_dir) if os.path.exists(manifest_path) else None
+    source_file = os.path.abspath(input_file)
+    if not RaggedCatalog.is_catalog(input_file):
+        if existing is not None and existing.get('source_file', existing['input_file']) != source_file:
+            raise ValueError(f"{shard_dir} already holds a different shard plan; use a new directory.")
+        catalog_dir = os.path.join(shard_dir, SHARD_CATALOG)
+        if not RaggedCatalog.is_catalog(catalog_dir):
+            print(f"Converting {input_file} to a ragged catalog in {catalog_dir}")
+            convert_h5(input_file, catalog_dir, key=CatalogIterator(input_file).key)
+        input_file = catalog_dir
+
+    num_events = len(open_catalog(input_file))
+    manifest = {
+        'input_file': os.path.abspath(input_file),
+        'source_file': source_file,
+        'landscape': landscape,
+        'mode': mode,
+        'options': {
+            'decimate': decimate,
+            'prescreen': prescreen,
+            'chunk_time': chunk_time,
+            'results_format': results_format,
+            'dtype': dtype,
+            'fft_backend': fft_backend,
+            'fft_pad': fft_pad
+        },
+        'num_events': num_events,
+        'shards': [{'id': f'shard-{number:05d}', 'start': start, 'stop': min(start + shard_size, num_events)}
+                   for number, start in enumerate(range(0, num_events, shard_size))]
+    }
+
+    if existing is not None:
+        if existing != manifest:
+            raise ValueError(f"{shard_dir} already holds a different shard plan; use a new directory.")
+        return manifest
+    os.makedirs(shard_dir, exist_ok=True)
+    _write_json(manifest_path, manifest)
+    return manifest
+
+
+def _shard_paths(shard_dir, shard):
+    # Output directory, lock file and completion marker of a shard
+    output_dir = os.path.join(shard_dir, shard['id'])
+    return output_dir, f'{output_dir}.lock', os.path.join(output_dir, 'done.json')
+
+
+def run_shard(manifest, shard, shard_dir, data, workers=1, plots='none', plot_workers=1, cache=None, owner=None,
+              fft_workers=1, prefetch=0):
+    """
+    Run detection on the events of one shard and write its partial results.
+
+    Args:
+        manifest (dict): Shard plan.
+        shard (dict): Shard of the plan.
+        shard_dir (str): Shard directory.
+        data (RaggedCatalog or CatalogIterator): Catalog of the plan.
+        workers (int): Number of processes running the events of the shard.
+        plots (str): Which events get images: 'none', 'sample' or 'all'.
+        plot_workers (int): Number of processes rendering images in the background.
+        cache (ResultCache or None): Persistent cache of per-event detection results.
+        owner (str or None): Identifier of the worker, recorded in the completion marker.
+        fft_workers (int): Number of threads of each batch of FFTs.
+        prefetch (int): Number of events read ahead of the detection, see SpectralFlux.
+    """
+    output_dir, _, done_path = _shard_paths(shard_dir, shard)
+    os.makedirs(output_dir, exist_ok=True)
+    options = manifest['options']
+    start = time.perf_counter()
+
+    # A shard claimed after its previous owner died is resumed from its results checkpoint
+    results = SpectralFlux(output_dir, CatalogSlice(data, shard['start'], shard['stop']), manifest['landscape'],
+                           workers, plots, plot_workers, None, cache, options['decimate'], options['prescreen'],
+                           options['results_format'], True, options['chunk_time'],
+                           options['dtype'], options.get('fft_backend', 'scipy'), fft_workers,
+                           options.get('fft_pad', False), prefetch).onset_detection()
+
+    if manifest['mode'] == 'train':
+        aggregator = MetricsAggregator()
+        for chunk in results.iter_chunks(METRIC_COLUMNS):
+            aggregator.update(chunk)
+        aggregator.save(os.path.join(output_dir, 'metrics.json'))
+
+    _write_json(done_path, {
+        'num_events': results.num_done,
+        'last_event': results.last_done,
+        'worker': owner,
+        'seconds': time.perf_counter() - start
+    })
+
+
+def work_shards(shard_dir, workers=1, plots='none', plot_workers=1, cache=None, lock_timeout=None,
+                max_shards=None, fft_workers=1, prefetch=0):
+    """
+    Claim and run the pending shards of a plan until none is left.
+
+    Any number of these workers can run at once, on one or several hosts sharing the shard directory.
+
+    Args:
+        shard_dir (str): Shard directory written by plan_shards.
+        workers (int): Number of processes running the events of each shard.
+        plots (str): Which events get images: 'none', 'sample' or 'all'.
+        plot_workers (int): Number of processes rendering images in the background.
+        cache (ResultCache or None): Persistent cache of per-event detection results.
+        lock_timeout (float or None): Seconds after which the lock of an unresponsive worker is broken.
+        max_shards (int or None): Number of shards after which to stop (default is no limit).
+        fft_workers (int): Number of threads of each batch of FFTs.
+        prefetch (int): Number of events read ahead of the detection, see SpectralFlux.
+
+    Returns:
+        int: Number of shards run by this worker.
+
+    Raises:
+        ValueError: If the catalog does not have the number of events of the plan.
+    """
+    manifest = load_manifest(shard_dir)
+    data = open_catalog(manifest['input_file'])
+    if len(data) != manifest['num_events']:
+        raise ValueError(f"{manifest['input_file']} has {len(data)} events, but the plan has "
+                         f"{manifest['num_events']}.")
+
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    num_run = 0
+    for shard in manifest['shards']:
+        if max_shards is not None and num_run >= max_shards:
+            break
+        _, lock_path, done_path = _shard_paths(shard_dir, shard)
+        if os.path.exists(done_path):
+            continue
+        lock = ShardLock(lock_path, owner, lock_timeout)
+        if not lock.acquire():
+            continue
+        try:
+            # The shard may have been completed between the check and the claim
+            if os.path.exists(done_path):
+                continue
+            print(f"Worker {owner} running {shard['id']} (events {shard['start']} to {shard['stop'] - 1}).")
+            run_shard(manifest, shard, shard_dir, data, workers, plots, plot_workers, cache, owner, fft_workers,
+                      prefetch)
+            num_run += 1
+        finally:
+            lock.release()
+    return num_run
+
+
+def shard_status(shard_dir):
+    """
+    State of each shard of a plan.
+
+    Args:
+        shard_dir (str): Shard directory written by plan_shards.
+
+    Returns:
+        dict: 'done', 'running' or 'pending' for each shard identifier.
+    """
+    status = {}
+    for shard in load_manifest(shard_dir)['shards']:
+        _, lock_path, done_path = _shard_paths(shard_dir, shard)
+        if os.path.exists(done_path):
+            status[shard['id']] = 'done'
+        elif os.path.exists(lock_path):
+            status[shard['id']] = 'running'
+        else:
+            status[shard['id']] = 'pending'
+    return status
+
+
+def merge_shards(shard_dir, output_folder):
+    """
+    Combine the partial results of all shards into the outputs of a single Inference.py run.
+
+    Writes results.csv (or the Parquet directory), detections.csv and, in train mode, the metrics
+    merged from the sketches of the shards.
+
+    Args:
+        shard_dir (str): Shard directory written by plan_shards.
+        output_folder (str): Folder to save the merged results.
+
+    Returns:
+        ResultWriter or None: Writer of the merged results, None if some shards are not done.
+    """
+    manifest = load_manifest(shard_dir)
+    pending = [shard_id for shard_id, state in shard_status(shard_dir).items() if state != 'done']
+    if pending:
+        print(f"Cannot merge, {len(pending)} shards are not done: {', '.join(pending)}")
+        return None
+
+    os.makedirs(output_folder, exist_ok=True)
+    results_format = manifest['options']['results_format']
+    merged = ResultWriter(output_folder, 'results', RESULT_COLUMNS, RESULT_FLOAT_COLUMNS, results_format)
+    aggregator = MetricsAggregator() if manifest['mode'] == 'train' else None
+    for shard in manifest['shards']:
+        output_dir, _, _ = _shard_paths(shard_dir, shard)
+        part = ResultWriter(output_dir, 'results', RESULT_COLUMNS, RESULT_FLOAT_COLUMNS, results_format,
+                            resume=True)
+        merged.extend(part.read(), part.num_done, part.last_done)
+        if aggregator is not None:
+            aggregator.merge(MetricsAggregator.load(os.path.join(output_dir, 'metrics.json')))
+    merged.close()
+    print(f"Merged {len(manifest['shards'])} shards ({merged.num_done} events) into {output_folder}")
+
+    if aggregator is not None:
+        Metrics(aggregator, output_folder, manifest['landscape'],
+                manifest.get('source_file', manifest['input_file'])).calculate_metrics()
+
+    detect_file_path = os.path.join(output_folder, "detections.csv")
+    write_detections(merged, detect_file_path)
+    print(f"Detections DataFrame saved to {detect_file_path}")
+    return merged
+
+
+def parse_args():
+    # Set up argument parser with one command per step of a sharded run
+    parser = argparse.ArgumentParser(description="Run onset detection over shards of a catalog, with any number "
+                                                 "of workers on hosts sharing a filesystem.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan = subparsers.add_parser('plan', help='Split the events of a catalog into shards.')
+    plan.add_argument('--input_file', type=str, required=True,
+                      help='Path to the input HDF5 file (*.h5) or ragged catalog directory')
+    plan.add_argument('--landscape', type=str, default='lunar', choices=['lunar', 'mars'],
+                      help='Specify landscape type.')
+    plan.add_argument('--mode', type=str, default='test', choices=['train', 'test'],
+                      help='train to compute metrics when merging, test otherwise.')
+    plan.add_argument('--shard_size', type=int, default=1000, help='Number of events per shard (default is 1000).')
+    plan.add_argument('--decimate', action='store_true', help='Detector option, see Inference.py.')
+    plan.add_argument('--prescreen', action='store_true', help='Detector option, see Inference.py.')
+    plan.add_argument('--chunk_time', type=float, default=None, help='Detector option, see Inference.py.')
+    plan.add_argument('--dtype', type=str, default='float64', choices=['float64', 'float32'],
+                      help='Detector option, see Inference.py.')
+    plan.add_argument('--fft_backend', type=str, default='scipy', choices=FFT_BACKENDS,
+                      help='Detector option, see Inference.py.')
+    plan.add_argument('--fft_pad', action='store_true', help='Detector option, see Inference.py.')
+    plan.add_argument('--results_format', type=str, default='csv', choices=['csv', 'parquet'],
+                      help='Format of the per-event results (default is csv).')
+
+    work = subparsers.add_parser('work', help='Claim and run pending shards until none is left.')
+    work.add_argument('--workers', type=int, default=1,
+                      help='Number of processes running the events of each shard (default is 1).')
+    work.add_argument('--plots', type=str, default='none', choices=['none', 'sample', 'all'],
+                      help='Render images into the shard folders for no event (default), one in ten or every event.')
+    work.add_argument('--plot_workers', type=int, default=1,
+                      help='Number of processes rendering images in the background (default is 1).')
+    work.add_argument('--no_cache', action='store_true', help='Do not use the result cache.')
+    work.add_argument('--cache_dir', type=str, default='.result_cache',
+                      help='Directory of the result cache (default is .result_cache).')
+    work.add_argument('--cache_max_mb', type=float, default=256,
+                      help='Disk usage in MB above which cache entries are evicted (default is 256).')
+    work.add_argument('--fft_workers', type=int, default=1,
+                      help='Number of threads of each batch of FFTs (default is 1).')
+    work.add_argument('--prefetch', type=int, default=0,
+                      help='Number of events read ahead of the detection (default is 0), see Inference.py.')
+    work.add_argument('--lock_timeout', type=float, default=None,
+                      help='Seconds after which the lock of an unresponsive worker is broken and its shard '
+                           'resumed by another worker (default is never).')
+    work.add_argument('--max_shards', type=int, default=None,
+                      help='Stop after running this many shards (default is no limit).')
+
+    merge = subparsers.add_parser('merge', help='Combine the results of all shards.')
+    merge.add_argument('--output_folder', type=str, required=True, help='Folder to save the merged results')
+
+    subparsers.add_parser('status', help='Show the state of each shard.')
+
+    for subparser in (plan, work, merge, subparsers.choices['status']):
+        subparser.add_argument('--shard_dir', type=str, required=True,
+                               help='Directory of the shard plan, locks and partial results.')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'plan':
+        try:
+            manifest = plan_shards(args.input_file, args.shard_dir, args.landscape, args.mode, args.shard_size,
+                                   args.decimate, args.prescreen, args.chunk_time, args.results_format,
+                                   args.dtype, args.fft_backend, args.fft_pad)
+        except (ValueError, ImportError) as e:
+            print(e)
+            return
+        print(f"Planned {len(manifest['shards'])} shards of {manifest['num_events']} events in {args.shard_dir}")
+    elif args.command == 'work':
+        cache = None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_mb * 2 ** 20))
+        num_run = work_shards(args.shard_dir, args.workers, args.plots, args.plot_workers, cache,
+                              args.lock_timeout, args.max_shards, args.fft_workers,
+                              args.prefetch)
+        print(f"Ran {num_run} shards.")
+    elif args.command == 'merge':
+        merge_shards(args.shard_dir, args.output_folder)
+    else:
+        for shard_id, state in shard_status(args.shard_dir).items():
+            print(f"{shard_id}: {state}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
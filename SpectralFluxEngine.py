@@ -0,0 +1,171 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import gaussian_filter1d
+from FFTBackend import FFTBackend
+
+
+# Upper bound for the memory used by the spectra of one chunk of a batch, kept within the CPU caches
+BATCH_CHUNK_BYTES = 2 * 1024 ** 2
+
+
+class SpectralFluxEngine:
+    """
+    Vectorized spectral flux computation over all frames of a signal.
+
+    Frames are taken as a strided view of the signal, transformed with one batched
+    real FFT per chunk of frames and differenced in a single vectorized step. The
+    result equals the frame-by-frame full-spectrum computation: the magnitude
+    spectrum of a real frame is symmetric, so every mirrored bin of the real FFT is
+    counted twice. Single-precision signals stay in single precision throughout. The FFTs run on an
+    FFTBackend, which may zero-pad the frames to a fast length.
+    """
+
+    def __init__(self, window_size, hop_size, max_chunk_bytes=64 * 1024 ** 2, fft=None):
+        """
+        Initialize the SpectralFluxEngine class.
+
+        Args:
+            window_size (int): Size of the window for FFT.
+            hop_size (int): Step size for the window.
+            max_chunk_bytes (int): Upper bound for the memory used by the spectra of one chunk of frames.
+            fft (FFTBackend or None): FFT implementation, scipy.fft without padding if None.
+        """
+        self.window_size = window_size
+        self.hop_size = hop_size
+        self.fft = fft if fft is not None else FFTBackend()
+        self.fft_size = self.fft.fft_size(window_size)
+        self.chunk_frames = max(1, max_chunk_bytes // (16 * (self.fft_size // 2 + 1)))
+
+        # Weight of each real FFT bin in the full spectrum (mirrored bins count twice)
+        self.bin_weights = np.ones(self.fft_size // 2 + 1)
+        self.bin_weights[1:(self.fft_size + 1) // 2] = 2
+
+    def num_windows(self, num_samples):
+        """
+        Number of frames analysed for a signal of the given length.
+
+        Args:
+            num_samples (int): Length of the signal.
+
+        Returns:
+            int: Number of frames.
+        """
+        return max(1, (num_samples - self.window_size) // self.hop_size)
+
+    def raw_flux(self, signal, start=0, stop=None):
+        """
+        Compute the unsmoothed spectral flux of the input signal.
+
+        Args:
+            signal (numpy.ndarray): The input signal array.
+            start (int): First frame to compute.
+            stop (int or None): Frame to stop at (default is the last frame). The flux of a frame
+                range equals the same frames of the full computation.
+
+        Returns:
+            numpy.ndarray: Spectral flux per frame, the first frame of the signal always being zero.
+        """
+        num_windows = self.num_windows(len(signal))
+        stop = num_windows if stop is None else min(stop, num_windows)
+        spectral_flux = np.zeros(stop - start, dtype=np.result_type(signal.dtype, np.float32))
+        if num_windows == 1:
+            return spectral_flux
+
+        frames = sliding_window_view(signal, self.window_size)[::self.hop_size][:num_windows]
+        prev_spectrum = self.fft.magnitude(frames[start - 1], self.fft_size) if start > 0 else None
+        for chunk_start in range(start, stop, self.chunk_frames):
+            chunk_stop = min(chunk_start + self.chunk_frames, stop)
+            spectral_flux[chunk_start - start:chunk_stop - start], prev_spectrum = self.frame_flux(
+                frames[chunk_start:chunk_stop], prev_spectrum)
+
+        return spectral_flux
+
+    def batch_raw_flux(self, signals):
+        """
+        Compute the unsmoothed spectral flux of a batch of equal-length signals in one vectorized pass.
+
+        The frames of all signals are transformed together, in chunks of frames small enough for the
+        spectra of the whole batch to stay in the CPU caches; each row of the result equals raw_flux
+        of the corresponding signal, up to the rounding of the weighted sum over bins.
+
+        Args:
+            signals (numpy.ndarray): Signals of shape (num_signals, num_samples).
+
+        Returns:
+            numpy.ndarray: Spectral flux of shape (num_signals, num_windows).
+        """
+        num_signals, num_samples = signals.shape
+        num_windows = self.num_windows(num_samples)
+        spectral_flux = np.zeros((num_signals, num_windows), dtype=np.result_type(signals.dtype, np.float32))
+        if num_windows == 1:
+            return spectral_flux
+
+        frames = sliding_window_view(signals, self.window_size, axis=-1)[:, ::self.hop_size][:, :num_windows]
+        chunk_frames = max(1, BATCH_CHUNK_BYTES // (16 * (self.fft_size // 2 + 1) * num_signals))
+        bin_weights = self.bin_weights.astype(spectral_flux.dtype)
+        prev_spectra = None
+        for chunk_start in range(0, num_windows, chunk_frames):
+            chunk_stop = min(chunk_start + chunk_frames, num_windows)
+            spectra = self.fft.magnitude(frames[:, chunk_start:chunk_stop], self.fft_size)
+            prepend = spectra[:, :1] if prev_spectra is None else prev_spectra[:, np.newaxis]
+            spectral_flux[:, chunk_start:chunk_stop] = (np.diff(spectra, axis=1, prepend=prepend) ** 2) @ bin_weights
+            prev_spectra = spectra[:, -1]
+        return spectral_flux
+
+    def frame_flux(self, frames, prev_spectrum=None):
+        """
+        Compute the spectral flux of consecutive frames with one batched real FFT.
+
+        Args:
+            frames (numpy.ndarray): Frames of shape (num_frames, window_size).
+            prev_spectrum (numpy.ndarray or None): Magnitude spectrum of the frame preceding the first one.
+                If None, the flux of the first frame is zero.
+
+        Returns:
+            tuple: Spectral flux of each frame and the magnitude spectrum of the last frame.
+        """
+        spectra = self.fft.magnitude(frames, self.fft_size)
+        if prev_spectrum is None:
+            diff = np.diff(spectra, axis=0, prepend=spectra[:1])
+        else:
+            diff = np.diff(spectra, axis=0, prepend=prev_spectrum[np.newaxis])
+        return (diff ** 2) @ self.bin_weights.astype(spectra.dtype, copy=False), spectra[-1]
+
+    def time_values(self, num_windows, fs):
+        """
+        Start time of each frame in seconds.
+
+        Args:
+            num_windows (int): Number of frames.
+            fs (float): Sampling frequency.
+
+        Returns:
+            numpy.ndarray: Time values of the frames.
+        """
+        # Built in place, with the same rounding as np.arange(num_windows) * hop_size / fs
+        time_vals = np.arange(num_windows, dtype=np.float64)
+        time_vals *= self.hop_size
+        time_vals /= fs
+        return time_vals
+
+    def compute(self, signal, fs, smooth=True):
+        """
+        Compute the spectral flux of the input signal.
+
+        Args:
+            signal (numpy.ndarray): The input signal array, float32 or float64.
+            fs (float): Sampling frequency.
+            smooth (bool): Whether to smooth the spectral flux or not.
+
+        Returns:
+            tuple: Spectral flux array (in the precision of the signal) and corresponding time values.
+        """
+        signal = np.asarray(signal)
+        if signal.dtype != np.float32:
+            signal = signal.astype(float, copy=False)
+        spectral_flux = self.raw_flux(signal)
+        time_vals = self.time_values(len(spectral_flux), fs)
+
+        if smooth:
+            spectral_flux = gaussian_filter1d(spectral_flux, sigma=2)
+        return spectral_flux, time_vals
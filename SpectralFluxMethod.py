@@ -1,29 +1,103 @@
 import numpy as np
-from scipy.fftpack import fft
-from scipy.signal import find_peaks
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import find_peaks, resample_poly
 from scipy.ndimage import gaussian_filter1d
-from Utils import SaveImages
+from Plotting import PlotRenderer
 from LowPassFilter import LPassFilter
+from SpectralFluxEngine import SpectralFluxEngine
+from FFTBackend import FFTBackend
+from StaLtaScreen import StaLtaScreen
+from Profiler import StageProfiler
+from Pipeline import Prefetcher, BackgroundConsumer, warm_row
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 import os
-import pandas as pd
 from datetime import timedelta
+import time
+
+# Columns of the results.csv file, in order
+RESULT_COLUMNS = ['evid', 'filename', 'onset_time_ground_truth', 'audio_duration', 'onset_time_predicted',
+                  'detection_time_abs', 'detection_time_rel']
+
+# Columns of the results holding times, stored as floats (NaN when missing)
+RESULT_FLOAT_COLUMNS = ['onset_time_ground_truth', 'audio_duration', 'onset_time_predicted', 'detection_time_rel']
+
+# Floating point precisions the detection can run in
+COMPUTE_DTYPES = ['float64', 'float32']
+
+# Sigma of the Gaussian smoothing of the flux, and the frames its kernel reaches on each side
+FLUX_SMOOTHING_SIGMA = 2
+FLUX_SMOOTHING_RADIUS = 4 * FLUX_SMOOTHING_SIGMA
+
 
 class SpectralFlux:
-    def __init__(self, save_result_dir, data, landscape):
+    def __init__(self, save_result_dir, data, landscape, workers=1, plots='all', plot_workers=1, profiler=None,
+                 cache=None, decimate=False, prescreen=False, results_format='csv', resume=False, chunk_time=None,
+                 dtype='float64', fft_backend='scipy', fft_workers=1, fft_pad=False, prefetch=0):
         """
         Initialize the SpectralFlux class.
 
         Args:
             save_result_dir (str): Directory to save the result images and files.
-            data (pandas.DataFrame): DataFrame containing seismic data.
+            data (pandas.DataFrame, RaggedCatalog or CatalogIterator): Seismic data, iterated event by event with iterrows().
             landscape (str): Type of landscape, 'lunar' or 'mars'.
+            workers (int): Number of processes used to run events in parallel (1 runs them serially).
+            plots (str): Which events get images: 'none', 'sample' or 'all'.
+            plot_workers (int): Number of processes rendering images in the background.
+            profiler (StageProfiler or None): Per-stage timers, disabled if None.
+            cache (ResultCache or None): Persistent cache of per-event detection results, unused if None.
+            decimate (bool): Lower the sampling rate to just above twice the cutoff after filtering,
+                so that the spectral flux only covers frequencies the filter keeps.
+            prescreen (bool): Compute the spectral flux only around the candidate regions found by an
+                STA/LTA pass, falling back to the full trace when nothing triggers.
+            results_format (str): Format of the streamed results, 'csv' or 'parquet'.
+            resume (bool): Skip the events completed by a previous run, from the results checkpoint.
+            chunk_time (float or None): Filter traces and compute their spectral flux in overlapping blocks
+                of this many seconds, so that only one block is held in float64 at a time (None processes
+                whole traces).
+            dtype (str): Precision of the filtering, spectral flux and peak picking, 'float64' or
+                'float32' (half the memory and bandwidth of the traces, spectra and flux).
+            fft_backend (str): FFT implementation of the spectral flux, 'scipy', 'numpy' or 'pyfftw'.
+            fft_workers (int): Number of threads of each batch of FFTs.
+            fft_pad (bool): Zero-pad the FFT frames to a fast length, which changes the flux.
+            prefetch (int): Number of events read ahead by a reader thread, results and images being
+                handed to a writer thread as well (0 reads, computes and writes in turn).
+
+        Raises:
+            ValueError: If chunked processing is combined with decimation or the pre-screen, or the
+                precision or FFT backend is unknown.
+            ImportError: If the 'pyfftw' backend is selected but pyFFTW is not installed.
         """
+        if dtype not in COMPUTE_DTYPES:
+            raise ValueError(f"Unknown compute dtype: {dtype}")
+        if chunk_time is not None and (decimate or prescreen):
+            raise ValueError("Chunked processing cannot be combined with decimation or the pre-screen.")
         self.data = data
+        self.landscape = landscape
+        self.workers = workers
+        self.plots = plots
+        self.plot_workers = plot_workers
+        self.profiler = profiler if profiler is not None else StageProfiler()
+        self.cache = cache
+        self.decimate = decimate
+        self.prescreen = prescreen
+        self.results_format = results_format
+        self.resume = resume
+        self.chunk_time = chunk_time
+        self.dtype = np.dtype(dtype)
+        self.fft = FFTBackend(fft_backend, workers=fft_workers, pad=fft_pad)
+        self.prefetch = prefetch
+        self.screen = StaLtaScreen()
         self.save_result_dir = save_result_dir
         self.butter_bandpass_filter = LPassFilter()
-        self.saver = SaveImages()
         self.landscape_cutoff_mapping = {'lunar': 1, 'mars': 2.19}
         self.cutoff = self.landscape_cutoff_mapping.get(landscape, None)
+        self.filter_order = 4
+        self.window_time = 0.2  # FFT window length in seconds
+        self.hop_time = 0.05  # Step between FFT windows in seconds
+        self.height_factor = 0.3  # Fraction of the maximum flux a peak must reach
+        self.min_time_between_peaks = 0.1  # 100 ms
+        self._flux_engines = {}
 
     def _compute_spectral_flux(self, signal, fs, window_size, hop_size, smooth=True):
         """
@@ -39,134 +113,702 @@ class SpectralFlux:
         Returns:
             tuple: Spectral flux array and corresponding time values.
         """
-        num_windows = max(1, (len(signal) - window_size) // hop_size)
-        spectral_flux = np.zeros(num_windows)
-        time_vals = np.zeros(num_windows)
+        return self._flux_engine(window_size, hop_size).compute(signal, fs, smooth=smooth)
+
+    def _flux_engine(self, window_size, hop_size):
+        key = (window_size, hop_size)
+        if key not in self._flux_engines:
+            self._flux_engines[key] = SpectralFluxEngine(window_size, hop_size, fft=self.fft)
+        return self._flux_engines[key]
+
+    def _region_flux(self, signal, fs, window_size, hop_size, regions):
+        """
+        Compute the smoothed spectral flux over the frames of the candidate regions only.
+
+        Each region is extended by the reach of the smoothing kernel, so that the flux of its own
+        frames equals the full-trace computation.
+
+        Args:
+            signal (numpy.ndarray): The filtered signal array.
+            fs (float): Sampling frequency.
+            window_size (int): Size of the window for FFT.
+            hop_size (int): Step size for the window.
+            regions (list): (start, stop) sample ranges from StaLtaScreen.regions.
+
+        Returns:
+            list: Smoothed flux, time values and the (start, stop) positions of the region's own
+                frames for each segment, in increasing time order.
+        """
+        engine = self._flux_engine(window_size, hop_size)
+        num_windows = engine.num_windows(len(signal))
+        frame_ranges = []
+        for start, stop in regions:
+            first = max(0, start // hop_size - FLUX_SMOOTHING_RADIUS)
+            last = min(num_windows, -(-stop // hop_size) + FLUX_SMOOTHING_RADIUS)
+            if frame_ranges and first <= frame_ranges[-1][1]:
+                frame_ranges[-1] = (frame_ranges[-1][0], max(frame_ranges[-1][1], last))
+            else:
+                frame_ranges.append((first, last))
+
+        segments = []
+        for first, last in frame_ranges:
+            spectral_flux = engine.raw_flux(signal, first, last)
+            spectral_flux = gaussian_filter1d(spectral_flux, sigma=FLUX_SMOOTHING_SIGMA)
+            time_vals = np.arange(first, last) * hop_size / fs
+            own_start = 0 if first == 0 else FLUX_SMOOTHING_RADIUS
+            own_stop = len(spectral_flux) if last == num_windows else len(spectral_flux) - FLUX_SMOOTHING_RADIUS
+            if own_stop > own_start:
+                segments.append((spectral_flux, time_vals, own_start, own_stop))
+        return segments
+
+    def _chunked_flux(self, csv_data, fs, window_size, hop_size):
+        """
+        Filter the trace and compute its smoothed spectral flux one block of frames at a time.
+
+        Each block is filtered with the samples its frames cover plus the settling length of the
+        filter on each side, so its filtered samples match the whole-trace filtering up to the
+        settling tolerance; the spectrum of the last frame of a block seeds the flux of the next one.
+        Only the flux, one value per frame, is kept for the whole trace; frame k starts at k * hop_size / fs.
+
+        Args:
+            csv_data (numpy.ndarray): Velocity samples of the trace, possibly memory-mapped.
+            fs (float): Sampling frequency.
+            window_size (int): Size of the window for FFT.
+            hop_size (int): Step size for the window.
+
+        Returns:
+            numpy.ndarray: Smoothed spectral flux.
+
+        Raises:
+            ValueError: If the low-pass filter cannot be designed for this sampling frequency.
+        """
+        engine = self._flux_engine(window_size, hop_size)
+        num_samples = len(csv_data)
+        num_windows = engine.num_windows(num_samples)
+        pad = self.butter_bandpass_filter.settling_samples(self.cutoff, fs, order=self.filter_order)
+        block_frames = max(1, int(self.chunk_time * fs) // hop_size)
+
+        spectral_flux = np.zeros(num_windows, dtype=self.dtype)
+        prev_spectrum = None
+        for first in range(0, num_windows, block_frames):
+            last = min(first + block_frames, num_windows)
+
+            # Samples covered by the frames of the block, padded for the filter transients
+            start = first * hop_size
+            stop = (last - 1) * hop_size + window_size
+            padded_start = max(0, start - pad)
+            padded_stop = min(num_samples, stop + pad)
+            with self.profiler.stage('filter'):
+                block = self.butter_bandpass_filter.filtering(
+                    np.asarray(csv_data[padded_start:padded_stop], dtype=self.dtype), self.cutoff, fs,
+                    order=self.filter_order)
+
+            with self.profiler.stage('fft'):
+                frames = sliding_window_view(block[start - padded_start:stop - padded_start], window_size)[::hop_size]
+                for chunk_start in range(0, len(frames), engine.chunk_frames):
+                    chunk_stop = min(chunk_start + engine.chunk_frames, len(frames))
+                    spectral_flux[first + chunk_start:first + chunk_stop], prev_spectrum = engine.frame_flux(
+                        frames[chunk_start:chunk_stop], prev_spectrum)
+
+        with self.profiler.stage('fft'):
+            gaussian_filter1d(spectral_flux, sigma=FLUX_SMOOTHING_SIGMA, output=spectral_flux)
+        return spectral_flux
+
+    def detect_onset(self, csv_data, fs):
+        """
+        Detect the onset time of a single seismic trace.
+
+        Args:
+            csv_data (numpy.ndarray): Velocity samples of the trace.
+            fs (float): Sampling frequency.
+
+        Returns:
+            float or None: Onset time in seconds relative to the trace start, or None if no onset was found.
+
+        Raises:
+            ValueError: If the low-pass filter cannot be designed for this sampling frequency.
+        """
+        # Long traces can be processed in blocks instead of as a whole, each converted to the precision on its own
+        if self.chunk_time is not None and len(csv_data) > self.chunk_time * fs:
+            window_size = max(1, int(self.window_time * fs))
+            hop_size = max(1, int(self.hop_time * fs))
+            spectral_flux = self._chunked_flux(csv_data, fs, window_size, hop_size)
+            with self.profiler.stage('find_peaks'):
+                frame = self.first_peak_above_height(spectral_flux, fs, self.height_factor,
+                                                     self.min_time_between_peaks)
+            # Same time as the frame's entry of SpectralFluxEngine.time_values
+            return None if frame is None else frame * hop_size / fs
+
+        with self.profiler.stage('filter'):
+            csv_data_filtered = self.butter_bandpass_filter.filtering(np.asarray(csv_data, dtype=self.dtype),
+                                                                      self.cutoff, fs, order=self.filter_order)
+
+        # Optionally drop the rate the filter made redundant; sample k of the decimated signal
+        # lies at k * factor / fs seconds, so flux times stay on the original time base
+        factor = self.decimation_factor(fs) if self.decimate else 1
+        if factor > 1:
+            with self.profiler.stage('decimate'):
+                csv_data_filtered = resample_poly(csv_data_filtered, 1, factor)
+            fs = fs / factor
+
+        # Compute spectral flux on the filtered signal, with window and hop rescaled to the rate
+        window_size = max(1, int(self.window_time * fs))
+        hop_size = max(1, int(self.hop_time * fs))
+        if self.prescreen:
+            with self.profiler.stage('prescreen'):
+                regions = self.screen.regions(csv_data_filtered, fs)
+            if regions:
+                with self.profiler.stage('fft'):
+                    segments = self._region_flux(csv_data_filtered, fs, window_size, hop_size, regions)
+                with self.profiler.stage('find_peaks'):
+                    return self.pick_onset_segments(segments, fs, self.height_factor, self.min_time_between_peaks)
+
+        with self.profiler.stage('fft'):
+            spectral_flux, time_vals = self._compute_spectral_flux(csv_data_filtered, fs, window_size, hop_size)
+        with self.profiler.stage('find_peaks'):
+            if self.dtype == np.float32:
+                # find_peaks works on a float64 copy of its input, so only give it the frames that can be peaks
+                frame = self.first_peak_above_height(spectral_flux, fs, self.height_factor,
+                                                     self.min_time_between_peaks)
+                return None if frame is None else time_vals[frame]
+            return self.pick_onset(spectral_flux, time_vals, fs, self.height_factor, self.min_time_between_peaks)
+
+    def detect_onsets(self, traces, fs):
+        """
+        Detect the onset times of a batch of equal-length traces with one vectorized computation.
+
+        The traces are filtered, transformed and smoothed together, and only peak picking runs per
+        trace; onsets match detect_onset on each trace. Decimation, the pre-screen and chunked
+        processing work trace by trace, so with any of them the traces are processed one at a time.
+
+        Args:
+            traces (numpy.ndarray): Velocity samples of shape (num_traces, num_samples).
+            fs (float): Sampling frequency shared by the traces.
+
+        Returns:
+            list: Onset time in seconds relative to the trace start, or None, for each trace.
+
+        Raises:
+            ValueError: If the low-pass filter cannot be designed for this sampling frequency.
+        """
+        if self.decimate or self.prescreen or self.chunk_time is not None:
+            return [self.detect_onset(trace, fs) for trace in traces]
+
+        with self.profiler.stage('filter'):
+            filtered = self.butter_bandpass_filter.filtering(np.asarray(traces, dtype=self.dtype), self.cutoff, fs,
+                                                             order=self.filter_order)
+
+        window_size = max(1, int(self.window_time * fs))
+        hop_size = max(1, int(self.hop_time * fs))
+        with self.profiler.stage('fft'):
+            engine = self._flux_engine(window_size, hop_size)
+            spectral_flux = engine.batch_raw_flux(filtered)
+            gaussian_filter1d(spectral_flux, sigma=FLUX_SMOOTHING_SIGMA, axis=-1, output=spectral_flux)
+            time_vals = engine.time_values(spectral_flux.shape[1], fs)
+
+        onsets = []
+        with self.profiler.stage('find_peaks'):
+            for flux in spectral_flux:
+                if self.dtype == np.float32:
+                    frame = self.first_peak_above_height(flux, fs, self.height_factor, self.min_time_between_peaks)
+                    onsets.append(None if frame is None else time_vals[frame])
+                else:
+                    onsets.append(self.pick_onset(flux, time_vals, fs, self.height_factor,
+                                                  self.min_time_between_peaks))
+        return onsets
+
+    def decimation_factor(self, fs):
+        """
+        Largest integer factor keeping the decimated rate at or above twice the cutoff.
+
+        Args:
+            fs (float): Sampling frequency of the trace.
+
+        Returns:
+            int: Decimation factor, 1 if the rate cannot be lowered.
+        """
+        return max(1, int(fs / (2 * self.cutoff)))
+
+    def detection_parameters(self):
+        """
+        Parameters the detected onset depends on, besides the trace itself.
+
+        Returns:
+            tuple: Cutoff, filter order and method, decimation, pre-screen, block length, precision, FFT
+                backend and padding, window and hop times, height factor and peak distance.
+        """
+        return (self.cutoff, self.filter_order, self.butter_bandpass_filter.method, self.decimate, self.prescreen,
+                self.chunk_time, self.dtype.name, self.fft.name, self.fft.pad, self.window_time, self.hop_time,
+                self.height_factor, self.min_time_between_peaks)
+
+    def cached_detect_onset(self, csv_data, fs):
+        """
+        Detect the onset time of a trace, serving unchanged traces from the result cache.
+
+        Args:
+            csv_data (numpy.ndarray): Velocity samples of the trace.
+            fs (float): Sampling frequency.
+
+        Returns:
+            float or None: Onset time in seconds relative to the trace start, or None if no onset was found.
+
+        Raises:
+            ValueError: If the low-pass filter cannot be designed for this sampling frequency.
+        """
+        if self.cache is None:
+            return self.detect_onset(csv_data, fs)
+
+        with self.profiler.stage('cache_lookup'):
+            key = self.cache.key(csv_data, fs, self.detection_parameters())
+            hit, onset = self.cache.get(key)
+        if hit:
+            return onset
+
+        onset = self.detect_onset(csv_data, fs)
+        with self.profiler.stage('cache_store'):
+            self.cache.put(key, onset)
+        return onset
+
+    @staticmethod
+    def pick_onset(spectral_flux, time_vals, fs, height_factor, min_time_between_peaks):
+        """
+        Pick the onset as the first strong peak of the spectral flux.
+
+        Args:
+            spectral_flux (numpy.ndarray): Smoothed spectral flux.
+            time_vals (numpy.ndarray): Time of each flux value in seconds.
+            fs (float): Sampling frequency of the trace.
+            height_factor (float): Fraction of the maximum flux a peak must reach.
+            min_time_between_peaks (float): Minimum distance between peaks, converted with the sampling frequency.
+
+        Returns:
+            float or None: Onset time in seconds, or None if no peak was found.
+        """
+        height = height_factor * np.max(spectral_flux)
+        distance = int(min_time_between_peaks * fs)
+        distance = max(1, distance)
+        onset_indices = find_peaks(spectral_flux, height=height, distance=distance)[0]
+        onset_times = time_vals[onset_indices]
+
+        if len(onset_times) > 0:
+            return onset_times[0]
+        return None
+
+    @staticmethod
+    def first_peak_above_height(spectral_flux, fs, height_factor, min_time_between_peaks):
+        """
+        Find the frame of the onset pick_onset picks, searching for peaks only where the flux reaches the height.
+
+        A peak must reach the height, so find_peaks only runs over the runs of frames at or above it,
+        with one frame of context on each side. Runs closer than the peak distance are searched
+        together so that the distance condition sees every peak it compares. This keeps the memory
+        of the search proportional to the runs instead of the whole flux. The result only differs
+        from pick_onset if peaks of exactly equal height lie within the peak distance, whose order
+        find_peaks leaves unspecified.
+
+        Args:
+            spectral_flux (numpy.ndarray): Smoothed spectral flux.
+            fs (float): Sampling frequency of the trace.
+            height_factor (float): Fraction of the maximum flux a peak must reach.
+            min_time_between_peaks (float): Minimum distance between peaks, converted with the sampling frequency.
+
+        Returns:
+            int or None: Frame of the onset, or None if no peak was found.
+        """
+        height = height_factor * np.max(spectral_flux)
+        distance = max(1, int(min_time_between_peaks * fs))
+        above = spectral_flux >= height
+        bounds = np.flatnonzero(above[1:] != above[:-1]) + 1
+        bounds = np.concatenate(([0], bounds, [len(spectral_flux)]))
+        starts, stops = bounds[:-1], bounds[1:]
+        runs = above[starts]
+        starts, stops = starts[runs], stops[runs]
+        if len(starts) == 0:
+            # No frame reaches the height, e.g. when the flux holds NaN and so does its maximum
+            return None
+
+        # Merge runs whose peaks could be within the peak distance of each other
+        keep = np.concatenate(([True], starts[1:] - stops[:-1] >= distance))
+        starts = starts[keep]
+        stops = np.concatenate((stops[np.flatnonzero(keep)[1:] - 1], stops[-1:]))
+
+        for start, stop in zip(starts, stops):
+            first = max(0, start - 1)
+            onset_indices = find_peaks(spectral_flux[first:stop + 1], height=height, distance=distance)[0]
+            if len(onset_indices) > 0:
+                return int(first + onset_indices[0])
+        return None
+
+    @staticmethod
+    def pick_onset_segments(segments, fs, height_factor, min_time_between_peaks):
+        """
+        Pick the onset as the first strong peak of a spectral flux computed over separate segments.
+
+        Args:
+            segments (list): Segments from _region_flux.
+            fs (float): Sampling frequency of the trace.
+            height_factor (float): Fraction of the maximum flux a peak must reach.
+            min_time_between_peaks (float): Minimum distance between peaks, converted with the sampling frequency.
+
+        Returns:
+            float or None: Onset time in seconds, or None if no peak was found.
+        """
+        if not segments:
+            return None
+        height = height_factor * max(np.max(flux[start:stop]) for flux, _, start, stop in segments)
+        distance = max(1, int(min_time_between_peaks * fs))
+        for spectral_flux, time_vals, start, stop in segments:
+            onset_indices = find_peaks(spectral_flux, height=height, distance=distance)[0]
+            onset_indices = onset_indices[(onset_indices >= start) & (onset_indices < stop)]
+            if len(onset_indices) > 0:
+                return time_vals[onset_indices[0]]
+        return None
+
+    def _process_event(self, index, row):
+        """
+        Detect the onset of a single event.
+
+        Args:
+            index: Index of the event in the input data.
+            row (pandas.Series): Row of the input data describing the event.
+
+        Returns:
+            dict or None: Result entry of the event, or None if the event was skipped.
+        """
+        # Ensure all required columns are available (asarray keeps memory-mapped traces zero-copy)
+        with self.profiler.stage('copy'):
+            csv_times = np.asarray(row['np_time_rel(sec)'])
+            csv_data = np.asarray(row['np_velocity(m/s)'])
+
+        # Check if csv_times and csv_data are non-empty
+        if len(csv_times) == 0 or len(csv_data) == 0:
+            print(f"Skipping row {index} due to empty data arrays.")
+            return None
+        line_time = row['time_rel(sec)']
+        evid = row['evid']
+        fname = row['filename']  # Use the 'filename' from the DataFrame
+        import pandas as pd  # Loaded with the catalog; kept out of the module imports for headless callers
+        starttime = pd.to_datetime(row['time_abs(%Y-%m-%dT%H:%M:%S.%f)'])  # Parse the absolute time
+        audio_duration = csv_times[-1] - csv_times[0]
 
-        for i in range(num_windows):
-            start = i * hop_size
-            end = start + window_size
-            windowed_signal = signal[start:end]
-            spectrum = np.abs(fft(windowed_signal))
-            if i > 0:
-                spectral_flux[i] = np.sum((spectrum - prev_spectrum) ** 2)
-            prev_spectrum = spectrum
-            time_vals[i] = start / fs  # Time in seconds
+        # Ensure we have enough data points in csv_times
+        if len(csv_times) > 1 and len(csv_data) > 1:
+            fs = 1 / (csv_times[1] - csv_times[0])
 
-        if smooth:
-            spectral_flux = gaussian_filter1d(spectral_flux, sigma=2)
-        return spectral_flux, time_vals
+            # Apply bandpass filter, compute spectral flux and pick its first strong peak
+            try:
+                signal_start_time = self.cached_detect_onset(csv_data, fs)
+            except ValueError as e:
+                print(f"Error in filtering data for event {evid}: {e}")
+                return None
+
+            if signal_start_time is not None:
+                # Use starttime + signal_start_time to calculate the absolute time
+                detection_time_abs = (starttime + timedelta(seconds=signal_start_time)).strftime(
+                    '%Y-%m-%dT%H:%M:%S.%f')
+                detection_time_rel = signal_start_time
+                print(f"Signal detected starting at {signal_start_time} seconds for event {evid}.")
+            else:
+                detection_time_abs = None
+                detection_time_rel = None
+                print(f"No significant onset detected for event {evid}.")
+
+            return {
+                'evid': evid,
+                'filename': fname,
+                'onset_time_ground_truth': line_time,
+                'audio_duration': audio_duration,
+                'onset_time_predicted': signal_start_time,
+                'detection_time_abs': detection_time_abs,  # Absolute time
+                'detection_time_rel': detection_time_rel  # Relative time
+            }
+        else:
+            print(f"Skipping row {index} due to insufficient data.")
+            return None
+
+    def _safe_process_event(self, index, row):
+        """
+        Process a single event, isolating the batch from any failure of that event.
+
+        Args:
+            index: Index of the event in the input data.
+            row (pandas.Series): Row of the input data describing the event.
+
+        Returns:
+            tuple: Result entry of the event (None if the event was skipped or failed) and its
+                profile from StageProfiler.end_event (None if profiling is disabled).
+        """
+        self.profiler.start_event()
+        try:
+            record = self._process_event(index, row)
+        except Exception as e:
+            print(f"Error processing row {index}: {e!r}")
+            record = None
+        return record, self.profiler.end_event()
+
+    def _worker_config(self):
+        """
+        Keyword arguments recreating this detector, without its data, in a worker process.
+
+        Returns:
+            dict: Arguments of the SpectralFlux constructor.
+        """
+        return {
+            'save_result_dir': self.save_result_dir,
+            'data': None,
+            'landscape': self.landscape,
+            'cache': self.cache,
+            'decimate': self.decimate,
+            'prescreen': self.prescreen,
+            'chunk_time': self.chunk_time,
+            'dtype': self.dtype.name,
+            'fft_backend': self.fft.name,
+            'fft_workers': self.fft.workers,
+            'fft_pad': self.fft.pad,
+            'profiler': StageProfiler(self.profiler.enabled, self.profiler.top_events)
+        }
+
+    def _iter_rows(self, skip=0, last_skipped=None):
+        """
+        Iterate over the input data, timing how long each event takes to load.
+
+        Args:
+            skip (int): Number of leading events to skip, completed by a previous run.
+            last_skipped (str or None): Identifier the last skipped event must have.
+
+        Yields:
+            tuple: Index, row and load time in seconds of each event.
+
+        Raises:
+            ValueError: If the skipped events do not match the input data.
+        """
+        rows = iter(self.data.iterrows())
+        event_id = None
+        for _ in range(skip):
+            index, row = next(rows, (None, None))
+            if row is None:
+                raise ValueError(f"The results checkpoint has {skip} events, more than the input data.")
+            event_id = str(row.get('evid', index))
+        if skip > 0 and event_id != last_skipped:
+            raise ValueError(f"The results checkpoint ends at event {last_skipped}, but the input data has "
+                             f"{event_id} there.")
+
+        while True:
+            start = time.perf_counter()
+            try:
+                index, row = next(rows)
+            except StopIteration:
+                return
+            yield index, row, time.perf_counter() - start
+
+    def _iter_event_results(self, skip=0, last_skipped=None):
+        """
+        Process all events, serially or in a process pool, yielding results in catalog order.
+
+        With prefetching, events are read, and the pages of memory-mapped traces loaded, by a
+        reader thread up to `prefetch` events ahead of the computation.
+
+        Args:
+            skip (int): Number of leading events to skip, completed by a previous run.
+            last_skipped (str or None): Identifier the last skipped event must have.
+
+        Yields:
+            tuple: Index, row, result entry (None for skipped or failed events) and profile of each event.
+        """
+        rows = self._iter_rows(skip, last_skipped)
+        if self.prefetch <= 0:
+            yield from self._process_rows(rows)
+            return
+
+        with Prefetcher(rows, self.prefetch, prepare=warm_row) as prefetched:
+            try:
+                yield from self._process_rows(prefetched)
+            finally:
+                self.profiler.add('prefetch_wait', prefetched.wait_time)
+
+    def _process_rows(self, rows):
+        """
+        Process events, serially or in a process pool, yielding results in catalog order.
+
+        Args:
+            rows: Index, row and load time of each event, from _iter_rows.
+
+        Yields:
+            tuple: Index, row, result entry (None for skipped or failed events) and profile of each event.
+        """
+        if self.workers <= 1:
+            for index, row, load_time in rows:
+                record, profile = self._safe_process_event(index, row)
+                yield index, row, record, _with_load_time(profile, load_time)
+            return
+
+        # Keep a bounded number of events in flight so that rows are not all pickled up front
+        max_in_flight = self.workers * 4
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self._worker_config(),)) as executor:
+            in_flight = deque()
+            for index, row, load_time in rows:
+                in_flight.append((index, row, load_time, executor.submit(_process_event_in_worker, index, row)))
+                if len(in_flight) >= max_in_flight:
+                    yield _future_result(*in_flight.popleft())
+            while in_flight:
+                yield _future_result(*in_flight.popleft())
+
+    def _submit_plots(self, renderer, row, record):
+        """
+        Queue the images of an event on the background renderer.
+
+        Args:
+            renderer (PlotRenderer): Render queue.
+            row (pandas.Series): Row of the input data describing the event.
+            record (dict or None): Result entry of the event, None if it was skipped.
+        """
+        csv_times = np.asarray(row['np_time_rel(sec)'])
+        csv_data = np.asarray(row['np_velocity(m/s)'])
+        if len(csv_times) == 0 or len(csv_data) == 0:
+            return
+        evid = row['evid']
+        evid_dir = os.path.join(self.save_result_dir, evid)
+
+        renderer.submit_truth(csv_times, csv_data, row['time_rel(sec)'],
+                              output_image_path=os.path.join(evid_dir, f'{evid}_TRUTH.png'), color='red')
+        if record is not None:
+            renderer.submit_onset(csv_times, csv_data, record['onset_time_predicted'],
+                                  os.path.join(evid_dir, f'{evid}_ORIGINAL_ONSET.png'))
 
     def onset_detection(self):
         """
         Perform onset detection on the input seismic data.
 
         Iterates through each event in the data, applies a bandpass filter,
-        computes the spectral flux, and detects signal onsets.
+        computes the spectral flux, and detects signal onsets. With more than one
+        worker, events are processed in a process pool and results are kept in
+        the original catalog order. Images are rendered by a separate background
+        pool according to the plot mode.
+
+        Results are streamed to disk in batches with a checkpoint of the completed events, so
+        memory does not grow with the catalog and an interrupted run can be resumed.
+
+        With prefetching, loading, computing and writing overlap: a reader thread loads the next
+        events, and a writer thread queues the images and writes the results of finished events,
+        both through bounded queues, so that the disk and the CPU are kept busy at the same time.
 
         Returns:
-            pandas.DataFrame: DataFrame with detected onset times and other related information.
+            ResultWriter: Writer of the results file, which can read them back.
         """
         if self.cutoff is not None:
-            onset_time_predicted = []
-            onset_time_ground_truth = []
-            audio_duration_list = []
-            evid_list = []
-            filename_list = []
-            signal_start_time_list = []
-            detection_times_abs_list = []
-            detection_times_rel_list = []
-
-            for index, row in self.data.iterrows():
-                # Ensure all required columns are available
-                csv_times = np.array(row['np_time_rel(sec)'])
-                csv_data = np.array(row['np_velocity(m/s)'])
-
-                # Check if csv_times and csv_data are non-empty
-                if len(csv_times) == 0 or len(csv_data) == 0:
-                    print(f"Skipping row {index} due to empty data arrays.")
-                    continue
-                csv_times = np.array(row['np_time_rel(sec)'])
-                csv_data = np.array(row['np_velocity(m/s)'])
-                line_time = row['time_rel(sec)']
-                evid = row['evid']
-                fname = row['filename']  # Use the 'filename' from the DataFrame
-                starttime = pd.to_datetime(row['time_abs(%Y-%m-%dT%H:%M:%S.%f)'])  # Parse the absolute time
-
-                evid_dir = os.path.join(self.save_result_dir, evid)
-                evid_image_truth = os.path.join(evid_dir, f'{evid}_TRUTH.png')
-                self.saver.create_dir(evid_dir)
-
-                self.saver.save_image(csv_times, csv_data, line_time, output_image_path=evid_image_truth,
-                                      color='red')
-                audio_duration = csv_times[-1] - csv_times[0]
-
-                # Ensure we have enough data points in csv_times
-                if len(csv_times) > 1 and len(csv_data) > 1:
-                    fs = 1 / (csv_times[1] - csv_times[0])
-
-                    # Apply bandpass filter
-                    try:
-                        csv_data_filtered = self.butter_bandpass_filter.filtering(csv_data, self.cutoff, fs, order=4)
-                    except ValueError as e:
-                        print(f"Error in filtering data for event {evid}: {e}")
-                        continue
+            from ResultWriter import ResultWriter  # pandas is only needed once results are written
+            writer = ResultWriter(self.save_result_dir, 'results', RESULT_COLUMNS, RESULT_FLOAT_COLUMNS,
+                                  self.results_format, resume=self.resume)
+            if writer.num_done > 0:
+                print(f"Resuming after {writer.num_done} completed events.")
+            renderer = PlotRenderer(self.plots, self.plot_workers)
 
-                    # Compute spectral flux on the filtered signal
-                    window_size = max(1, int(0.2 * fs))
-                    hop_size = max(1, int(0.05 * fs))
-                    spectral_flux, time_vals = self._compute_spectral_flux(csv_data_filtered, fs, window_size, hop_size)
-                    height = 0.3 * np.max(spectral_flux)
-
-                    min_time_between_peaks = 0.1  # 100 ms
-                    distance = int(min_time_between_peaks * fs)
-                    distance = max(1, distance)
-                    onset_indices = find_peaks(spectral_flux, height=height, distance=distance)[0]
-                    onset_times = time_vals[onset_indices]
-
-                    if len(onset_times) > 0:
-                        signal_start_time = onset_times[0]
-
-                        # Use starttime + signal_start_time to calculate the absolute time
-                        detection_time_abs = (starttime + timedelta(seconds=signal_start_time)).strftime(
-                            '%Y-%m-%dT%H:%M:%S.%f')
-                        detection_time_rel = signal_start_time
-                        print(f"Signal detected starting at {signal_start_time} seconds for event {evid}.")
-                    else:
-                        signal_start_time = None
-                        detection_time_abs = None
-                        detection_time_rel = None
-                        print(f"No significant onset detected for event {evid}.")
-
-                    self.saver.plot_onset_original_data(csv_times, csv_data, signal_start_time,
-                                                        os.path.join(evid_dir, f'{evid}_ORIGINAL_ONSET.png'))
-
-                    onset_time_predicted.append(signal_start_time)
-                    onset_time_ground_truth.append(line_time)
-                    audio_duration_list.append(audio_duration)
-                    evid_list.append(evid)
-                    filename_list.append(fname)
-                    signal_start_time_list.append(signal_start_time)
-                    detection_times_abs_list.append(detection_time_abs)
-                    detection_times_rel_list.append(detection_time_rel)
-                else:
-                    print(f"Skipping row {index} due to insufficient data.")
-
-            # Adding new keys to the result
-            result = {
-                'evid': evid_list,
-                'filename': filename_list,
-                'onset_time_ground_truth': onset_time_ground_truth,
-                'audio_duration': audio_duration_list,
-                'onset_time_predicted': onset_time_predicted,
-                'detection_time_abs': detection_times_abs_list,  # Absolute time
-                'detection_time_rel': detection_times_rel_list  # Relative time
-            }
-            df_result = pd.DataFrame(result)
+            def write_event(position, event_id, row, record):
+                if renderer.wants(position):
+                    self._submit_plots(renderer, row, record)
+                writer.add(event_id, record)
+
+            background = BackgroundConsumer(write_event, self.prefetch) if self.prefetch > 0 else None
+            events = self._iter_event_results(writer.num_done, writer.last_done)
+            try:
+                for position, (index, row, record, profile) in enumerate(events, start=writer.num_done):
+                    event_id = row.get('evid', index)
+                    self.profiler.add_event(event_id, profile)
+                    if background is not None:
+                        background.submit(position, event_id, row, record)
+                        continue
+                    if renderer.wants(position):
+                        with self.profiler.stage('plot_submit'):
+                            self._submit_plots(renderer, row, record)
+                    with self.profiler.stage('results_write'):
+                        writer.add(event_id, record)
+            finally:
+                events.close()
+                try:
+                    if background is not None:
+                        # Finished events still queued are written before the checkpoint is saved
+                        with self.profiler.stage('writer_drain'):
+                            background.close()
+                        self.profiler.add('background_write', background.busy_time)
+                        self.profiler.add('writer_wait', background.wait_time)
+                finally:
+                    with self.profiler.stage('plot_wait'):
+                        renderer.close()
+                    # Write the events completed before an interruption, so that they are not redone
+                    with self.profiler.stage('results_write'):
+                        writer.close()
 
-            # Save the result DataFrame as a CSV file
-            file_path = f'{self.save_result_dir}/results.csv'
-            df_result.to_csv(file_path, index=False)
-            return df_result
+            if self.cache is not None:
+                with self.profiler.stage('cache_evict'):
+                    self.cache.evict()
+            return writer
         else:
             raise ValueError('Unknown landscape')
+
+
+# Detector of the current worker process, created once by the pool initializer
+_worker_detector = None
+
+
+def _init_worker(config):
+    """
+    Create the detector used by a worker process of the pool.
+
+    Args:
+        config (dict): Arguments of the SpectralFlux constructor, from SpectralFlux._worker_config.
+    """
+    global _worker_detector
+    _worker_detector = SpectralFlux(**config)
+
+
+def _process_event_in_worker(index, row):
+    """
+    Process a single event in a worker process.
+
+    Args:
+        index: Index of the event in the input data.
+        row (pandas.Series): Row of the input data describing the event.
+
+    Returns:
+        tuple: Result entry of the event (None if the event was skipped or failed) and its profile.
+    """
+    return _worker_detector._safe_process_event(index, row)
+
+
+def _with_load_time(profile, load_time):
+    """
+    Add the time spent loading an event to its profile.
+
+    Args:
+        profile (tuple or None): Profile from StageProfiler.end_event.
+        load_time (float): Seconds spent reading the event from the input data.
+
+    Returns:
+        tuple or None: Profile including a 'load' stage.
+    """
+    if profile is None:
+        return None
+    timings, stats = profile
+    return {'load': load_time, **timings}, stats
+
+
+def _future_result(index, row, load_time, future):
+    """
+    Wait for the result of an event processed in the pool.
+
+    Args:
+        index: Index of the event in the input data.
+        row (pandas.Series): Row of the input data describing the event.
+        load_time (float): Seconds spent reading the event from the input data.
+        future (concurrent.futures.Future): Future of the event.
+
+    Returns:
+        tuple: Index, row, result entry (None if the worker failed) and profile of the event.
+    """
+    try:
+        record, profile = future.result()
+    except Exception as e:
+        print(f"Error processing row {index}: {e!r}")
+        return index, row, None, None
+    return index, row, record, _with_load_time(profile, load_time)
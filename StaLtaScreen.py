@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class StaLtaScreen:
+    """
+    Vectorized STA/LTA pre-screen finding the candidate regions of a trace.
+
+    The signal is reduced to sums of x and x**2 over short blocks, and the ratio of the
+    short-term to the long-term average energy is computed for every block from cumulative sums
+    of those. Energy is taken about the mean of each window, so that slow drift of the trace,
+    which the low-pass filter keeps, does not mask the events. A region starts where the ratio
+    rises above the trigger-on level and ends where it falls below the trigger-off level; it is
+    then padded so that the emergent start of the event, which precedes the trigger, is kept.
+    """
+
+    def __init__(self, sta_time=120.0, lta_time=600.0, trigger_on=4.0, trigger_off=1.5, pad_before=None,
+                 pad_after=None, block_time=1.0):
+        """
+        Initialize the StaLtaScreen class.
+
+        Args:
+            sta_time (float): Length of the short-term average window in seconds.
+            lta_time (float): Length of the long-term average window in seconds.
+            trigger_on (float): Ratio above which a region starts.
+            trigger_off (float): Ratio below which a region ends.
+            pad_before (float or None): Seconds kept before each trigger (default is the LTA length).
+            pad_after (float or None): Seconds kept after each region (default is the STA length).
+            block_time (float): Time resolution of the ratio in seconds.
+        """
+        self.sta_time = sta_time
+        self.lta_time = lta_time
+        self.trigger_on = trigger_on
+        self.trigger_off = trigger_off
+        self.pad_before = pad_before if pad_before is not None else lta_time
+        self.pad_after = pad_after if pad_after is not None else sta_time
+        self.block_time = block_time
+
+    def block_size(self, fs):
+        """
+        Number of samples per block of the ratio.
+
+        Args:
+            fs (float): Sampling frequency.
+
+        Returns:
+            int: Block size.
+        """
+        return max(1, int(self.block_time * fs))
+
+    def ratio(self, signal, fs):
+        """
+        STA/LTA ratio of the signal energy about the window means, over trailing windows ending at each block.
+
+        Args:
+            signal (numpy.ndarray): Filtered signal.
+            fs (float): Sampling frequency.
+
+        Returns:
+            numpy.ndarray: Ratio per block of block_size(fs) samples, zero where the long-term
+                window is not yet full. Samples after the last full block are ignored.
+        """
+        block = self.block_size(fs)
+        num_sta = max(1, int(self.sta_time * fs / block))
+        num_lta = max(num_sta, int(self.lta_time * fs / block))
+        num_blocks = len(signal) // block
+        ratio = np.zeros(num_blocks)
+        if num_blocks < num_lta:
+            return ratio
+
+        # Running sums of x and x**2 over the blocks, shared by both windows
+        # Block sums are accumulated in float64 whatever the precision of the signal
+        blocks = np.asarray(signal[:num_blocks * block]).reshape(num_blocks, block)
+        sums = np.zeros(num_blocks + 1)
+        squares = np.zeros(num_blocks + 1)
+        np.cumsum(blocks.sum(axis=1, dtype=np.float64), out=sums[1:])
+        np.cumsum(np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64), out=squares[1:])
+
+        sta = self._window_energy(sums[num_lta - num_sta:], squares[num_lta - num_sta:], num_sta, block)
+        lta = self._window_energy(sums, squares, num_lta, block)
+        np.divide(sta, lta, out=ratio[num_lta - 1:], where=lta > 0)
+        return ratio
+
+    @staticmethod
+    def _window_energy(sums, squares, num_blocks, block):
+        # Variance of each window of num_blocks blocks, from the running sums of x and x**2
+        length = num_blocks * block
+        mean = sums[num_blocks:] - sums[:-num_blocks]
+        mean /= length
+        energy = squares[num_blocks:] - squares[:-num_blocks]
+        energy /= length
+        energy -= np.square(mean, out=mean)
+        return np.maximum(energy, 0, out=energy)
+
+    def regions(self, signal, fs):
+        """
+        Candidate regions of the signal, merged where their padding overlaps.
+
+        Args:
+            signal (numpy.ndarray): Filtered signal.
+            fs (float): Sampling frequency.
+
+        Returns:
+            list: (start, stop) sample ranges in increasing order, empty if nothing triggered.
+        """
+        ratio = self.ratio(signal, fs)
+        if len(ratio) == 0:
+            return []
+        above = ratio >= self.trigger_on
+        starts = np.flatnonzero(above[1:] & ~above[:-1]) + 1
+        if above[0]:
+            starts = np.concatenate(([0], starts))
+        if len(starts) == 0:
+            return []
+        ends = np.flatnonzero(ratio < self.trigger_off)
+
+        block = self.block_size(fs)
+        pad_before = int(self.pad_before * fs)
+        pad_after = int(self.pad_after * fs)
+        regions = []
+        for start in starts:
+            # A region lasts until the ratio falls below the trigger-off level
+            position = np.searchsorted(ends, start)
+            stop = ends[position] if position < len(ends) else len(ratio)
+            start = max(0, start * block - pad_before)
+            stop = min(len(signal), (stop + 1) * block + pad_after)
+            if regions and start <= regions[-1][1]:
+                regions[-1] = (regions[-1][0], max(regions[-1][1], stop))
+            else:
+                regions.append((start, stop))
+        return regions
@@ -0,0 +1,368 @@
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi, group_delay, sos2tf, lfilter
+from SpectralFluxEngine import SpectralFluxEngine
+import argparse
+import os
+import pandas as pd
+
+
+class StreamingOnsetDetector:
+    """
+    Stateful onset detector that consumes a seismic trace chunk by chunk.
+
+    The batch method filters the whole trace with a zero-phase filter and compares every
+    spectral flux peak against 0.3 of the maximum flux of the complete trace. A live feed
+    has neither the future samples nor the global maximum, so this detector:
+        - filters causally with a Butterworth filter in second-order sections, keeping the
+          filter state between chunks and compensating the onset times for its group delay;
+        - keeps the samples of the trailing, not yet complete FFT window and the spectrum of
+          the last frame, so the spectral flux continues seamlessly across chunks;
+        - smooths the flux with the same Gaussian kernel as the batch method, delayed by the
+          kernel radius;
+        - accepts a peak once no higher peak can appear within the minimum peak distance,
+          comparing it with the running maximum of the smoothed flux instead of the global one;
+        - additionally requires the peak to stand `trigger_ratio` times above a slowly adapting
+          background level, since early in a quiet stream the running maximum is only noise,
+          and stays silent for `rearm_time` seconds after each onset so that one long event
+          is reported once.
+
+    Onsets are emitted at most `max_latency` seconds (plus the duration of the chunk that
+    completes them) after the onset reaches the sensor.
+    """
+
+    def __init__(self, fs, cutoff, order=4, window_time=0.2, hop_time=0.05, height_factor=0.3,
+                 min_time_between_peaks=0.1, warmup_time=60.0, trigger_ratio=10.0, background_time=600.0,
+                 rearm_time=600.0):
+        """
+        Initialize the StreamingOnsetDetector class.
+
+        Args:
+            fs (float): Sampling frequency of the feed.
+            cutoff (float): Cutoff frequency of the low-pass filter.
+            order (int): The order of the filter (default is 4).
+            window_time (float): Length of the FFT window in seconds.
+            hop_time (float): Step between FFT windows in seconds.
+            height_factor (float): Fraction of the running flux maximum a peak must reach.
+            min_time_between_peaks (float): Minimum distance between peaks, converted exactly like the batch method.
+            warmup_time (float): Seconds of data used to establish the running maximum before onsets are emitted.
+            trigger_ratio (float): Factor by which a peak must exceed the background flux level.
+            background_time (float): Time constant of the exponential average tracking the background flux level,
+                which is the cumulative mean of the flux until that much data is seen.
+            rearm_time (float): Seconds after an onset during which no further onset is emitted.
+
+        Raises:
+            ValueError: If the cutoff frequency is invalid for this sampling frequency.
+        """
+        low = min(cutoff / (0.5 * fs), 1.0)
+        if low <= 0:
+            raise ValueError("Invalid cutoff frequency for lowpass filter.")
+        self.fs = fs
+        self.sos = butter(order, low, btype='low', output='sos')
+        self.height_factor = height_factor
+        self.warmup_time = warmup_time
+        self.trigger_ratio = trigger_ratio
+        self.rearm_time = rearm_time
+
+        window_size = max(1, int(window_time * fs))
+        hop_size = max(1, int(hop_time * fs))
+        self.engine = SpectralFluxEngine(window_size, hop_size)
+        self.distance = max(1, int(min_time_between_peaks * fs))
+        self.background_alpha = min(1.0, hop_size / (background_time * fs))
+
+        # Same kernel as gaussian_filter1d(sigma=2) with its default truncation
+        sigma = 2
+        self.radius = int(4.0 * sigma + 0.5)
+        x = np.arange(-self.radius, self.radius + 1)
+        self.kernel = np.exp(-0.5 * x ** 2 / sigma ** 2)
+        self.kernel /= self.kernel.sum()
+
+        # Group delay of the causal filter in the pass band, used to align onset times
+        b, a = sos2tf(self.sos)
+        self.delay = group_delay((b, a), w=[np.pi * low * 0.1])[1][0] / fs
+
+        self._zi = None
+        self._pending = np.zeros(0)  # filtered samples starting at the next frame start
+        self._prev_spectrum = None
+        self._samples_seen = 0
+        self._raw = np.zeros(0)  # raw flux, starting at frame self._raw_start
+        self._raw_start = 0
+        self._smooth = np.zeros(0)  # smoothed flux, starting at frame self._smooth_start
+        self._smooth_start = 0
+        self._background = np.zeros(0)  # background level before each smoothed flux value
+        self._background_level = None
+        self._background_count = 0  # smoothed flux values averaged into the background level
+        self._background_sum = 0.0
+        self._next_candidate = 1
+        self._running_max = 0.0
+        self._last_onset = None
+
+    @property
+    def max_latency(self):
+        """
+        Maximum delay in seconds between an onset reaching the sensor and its emission.
+
+        Made of the filter group delay, one FFT window, the smoothing kernel radius and the
+        minimum peak distance (plus one frame to see the flux falling after the peak).
+        Emission happens when the chunk that completes the onset is processed, so the
+        duration of that chunk adds to this bound.
+
+        Returns:
+            float: Latency bound in seconds.
+        """
+        frames = self.radius + self.distance + 1
+        return self.delay + (self.engine.window_size + frames * self.engine.hop_size) / self.fs
+
+    def process(self, chunk):
+        """
+        Consume the next chunk of raw samples.
+
+        Args:
+            chunk (numpy.ndarray): Velocity samples following the previous chunk.
+
+        Returns:
+            list: Onsets confirmed by this chunk, as dicts with 'onset_time' (seconds since the
+                stream start), 'flux' (smoothed flux of the peak) and 'detected_at' (seconds of
+                data consumed when the onset was confirmed).
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if len(chunk) == 0:
+            return []
+        if self._zi is None:
+            self._zi = sosfilt_zi(self.sos) * chunk[0]
+        filtered, self._zi = sosfilt(self.sos, chunk, zi=self._zi)
+        self._samples_seen += len(chunk)
+
+        # Compute the flux of every frame completed by this chunk
+        pending = np.concatenate([self._pending, filtered])
+        window_size, hop_size = self.engine.window_size, self.engine.hop_size
+        num_frames = max(0, (len(pending) - window_size) // hop_size + 1)
+        if num_frames > 0:
+            frames = np.lib.stride_tricks.sliding_window_view(pending, window_size)[::hop_size][:num_frames]
+            flux, self._prev_spectrum = self.engine.frame_flux(frames, self._prev_spectrum)
+            self._raw = np.concatenate([self._raw, flux])
+            pending = pending[num_frames * hop_size:]
+        self._pending = pending
+
+        self._smooth_available(final=False)
+        return self._confirm_peaks(final=False)
+
+    def flush(self):
+        """
+        Finish the stream, smoothing and checking the frames held back for latency.
+
+        Returns:
+            list: Onsets confirmed at the end of the stream, in the format of `process`.
+        """
+        self._smooth_available(final=True)
+        return self._confirm_peaks(final=True)
+
+    def _smooth_available(self, final):
+        """
+        Smooth every raw flux value whose neighbourhood is complete.
+
+        Args:
+            final (bool): Whether the stream has ended, in which case the tail is reflected like the batch method.
+        """
+        raw_end = self._raw_start + len(self._raw)
+        begin = self._smooth_start + len(self._smooth)
+        end = raw_end if final else raw_end - self.radius
+        if end <= begin:
+            return
+
+        if final and self._raw_start == 0 and begin < self.radius:
+            # Short stream: both reflected edges are needed, fall back to the batch kernel
+            padded = np.pad(self._raw, self.radius, mode='symmetric')
+            smoothed = np.correlate(padded, self.kernel, mode='valid')[begin:]
+        else:
+            lo = begin - self.radius - self._raw_start
+            segment = self._raw[max(lo, 0):end + self.radius - self._raw_start]
+            if lo < 0:
+                # The stream start is reflected, as gaussian_filter1d does with mode='reflect'
+                segment = np.concatenate([self._raw[:-lo][::-1], segment])
+            if final:
+                missing = end + self.radius - raw_end
+                segment = np.concatenate([segment, self._raw[len(self._raw) - missing:][::-1]])
+            smoothed = np.correlate(segment, self.kernel, mode='valid')
+
+        # Average of the flux, taken before each frame so that a peak does not raise its own background. Until
+        # background_time seconds are seen it is the cumulative mean: the flux starts far below the noise level
+        # while the filter settles, and an exponential average started there would lag behind it for minutes
+        alpha = self.background_alpha
+        if self._background_level is None:
+            self._background_level = smoothed[0]
+        counts = self._background_count + np.arange(1, len(smoothed) + 1)
+        ramp = int(np.count_nonzero(counts * alpha < 1))
+        average = np.empty(len(smoothed))
+        if ramp > 0:
+            average[:ramp] = (self._background_sum + np.cumsum(smoothed[:ramp])) / counts[:ramp]
+            self._background_sum += float(np.sum(smoothed[:ramp]))
+        if ramp < len(smoothed):
+            level = average[ramp - 1] if ramp > 0 else self._background_level
+            average[ramp:] = lfilter([alpha], [1, alpha - 1], smoothed[ramp:], zi=[(1 - alpha) * level])[0]
+        self._background_count += len(smoothed)
+        self._background = np.concatenate([self._background, [self._background_level], average[:-1]])
+        self._background_level = average[-1]
+
+        self._smooth = np.concatenate([self._smooth, smoothed])
+        self._running_max = max(self._running_max, float(np.max(smoothed)))
+
+        # Keep only the raw values still needed for the next smoothing step
+        keep_from = max(0, end - self.radius - self._raw_start)
+        self._raw = self._raw[keep_from:]
+        self._raw_start += keep_from
+
+    def _confirm_peaks(self, final):
+        """
+        Confirm local maxima of the smoothed flux whose surroundings are known.
+
+        Args:
+            final (bool): Whether the stream has ended.
+
+        Returns:
+            list: Confirmed onsets.
+        """
+        onsets = []
+        smooth_end = self._smooth_start + len(self._smooth)
+        last_candidate = smooth_end - 2 if final else smooth_end - 1 - self.distance
+        threshold = self.height_factor * self._running_max
+        hop_time = self.engine.hop_size / self.fs
+
+        for p in range(self._next_candidate, last_candidate + 1):
+            i = p - self._smooth_start
+            value = self._smooth[i]
+            if not (self._smooth[i - 1] < value and value > self._smooth[i + 1]):
+                continue
+            if value < threshold or p * hop_time < self.warmup_time:
+                continue
+            if value < self.trigger_ratio * self._background[i]:
+                continue
+            if self._last_onset is not None and (p - self._last_onset) * hop_time < self.rearm_time:
+                continue
+            # A higher peak within the minimum distance takes precedence, as in find_peaks
+            lo = max(0, i - self.distance + 1)
+            if np.max(self._smooth[lo:i + self.distance]) > value:
+                continue
+            self._last_onset = p
+            onsets.append({
+                'onset_time': max(0.0, p * hop_time - self.delay),
+                'flux': value,
+                'detected_at': self._samples_seen / self.fs
+            })
+        self._next_candidate = max(self._next_candidate, last_candidate + 1)
+
+        # Keep only the smoothed values needed to examine the remaining candidates
+        keep_from = max(0, self._next_candidate - self.distance - 1 - self._smooth_start)
+        self._smooth = self._smooth[keep_from:]
+        self._background = self._background[keep_from:]
+        self._smooth_start += keep_from
+        return onsets
+
+
+def parse_args():
+    # Set up argument parser to get command-line arguments
+    parser = argparse.ArgumentParser(description="Replay an HDF5 catalog through the streaming onset detector.")
+
+    # Argument for the path to the *.h5 input file
+    parser.add_argument(
+        '--input_file',
+        type=str,
+        required=True,
+        help='Path to the input HDF5 file (*.h5)'
+    )
+
+    # Argument for the CSV file the comparison will be saved to
+    parser.add_argument(
+        '--output_file',
+        type=str,
+        default='streaming_comparison.csv',
+        help='CSV file to save the streaming vs batch comparison'
+    )
+
+    # Optional argument to specify the landscape type (default is 'lunar')
+    parser.add_argument(
+        '--landscape',
+        type=str,
+        default='lunar',
+        choices=['lunar', 'mars'],
+        help='Specify landscape type.'
+    )
+
+    # Duration of each replayed chunk
+    parser.add_argument(
+        '--chunk_seconds',
+        type=float,
+        default=60.0,
+        help='Duration of each chunk fed to the streaming detector, in seconds.'
+    )
+
+    # Warm-up period of the running threshold
+    parser.add_argument(
+        '--warmup_seconds',
+        type=float,
+        default=60.0,
+        help='Seconds of data used to establish the running threshold before onsets are emitted.'
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    # Imported here so the streaming detector itself does not depend on the batch pipeline
+    from SpectralFluxMethod import SpectralFlux
+
+    args = parse_args()
+    data = pd.read_hdf(args.input_file)
+    batch = SpectralFlux(None, None, args.landscape)
+
+    rows = []
+    for index, row in data.iterrows():
+        csv_times = np.array(row['np_time_rel(sec)'])
+        csv_data = np.array(row['np_velocity(m/s)'])
+        if len(csv_times) < 2 or len(csv_data) < 2:
+            print(f"Skipping row {index} due to insufficient data.")
+            continue
+        fs = 1 / (csv_times[1] - csv_times[0])
+
+        try:
+            batch_onset = batch.detect_onset(csv_data, fs)
+            detector = StreamingOnsetDetector(fs, batch.cutoff, warmup_time=args.warmup_seconds)
+        except ValueError as e:
+            print(f"Error in filtering data for event {row['evid']}: {e}")
+            continue
+
+        # Replay the trace in chunks as a live feed would deliver it
+        chunk_size = max(1, int(args.chunk_seconds * fs))
+        onsets = []
+        for start in range(0, len(csv_data), chunk_size):
+            onsets.extend(detector.process(csv_data[start:start + chunk_size]))
+        onsets.extend(detector.flush())
+
+        stream_onset = onsets[0]['onset_time'] if onsets else None
+        latency = onsets[0]['detected_at'] - onsets[0]['onset_time'] if onsets else None
+        deviation = abs(stream_onset - batch_onset) if stream_onset is not None and batch_onset is not None else None
+        rows.append({
+            'evid': row['evid'],
+            'onset_time_batch': batch_onset,
+            'onset_time_streaming': stream_onset,
+            'onset_deviation': deviation,
+            'num_streaming_onsets': len(onsets),
+            'detection_latency': latency,
+            'latency_bound': detector.max_latency + chunk_size / fs
+        })
+        print(f"Event {row['evid']}: batch {batch_onset}, streaming {stream_onset}, latency {latency} sec.")
+
+    comparison = pd.DataFrame(rows)
+    output_dir = os.path.dirname(args.output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    comparison.to_csv(args.output_file, index=False)
+
+    if len(comparison) > 0:
+        print(f"Median onset deviation: {comparison['onset_deviation'].median()} sec.")
+        print(f"Maximum detection latency: {comparison['detection_latency'].max()} sec.")
+    print(f"Comparison saved to {args.output_file}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
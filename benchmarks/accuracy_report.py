@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Make the repository modules importable when running from the benchmarks folder
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+from SpectralFluxMethod import SpectralFlux
+from CalculateMetric import Metrics
+from CatalogReader import open_catalog
+from synthetic import generate_catalog
+
+METRIC_COLUMNS = ['median_time_deviation', 'median_send_signal_percentage_predicted',
+                  'median_send_signal_percentage_truth', 'median_percentage_difference', 'median_signal_reduction']
+
+
+def load_events(input_file, landscape, num_events, seed):
+    """
+    Load the labelled events to evaluate, from a catalog or generated synthetically.
+
+    Args:
+        input_file (str or None): Training HDF5 file or ragged catalog directory, None for synthetic events.
+        landscape (str): 'lunar' or 'mars'.
+        num_events (int): Number of synthetic events.
+        seed (int): Seed of the synthetic generator.
+
+    Returns:
+        list: Velocity samples, sampling frequency, ground truth onset and duration of each event.
+    """
+    data = open_catalog(input_file) if input_file else generate_catalog(landscape, num_events, seed=seed)
+    events = []
+    for _, row in data.iterrows():
+        csv_times = np.asarray(row['np_time_rel(sec)'])
+        csv_data = np.asarray(row['np_velocity(m/s)'])
+        if len(csv_times) < 2 or len(csv_data) < 2:
+            continue
+        events.append((np.array(csv_data), 1 / (csv_times[1] - csv_times[0]), row['time_rel(sec)'],
+                       csv_times[-1] - csv_times[0]))
+    return events
+
+
+def evaluate(events, landscape, **options):
+    """
+    Run detection on every event and compute the metrics.
+
+    Args:
+        events (list): Events from load_events.
+        landscape (str): 'lunar' or 'mars'.
+        **options: Detector options, e.g. decimate=True, prescreen=True, chunk_time=600 or dtype='float32'.
+
+    Returns:
+        dict: Metrics, detection time per event, samples per second, largest memory allocated while
+            detecting one event, and the onsets of each event.
+    """
+    detector = SpectralFlux(None, None, landscape, **options)
+
+    def detect(csv_data, fs):
+        try:
+            return detector.detect_onset(csv_data, fs)
+        except ValueError:
+            return None
+
+    start = time.perf_counter()
+    onsets = [detect(csv_data, fs) for csv_data, fs, _, _ in events]
+    seconds = time.perf_counter() - start
+
+    # Separate pass for the memory, since tracing allocations slows the detection down
+    peak_bytes = 0
+    tracemalloc.start()
+    for csv_data, fs, _, _ in events:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        detect(csv_data, fs)
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    results = pd.DataFrame({
+        'onset_time_ground_truth': [truth for _, _, truth, _ in events],
+        'audio_duration': [duration for _, _, _, duration in events],
+        'onset_time_predicted': pd.array(onsets, dtype='Float64').astype(float)
+    })
+    metrics = Metrics(results, None).compute_metrics()
+    metrics['seconds_per_event'] = seconds / len(events)
+    metrics['samples_per_second'] = sum(len(csv_data) for csv_data, _, _, _ in events) / seconds
+    metrics['peak_memory_mb'] = peak_bytes / 2 ** 20
+    metrics['num_detected'] = sum(onset is not None for onset in onsets)
+    return metrics, onsets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detection accuracy and cost with and without a "
+                                                 "detector option.")
+    parser.add_argument('--option', type=str, default='decimate',
+                        choices=['decimate', 'prescreen', 'chunked', 'float32', 'fft_pad'],
+                        help='Detector option compared with the full-rate, full-trace detection.')
+    parser.add_argument('--chunk_time', type=float, default=600.0,
+                        help='Block length in seconds of the chunked option.')
+    parser.add_argument('--input_file', type=str, default=None,
+                        help='Training HDF5 file or ragged catalog directory (default is a synthetic catalog).')
+    parser.add_argument('--landscape', type=str, default='lunar', choices=['lunar', 'mars'], help='Landscape type.')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Metrics CSV of the reference run (default is <landscape>_metrics.csv in the repository).')
+    parser.add_argument('--events', type=int, default=20, help='Number of synthetic events.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic generator.')
+    parser.add_argument('--output_file', type=str, default='accuracy_report.csv',
+                        help='CSV file the report is written to.')
+    args = parser.parse_args()
+
+    events = load_events(args.input_file, args.landscape, args.events, args.seed)
+    full, full_onsets = evaluate(events, args.landscape)
+    if args.option == 'chunked':
+        options = {'chunk_time': args.chunk_time}
+    elif args.option == 'float32':
+        options = {'dtype': 'float32'}
+    else:
+        options = {args.option: True}
+    variant, variant_onsets = evaluate(events, args.landscape, **options)
+
+    rows = {'full': full, args.option: variant}
+    baseline_path = args.baseline or os.path.join(REPO_DIR, f'{args.landscape}_metrics.csv')
+    if os.path.exists(baseline_path):
+        rows = {'baseline': pd.read_csv(baseline_path).iloc[0].to_dict(), **rows}
+    report = pd.DataFrame.from_dict(rows, orient='index')
+    report.loc[f'{args.option} - full'] = report.loc[args.option] - report.loc['full']
+
+    # Per-event agreement of the two runs
+    shifts = [abs(a - b) for a, b in zip(full_onsets, variant_onsets) if a is not None and b is not None]
+    identical = sum(a == b for a, b in zip(full_onsets, variant_onsets))
+
+    pd.set_option('display.width', 200)
+    print(report[METRIC_COLUMNS + ['num_detected', 'seconds_per_event', 'samples_per_second',
+                                   'peak_memory_mb']].to_string())
+    if args.option == 'decimate' and events:
+        fs = events[0][1]
+        print(f"Decimation factor at {fs:.3f} Hz: {SpectralFlux(None, None, args.landscape).decimation_factor(fs)}")
+    print(f"Identical onsets: {identical} of {len(events)} events")
+    print(f"Onset shift between full and {args.option}: median {np.median(shifts) if shifts else np.nan:.2f} sec., "
+          f"max {np.max(shifts) if shifts else np.nan:.2f} sec. over {len(shifts)} events")
+    print(f"Speed-up of detection: {full['seconds_per_event'] / variant['seconds_per_event']:.2f}x")
+    print(f"Peak memory of one event: {full['peak_memory_mb']:.1f} MB full, {variant['peak_memory_mb']:.1f} MB "
+          f"{args.option}")
+    if args.input_file is None:
+        print(f"Events are synthetic: compare the full and {args.option} rows, not the baseline row.")
+
+    report.to_csv(args.output_file)
+    print(f"Accuracy report saved to {args.output_file}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
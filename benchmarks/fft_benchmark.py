@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Make the repository modules importable when running from the benchmarks folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from FFTBackend import FFTBackend, available_backends
+from SpectralFluxEngine import SpectralFluxEngine
+from synthetic import LANDSCAPES, generate_trace
+
+
+def time_per_event(engine, traces, repeat):
+    """
+    Best average wall time of the unsmoothed spectral flux of each trace, after one warm-up event.
+
+    The warm-up creates the plans of the backend, which later events of the same window size reuse.
+
+    Args:
+        engine (SpectralFluxEngine): Engine computing the flux.
+        traces (list): Traces of the landscape.
+        repeat (int): Number of timed passes over the traces.
+
+    Returns:
+        float: Seconds per trace.
+    """
+    engine.raw_flux(traces[0])
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for trace in traces:
+            engine.raw_flux(trace)
+        times.append((time.perf_counter() - start) / len(traces))
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the spectral flux on each FFT backend.")
+    parser.add_argument('--events', type=int, default=5, help='Number of synthetic events per landscape.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed passes, the best one is kept.')
+    parser.add_argument('--window_times', type=float, nargs='+', default=[0.2, 1.0, 5.0, 20.0],
+                        help='FFT window lengths in seconds.')
+    parser.add_argument('--hop_time', type=float, default=0.05, help='Step between FFT windows in seconds.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                        help='Thread counts of the scipy and pyfftw backends.')
+    parser.add_argument('--dtype', type=str, default='float64', choices=['float64', 'float32'],
+                        help='Precision of the traces.')
+    args = parser.parse_args()
+
+    backends = available_backends()
+    print(f"Backends: {', '.join(backends)}; {os.cpu_count()} CPUs")
+    print(f"{'landscape':<10}{'window':>8}{'n_fft':>8}{'backend':>9}{'pad':>6}{'workers':>9}{'ms/event':>11}"
+          f"{'speedup':>9}{'max rel diff':>15}")
+    rng = np.random.default_rng(0)
+    for landscape, config in LANDSCAPES.items():
+        fs = config['fs']
+        traces = [generate_trace(landscape, rng=rng)[1].astype(args.dtype) for _ in range(args.events)]
+        hop_size = max(1, int(args.hop_time * fs))
+        for window_time in args.window_times:
+            window_size = max(1, int(window_time * fs))
+            reference_engine = SpectralFluxEngine(window_size, hop_size)
+            reference_seconds = time_per_event(reference_engine, traces, args.repeat)
+            # Peaks are picked relative to the maximum, so fluxes are compared after normalizing by it
+            reference = reference_engine.raw_flux(traces[0])
+            reference = reference / np.max(reference)
+
+            for name in backends:
+                for pad in (False, True):
+                    for workers in sorted(set(args.workers)) if name != 'numpy' else [1]:
+                        engine = SpectralFluxEngine(window_size, hop_size, fft=FFTBackend(name, workers, pad))
+                        if pad and engine.fft_size == window_size:
+                            continue
+                        seconds = time_per_event(engine, traces, args.repeat)
+                        flux = engine.raw_flux(traces[0])
+                        diff = np.max(np.abs(flux / np.max(flux) - reference))
+                        print(f"{landscape:<10}{window_size:>8}{engine.fft_size:>8}{name:>9}{str(pad):>6}"
+                              f"{workers:>9}{seconds * 1e3:>11.2f}{reference_seconds / seconds:>9.2f}{diff:>15.2e}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from scipy.signal import butter, filtfilt
+
+# Make the repository modules importable when running from the benchmarks folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from LowPassFilter import LPassFilter
+from SpectralFluxMethod import SpectralFlux
+from synthetic import LANDSCAPES, generate_trace
+
+
+def legacy_filtering(data, cutoff, fs, order=4):
+    """
+    Filter the way LPassFilter did before the filter bank: design (b, a) on every call and use filtfilt.
+
+    Args:
+        data (numpy.ndarray): The input signal data.
+        cutoff (float): The cutoff frequency for the filter.
+        fs (float): The sampling frequency of the input data.
+        order (int): The order of the filter (default is 4).
+
+    Returns:
+        numpy.ndarray: The filtered signal.
+    """
+    b, a = butter(order, min(cutoff / (0.5 * fs), 1.0), btype='low')
+    return filtfilt(b, a, data)
+
+
+def time_per_event(function, traces):
+    """
+    Average wall time of a function applied to each trace.
+
+    Args:
+        function (callable): Function called with one trace.
+        traces (numpy.ndarray): 2-D batch of traces.
+
+    Returns:
+        float: Seconds per trace.
+    """
+    start = time.perf_counter()
+    for trace in traces:
+        function(trace)
+    return (time.perf_counter() - start) / len(traces)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-event cost of low-pass filtering.")
+    parser.add_argument('--events', type=int, default=20, help='Number of synthetic events per landscape.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'landscape':<10}{'legacy ms':>12}{'sos ms':>12}{'batch ms':>12}{'speedup':>10}{'max rel diff':>15}")
+    for landscape, config in LANDSCAPES.items():
+        fs, cutoff = config['fs'], SpectralFlux(None, None, landscape).cutoff
+        traces = np.array([generate_trace(landscape, rng=rng)[1] for _ in range(args.events)])
+        lpf = LPassFilter()
+
+        legacy = time_per_event(lambda trace: legacy_filtering(trace, cutoff, fs), traces)
+        cached = time_per_event(lambda trace: lpf.filtering(trace, cutoff, fs), traces)
+        start = time.perf_counter()
+        batched = lpf.filtering(traces, cutoff, fs)
+        batch = (time.perf_counter() - start) / len(traces)
+
+        reference = np.array([legacy_filtering(trace, cutoff, fs) for trace in traces[:2]])
+        diff = np.max(np.abs(batched[:2] - reference)) / np.max(np.abs(reference))
+        print(f"{landscape:<10}{legacy * 1e3:>12.2f}{cached * 1e3:>12.2f}{batch * 1e3:>12.2f}"
+              f"{legacy / cached:>10.2f}{diff:>15.2e}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+
+# Make the repository modules importable when running from the benchmarks folder
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+from synthetic import LANDSCAPES, generate_trace
+
+
+async def request(host, port, method, path, body=b'', connection=None):
+    """
+    Send one HTTP/1.1 request and read its JSON response.
+
+    Args:
+        host (str): Address of the service.
+        port (int): Port of the service.
+        method (str): HTTP method.
+        path (str): Path and query of the request.
+        body (bytes): Request body.
+        connection (tuple or None): Open (reader, writer) pair to reuse, a new one is opened if None.
+
+    Returns:
+        tuple: Status code, decoded response and the (reader, writer) pair, left open for reuse.
+    """
+    reader, writer = connection if connection is not None else await asyncio.open_connection(host, port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+                 f"Content-Type: application/octet-stream\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)), (reader, writer)
+
+
+async def wait_ready(host, port, timeout):
+    """
+    Wait until the service answers its health check.
+
+    Args:
+        host (str): Address of the service.
+        port (int): Port of the service.
+        timeout (float): Seconds to wait.
+
+    Raises:
+        TimeoutError: If the service does not answer in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, _, (_, writer) = await request(host, port, 'GET', '/health')
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"No service answered on {host}:{port} within {timeout} seconds.")
+
+
+async def run_load(host, port, paths, bodies, rate, duration, max_connections):
+    """
+    Send requests at a fixed rate and measure their latency.
+
+    Requests are scheduled open-loop: each one is due at a fixed time whatever the state of the
+    previous ones, and its latency is counted from that time, so waiting for a free connection is
+    part of the latency instead of lowering the request rate.
+
+    Args:
+        host (str): Address of the service.
+        port (int): Port of the service.
+        paths (list): Path and query of each trace.
+        bodies (list): Raw samples of each trace.
+        rate (float): Requests per second.
+        duration (float): Seconds during which requests are sent.
+        max_connections (int): Largest number of open connections.
+
+    Returns:
+        list: Latency in seconds, status and response of each request.
+    """
+    connections = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max_connections)
+    results = []
+
+    async def send(i, due):
+        async with semaphore:
+            connection = None if connections.empty() else connections.get_nowait()
+            try:
+                status, response, connection = await request(host, port, 'POST', paths[i % len(paths)],
+                                                             bodies[i % len(bodies)], connection)
+                connections.put_nowait(connection)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                status, response = None, {'error': repr(e)}
+            results.append((time.perf_counter() - due, status, response))
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(int(rate * duration)):
+        due = start + i / rate
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        tasks.append(asyncio.create_task(send(i, due)))
+    await asyncio.gather(*tasks)
+    while not connections.empty():
+        connections.get_nowait()[1].close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of DetectionService.py at a fixed request rate.")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address of the service.')
+    parser.add_argument('--port', type=int, default=8080, help='Port of the service.')
+    parser.add_argument('--spawn', action='store_true',
+                        help='Start DetectionService.py on the port for the test, with --service_args.')
+    parser.add_argument('--service_args', type=str, default='',
+                        help='Extra arguments of the spawned service, e.g. "--max_batch_size 1".')
+    parser.add_argument('--landscape', type=str, default='mars', choices=list(LANDSCAPES), help='Landscape type.')
+    parser.add_argument('--trace_seconds', type=float, default=None,
+                        help='Length of each trace in seconds (default is the landscape duration).')
+    parser.add_argument('--traces', type=int, default=8, help='Number of distinct synthetic traces sent in turn.')
+    parser.add_argument('--rate', type=float, default=20.0, help='Requests per second.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load.')
+    parser.add_argument('--max_connections', type=int, default=64, help='Largest number of open connections.')
+    args = parser.parse_args()
+
+    fs = LANDSCAPES[args.landscape]['fs']
+    rng = np.random.default_rng(0)
+    traces = [generate_trace(args.landscape, args.trace_seconds, rng=rng)[1] for _ in range(args.traces)]
+    bodies = [trace.astype('<f8').tobytes() for trace in traces]
+    paths = [f'/detect?fs={fs}&landscape={args.landscape}'] * len(bodies)
+
+    service = None
+    if args.spawn:
+        service = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'DetectionService.py'),
+                                    '--host', args.host, '--port', str(args.port)] + args.service_args.split())
+    try:
+        asyncio.run(wait_ready(args.host, args.port, timeout=60))
+        # Warm the filter designs and FFT plans of the service before measuring
+        asyncio.run(run_load(args.host, args.port, paths, bodies, rate=len(bodies), duration=1.0,
+                             max_connections=args.max_connections))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_load(args.host, args.port, paths, bodies, args.rate, args.duration,
+                                       args.max_connections))
+        elapsed = time.perf_counter() - start
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+    ok = [(latency, response) for latency, status, response in results if status == 200]
+    latencies = np.array([latency for latency, _ in ok]) * 1e3
+    print(f"Sent {len(results)} requests of {len(traces[0])} samples at {args.rate:g}/s in {elapsed:.1f} s: "
+          f"{len(ok)} ok, {len(results) - len(ok)} failed, {len(ok) / elapsed:.1f} responses/s")
+    if len(ok) == 0:
+        errors = {json.dumps(response) for _, _, response in results}
+        print(f"Errors: {', '.join(sorted(errors)[:5])}")
+        return
+    print(f"Latency (ms): p50 {np.percentile(latencies, 50):.1f}, p90 {np.percentile(latencies, 90):.1f}, "
+          f"p99 {np.percentile(latencies, 99):.1f}, max {latencies.max():.1f}")
+    print(f"Mean batch size {np.mean([response['batch_size'] for _, response in ok]):.1f}, "
+          f"mean queue {np.mean([response['queue_ms'] for _, response in ok]):.1f} ms, "
+          f"mean compute {np.mean([response['compute_ms'] for _, response in ok]):.1f} ms per batch")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+# Make the repository modules importable when running from the benchmarks folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from SpectralFluxMethod import SpectralFlux
+from RaggedCatalog import RaggedCatalog, RaggedCatalogWriter
+from Profiler import StageProfiler
+from synthetic import generate_catalog
+
+
+def write_catalog(path, landscape, num_events, duration):
+    """
+    Write a synthetic training catalog in the ragged format.
+
+    Args:
+        path (str): Directory of the catalog.
+        landscape (str): 'lunar' or 'mars'.
+        num_events (int): Number of events.
+        duration (float or None): Length of each trace in seconds (default is the landscape duration).
+    """
+    catalog = generate_catalog(landscape, num_events, duration)
+    metadata = catalog.drop(columns=['np_time_rel(sec)', 'np_velocity(m/s)'])
+    with RaggedCatalogWriter(path) as writer:
+        for i in range(len(catalog)):
+            writer.append(metadata.iloc[i].to_dict(), catalog['np_time_rel(sec)'].iloc[i],
+                          catalog['np_velocity(m/s)'].iloc[i])
+
+
+class SlowCatalog:
+    """
+    Catalog wrapper adding a fixed latency to the read of each event, like a network filesystem.
+    """
+
+    def __init__(self, catalog, latency):
+        """
+        Initialize the SlowCatalog class.
+
+        Args:
+            catalog (RaggedCatalog): Wrapped catalog.
+            latency (float): Seconds added to the read of each event.
+        """
+        self.catalog = catalog
+        self.latency = latency
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def iterrows(self):
+        for index, row in self.catalog.iterrows():
+            time.sleep(self.latency)
+            yield index, row
+
+
+def evict_page_cache(path):
+    """
+    Drop the cached pages of the samples of a catalog, so that the next run reads them from disk.
+
+    Args:
+        path (str): Directory of the catalog.
+    """
+    fd = os.open(os.path.join(path, 'velocity.bin'), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def run(catalog_dir, output_dir, landscape, prefetch, plots, cold, latency=0.0):
+    """
+    Time one detection run over the catalog.
+
+    Args:
+        catalog_dir (str): Directory of the catalog.
+        output_dir (str): Directory of the results, emptied first.
+        landscape (str): 'lunar' or 'mars'.
+        prefetch (int): Number of events read ahead, see SpectralFlux.
+        plots (str): Which events get images: 'none', 'sample' or 'all'.
+        cold (bool): Evict the samples from the page cache before the run.
+        latency (float): Seconds added to the read of each event.
+
+    Returns:
+        tuple: Wall time in seconds and stage totals of the run.
+    """
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+    if cold:
+        evict_page_cache(catalog_dir)
+    profiler = StageProfiler(enabled=True)
+    start = time.perf_counter()
+    data = RaggedCatalog(catalog_dir)
+    if latency > 0:
+        data = SlowCatalog(data, latency)
+    SpectralFlux(output_dir, data, landscape, plots=plots, profiler=profiler, prefetch=prefetch).onset_detection()
+    return time.perf_counter() - start, profiler.totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial and prefetching detection runs on cold and warm "
+                                                 "page caches.")
+    parser.add_argument('--landscape', type=str, default='lunar', choices=['lunar', 'mars'], help='Landscape type.')
+    parser.add_argument('--events', type=int, default=40, help='Number of synthetic events.')
+    parser.add_argument('--duration', type=float, default=None, help='Trace length in seconds.')
+    parser.add_argument('--prefetch', type=int, nargs='+', default=[0, 2, 8], help='Prefetch depths to compare.')
+    parser.add_argument('--plots', type=str, default='none', choices=['none', 'sample', 'all'],
+                        help='Which events get images.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to the read of each event, to emulate slow or remote storage.')
+    parser.add_argument('--catalog_dir', type=str, default=None,
+                        help='Ragged catalog to run on (default is a synthetic catalog in a temporary directory).')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    try:
+        catalog_dir = args.catalog_dir
+        if catalog_dir is None:
+            catalog_dir = os.path.join(work_dir, 'catalog')
+            write_catalog(catalog_dir, args.landscape, args.events, args.duration)
+        num_events = len(RaggedCatalog(catalog_dir))
+
+        print(f"{'cache':<7}{'prefetch':>9}{'seconds':>10}{'events/s':>10}{'speedup':>9}{'load':>8}"
+              f"{'compute':>9}{'read wait':>11}{'write':>8}")
+        for cold in (True, False):
+            serial = None
+            for prefetch in args.prefetch:
+                seconds, totals = run(catalog_dir, os.path.join(work_dir, 'output'), args.landscape, prefetch,
+                                      args.plots, cold, args.latency)
+                serial = serial or seconds
+                compute = sum(totals.get(name, 0.0) for name in ('copy', 'filter', 'fft', 'find_peaks'))
+                write = totals.get('results_write', 0.0) + totals.get('background_write', 0.0)
+                print(f"{'cold' if cold else 'warm':<7}{prefetch:>9}{seconds:>10.2f}{num_events / seconds:>10.1f}"
+                      f"{serial / seconds:>9.2f}{totals.get('load', 0.0):>8.2f}{compute:>9.2f}"
+                      f"{totals.get('prefetch_wait', 0.0):>11.2f}{write:>8.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
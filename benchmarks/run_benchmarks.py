@@ -0,0 +1,194 @@
+import os
+import sys
+import io
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+import scipy
+
+# Make the repository modules importable when running from the benchmarks folder
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+from SpectralFluxMethod import SpectralFlux
+from LowPassFilter import LPassFilter
+from CalculateMetric import Metrics
+from synthetic import LANDSCAPES, generate_trace
+
+
+def median_time(function, repeat):
+    """
+    Median wall time of a function over several runs.
+
+    Args:
+        function (callable): Function called without arguments.
+        repeat (int): Number of runs.
+
+    Returns:
+        float: Median time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def record(name, landscape, seconds, num_events, num_samples):
+    """
+    Build the result entry of one benchmark.
+
+    Args:
+        name (str): Name of the benchmark.
+        landscape (str): Landscape of the synthetic traces.
+        seconds (float): Time to process all events.
+        num_events (int): Number of events processed.
+        num_samples (int): Number of samples processed.
+
+    Returns:
+        dict: Result entry with throughput in samples/s and events/s.
+    """
+    result = {
+        'name': name,
+        'landscape': landscape,
+        'num_events': num_events,
+        'num_samples': num_samples,
+        'seconds': seconds,
+        'samples_per_second': num_samples / seconds if seconds > 0 else None,
+        'events_per_second': num_events / seconds if seconds > 0 else None
+    }
+    print(f"{name:<16}{landscape:<8}{seconds * 1e3:>12.2f} ms{result['events_per_second']:>14.1f} ev/s"
+          f"{result['samples_per_second']:>16.3e} samples/s")
+    return result
+
+
+def benchmark_landscape(landscape, num_events, duration, repeat, rng):
+    """
+    Run the microbenchmarks of one landscape on synthetic traces.
+
+    Args:
+        landscape (str): 'lunar' or 'mars'.
+        num_events (int): Number of synthetic traces.
+        duration (float or None): Length of each trace in seconds (default is the landscape duration).
+        repeat (int): Number of runs of each benchmark.
+        rng (numpy.random.Generator): Random generator.
+
+    Returns:
+        list: Result entries.
+    """
+    fs = LANDSCAPES[landscape]['fs']
+    traces = [generate_trace(landscape, duration, rng=rng)[1] for _ in range(num_events)]
+    num_samples = sum(len(trace) for trace in traces)
+
+    detector = SpectralFlux(None, None, landscape)
+    lpf = LPassFilter()
+    window_size = max(1, int(detector.window_time * fs))
+    hop_size = max(1, int(detector.hop_time * fs))
+    filtered = [lpf.filtering(trace, detector.cutoff, fs) for trace in traces]
+    fluxes = [detector._compute_spectral_flux(trace, fs, window_size, hop_size) for trace in filtered]
+
+    results = []
+    seconds = median_time(lambda: [lpf.filtering(trace, detector.cutoff, fs) for trace in traces], repeat)
+    results.append(record('filtering', landscape, seconds, num_events, num_samples))
+
+    seconds = median_time(lambda: [detector._compute_spectral_flux(trace, fs, window_size, hop_size)
+                                   for trace in filtered], repeat)
+    results.append(record('spectral_flux', landscape, seconds, num_events, num_samples))
+
+    seconds = median_time(lambda: [detector.pick_onset(flux, time_vals, fs, detector.height_factor,
+                                                       detector.min_time_between_peaks)
+                                   for flux, time_vals in fluxes], repeat)
+    results.append(record('peak_detection', landscape, seconds, num_events, num_samples))
+
+    seconds = median_time(lambda: [detector.detect_onset(trace, fs) for trace in traces], repeat)
+    results.append(record('detect_onset', landscape, seconds, num_events, num_samples))
+    return results
+
+
+def benchmark_metrics(num_results, repeat, rng):
+    """
+    Benchmark Metrics.calculate_metrics on a synthetic results table.
+
+    Args:
+        num_results (int): Number of result rows.
+        repeat (int): Number of runs.
+        rng (numpy.random.Generator): Random generator.
+
+    Returns:
+        dict: Result entry.
+    """
+    duration = np.full(num_results, 86400.0)
+    truth = rng.uniform(0, 86400, num_results)
+    predicted = np.where(rng.random(num_results) < 0.05, np.nan, truth + rng.normal(0, 300, num_results))
+
+    with tempfile.TemporaryDirectory() as saved_dir:
+        def run():
+            results = pd.DataFrame({
+                'onset_time_ground_truth': truth,
+                'audio_duration': duration,
+                'onset_time_predicted': predicted
+            })
+            with redirect_stdout(io.StringIO()):
+                Metrics(results, saved_dir).calculate_metrics()
+
+        seconds = median_time(run, repeat)
+    return record('metrics', 'any', seconds, num_results, num_results)
+
+
+def git_commit():
+    """
+    Commit of the benchmarked code, if the repository is a git checkout.
+
+    Returns:
+        str or None: Commit hash.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the microbenchmark suite on synthetic seismic traces.")
+    parser.add_argument('--output_file', type=str, default='benchmark_results.json',
+                        help='JSON file the results are written to.')
+    parser.add_argument('--events', type=int, default=5, help='Number of synthetic events per landscape.')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Trace length in seconds (default is one day on the Moon, one hour on Mars).')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs of each benchmark.')
+    parser.add_argument('--metrics_rows', type=int, default=100000, help='Number of rows for the metrics benchmark.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    benchmarks = []
+    for landscape in LANDSCAPES:
+        benchmarks.extend(benchmark_landscape(landscape, args.events, args.duration, args.repeat, rng))
+    benchmarks.append(benchmark_metrics(args.metrics_rows, args.repeat, rng))
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'pandas': pd.__version__,
+        'config': vars(args),
+        'benchmarks': benchmarks
+    }
+    with open(args.output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark results saved to {args.output_file}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
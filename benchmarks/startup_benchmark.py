@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points and the modules their import must not load: detection without images or metrics stays headless
+FORBIDDEN_IMPORTS = {
+    'SpectralFluxMethod': ['matplotlib', 'pandas', 'CalculateMetric', 'MetricsAggregator'],
+    'DetectionService': ['matplotlib', 'pandas', 'CalculateMetric', 'MetricsAggregator'],
+    'Inference': ['matplotlib', 'CalculateMetric', 'MetricsAggregator'],
+    'Plotting': ['matplotlib'],
+    'spectrogram_creation': ['matplotlib'],
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse the report of `python -X importtime`.
+
+    Args:
+        stderr (str): Standard error of the interpreter.
+
+    Returns:
+        list: (name, depth, self microseconds, cumulative microseconds) of each imported module, in report order.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace('import time:', '|', 1).split('|'))
+        name = name[1:]
+        modules.append((name.strip(), (len(name) - len(name.lstrip())) // 2, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure(module, repeat):
+    """
+    Import a module in fresh interpreters and time it.
+
+    Args:
+        module (str): Name of the module, importable from the repository root.
+        repeat (int): Number of timed interpreters, after one that compiles the bytecode.
+
+    Returns:
+        tuple: Median wall time of the interpreter in seconds, median import time of the module in seconds,
+            and the import report of the last run.
+    """
+    command = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    walls, imports, modules = [], [], []
+    for i in range(repeat + 1):
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+        if i == 0:
+            continue
+        modules = parse_importtime(completed.stderr)
+        walls.append(wall)
+        imports.append(next(cumulative for name, depth, _, cumulative in modules
+                            if depth == 0 and name == module) / 1e6)
+    return float(np.median(walls)), float(np.median(imports)), modules
+
+
+def direct_imports(modules, module):
+    """
+    Imports made by the module itself, with the time they took including their own imports.
+
+    Args:
+        modules (list): Import report parsed by parse_importtime.
+        module (str): Name of the module.
+
+    Returns:
+        list: (cumulative microseconds, name) of each direct import, heaviest first.
+    """
+    children = []
+    for name, depth, _, cumulative in modules:
+        # A module is reported after its own imports, so its children are the entries one level
+        # deeper since the previous top-level entry
+        if depth == 0:
+            if name == module:
+                return sorted(children, reverse=True)
+            children = []
+        elif depth == 1:
+            children.append((cumulative, name))
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the entry points and check that "
+                                                 "headless detection does not load plotting or evaluation code.")
+    parser.add_argument('--modules', type=str, nargs='+', default=list(FORBIDDEN_IMPORTS),
+                        help='Modules to import, from the repository root.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed interpreters per module.')
+    parser.add_argument('--top', type=int, default=5, help='Number of heaviest direct imports listed per module.')
+    parser.add_argument('--max_ms', type=float, default=None,
+                        help='Fail if the import of a module takes longer than this many milliseconds.')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<20}{'wall ms':>10}{'import ms':>11}{'modules':>9}  heaviest direct imports (ms)")
+    for module in args.modules:
+        wall, seconds, modules = measure(module, args.repeat)
+        heaviest = ', '.join(f'{name} {cumulative / 1e3:.0f}'
+                             for cumulative, name in direct_imports(modules, module)[:args.top])
+        print(f"{module:<20}{wall * 1e3:>10.0f}{seconds * 1e3:>11.0f}{len(modules):>9}  {heaviest}")
+
+        names = {name for name, _, _, _ in modules}
+        loaded = [forbidden for forbidden in FORBIDDEN_IMPORTS.get(module, [])
+                  if any(name == forbidden or name.startswith(forbidden + '.') for name in names)]
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)}")
+        if args.max_ms is not None and seconds * 1e3 > args.max_ms:
+            failures.append(f"{module} takes {seconds * 1e3:.0f} ms to import, above {args.max_ms:g} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# Sampling rate, trace duration, noise level and signal band of each landscape
+LANDSCAPES = {
+    'lunar': {'fs': 6.625, 'duration': 86400.0, 'noise': 1e-10, 'band': (0.3, 1.0), 'key': 'catalog_data'},
+    'mars': {'fs': 20.0, 'duration': 3600.0, 'noise': 1e-10, 'band': (0.8, 2.0), 'key': 'mars_training'},
+}
+
+
+def generate_trace(landscape='lunar', duration=None, onset_time=None, snr=20.0, noise=None, rng=None):
+    """
+    Generate a synthetic seismic trace with an injected event.
+
+    The background is white noise plus a slow random-walk drift. The event is a band-limited
+    oscillation with an emergent onset (a rise of a few tens of seconds) and an exponential
+    coda, as in the lunar and Martian catalogs.
+
+    Args:
+        landscape (str): 'lunar' or 'mars', selecting sampling rate, default duration, noise and band.
+        duration (float or None): Length of the trace in seconds (default is the landscape duration).
+        onset_time (float or None): Relative time of the event onset, None for a random time in the trace.
+        snr (float): Peak event amplitude relative to the noise level.
+        noise (float or None): Standard deviation of the noise (default is the landscape noise level).
+        rng (numpy.random.Generator or None): Random generator.
+
+    Returns:
+        tuple: Relative time array, velocity array and onset time in seconds.
+    """
+    config = LANDSCAPES[landscape]
+    rng = rng if rng is not None else np.random.default_rng()
+    duration = duration if duration is not None else config['duration']
+    noise = noise if noise is not None else config['noise']
+    fs = config['fs']
+
+    num_samples = int(duration * fs)
+    times = np.arange(num_samples) / fs
+    if onset_time is None:
+        onset_time = rng.uniform(0.1, 0.8) * duration
+
+    velocity = rng.standard_normal(num_samples) * noise
+    velocity += np.cumsum(rng.standard_normal(num_samples)) * noise * 0.01
+
+    # Emergent, band-limited event starting at the onset
+    elapsed = np.clip(times - onset_time, 0, None)
+    envelope = (1 - np.exp(-elapsed / 20.0)) * np.exp(-elapsed / (0.05 * duration))
+    frequency = rng.uniform(*config['band'])
+    velocity += snr * noise * envelope * np.sin(2 * np.pi * frequency * elapsed)
+    return times, velocity, onset_time
+
+
+def generate_catalog(landscape='lunar', num_events=10, duration=None, seed=0):
+    """
+    Generate a synthetic catalog with the columns of the training HDF5 files.
+
+    Args:
+        landscape (str): 'lunar' or 'mars'.
+        num_events (int): Number of events.
+        duration (float or None): Length of each trace in seconds (default is the landscape duration).
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pandas.DataFrame: Catalog with one trace per row.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(num_events):
+        times, velocity, onset_time = generate_trace(landscape, duration, snr=rng.uniform(5, 50), rng=rng)
+        rows.append({
+            'filename': f'synthetic_{landscape}_{i:05d}',
+            'time_abs(%Y-%m-%dT%H:%M:%S.%f)': (pd.Timestamp('1970-01-01') + pd.Timedelta(days=i)).strftime(
+                '%Y-%m-%dT%H:%M:%S.%f'),
+            'time_rel(sec)': onset_time,
+            'evid': f'evid{i:05d}',
+            'mq_type': 'synthetic',
+            'np_time_rel(sec)': times,
+            'np_velocity(m/s)': velocity
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic training catalog to an HDF5 file.")
+    parser.add_argument('--output_file', type=str, required=True, help='Path of the HDF5 file to write.')
+    parser.add_argument('--landscape', type=str, default='lunar', choices=list(LANDSCAPES), help='Landscape type.')
+    parser.add_argument('--events', type=int, default=10, help='Number of events.')
+    parser.add_argument('--duration', type=float, default=None, help='Trace length in seconds.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.landscape, args.events, args.duration, args.seed)
+    catalog.to_hdf(args.output_file, key=LANDSCAPES[args.landscape]['key'], mode='w')
+    print(f"Synthetic catalog with {args.events} events saved to {args.output_file}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
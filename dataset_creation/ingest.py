@@ -0,0 +1,390 @@
+import numpy as np
+import pandas as pd
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+warnings.filterwarnings('ignore')
+
+# Make the repository modules importable when running from the dataset_creation folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RaggedCatalog import RaggedCatalog, RaggedCatalogWriter, compact_catalog
+
+# Columns read from the per-event CSV files of each landscape
+CSV_COLUMNS = {
+    'lunar': ('time_rel(sec)', 'velocity(m/s)'),
+    'mars': ('rel_time(sec)', 'velocity(c/s)'),
+}
+
+# HDF5 key and array columns of the training outputs, as written by the original scripts
+TRAIN_KEYS = {'lunar': 'catalog_data', 'mars': 'mars_training'}
+TRAIN_ARRAY_COLUMNS = ('np_time_rel(sec)', 'np_velocity(m/s)')
+TEST_KEY = 'processed_data'
+TEST_ARRAY_COLUMNS = ('time_rel(sec)', 'velocity(m/s)')
+
+# Manifest of the source files of a ragged catalog, kept in the catalog directory
+MANIFEST_FILE = 'manifest.json'
+
+# Fraction of unreferenced samples in velocity.bin above which an update compacts the catalog
+COMPACT_DEAD_FRACTION = 0.5
+
+
+def _parse_trace(source, landscape):
+    time_column, velocity_column = CSV_COLUMNS[landscape]
+    try:
+        data = pd.read_csv(source, usecols=[time_column, velocity_column],
+                           dtype={time_column: np.float64, velocity_column: np.float64})
+    except (KeyError, ValueError):
+        # If the required columns are not found, use empty arrays
+        return np.array([]), np.array([])
+    return data[time_column].to_numpy(), data[velocity_column].to_numpy()
+
+
+def read_trace(csv_file, landscape):
+    """
+    Read the time and velocity columns of one event CSV file as float64 arrays.
+
+    Args:
+        csv_file (str): Path to the CSV file.
+        landscape (str): 'lunar' or 'mars', selecting the column names.
+
+    Returns:
+        tuple: Time and velocity arrays, both empty if the file or its columns are missing.
+    """
+    if not os.path.exists(csv_file):
+        return np.array([]), np.array([])
+    return _parse_trace(csv_file, landscape)
+
+
+def read_source(csv_file, landscape):
+    """
+    Read one event CSV file and hash its content, reading the file only once.
+
+    Args:
+        csv_file (str): Path to the CSV file.
+        landscape (str): 'lunar' or 'mars', selecting the column names.
+
+    Returns:
+        tuple: Time and velocity arrays (empty if the file or its columns are missing) and the
+            hex digest of the file content (None if the file is missing).
+    """
+    if not os.path.exists(csv_file):
+        return np.array([]), np.array([]), None
+    with open(csv_file, 'rb') as f:
+        content = f.read()
+    times, velocity = _parse_trace(io.BytesIO(content), landscape)
+    return times, velocity, hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def file_digest(path):
+    """
+    Hash the content of a file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: Hex digest, as computed by read_source.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_task(args):
+    reader, csv_file, landscape = args
+    return reader(csv_file, landscape)
+
+
+def read_traces(csv_files, landscape, workers=1, reader=read_trace):
+    """
+    Read event CSV files in parallel, yielding them in order with a bounded number in flight.
+
+    Args:
+        csv_files (iterable): Paths to the CSV files.
+        landscape (str): 'lunar' or 'mars'.
+        workers (int): Number of parsing processes (1 parses in the current process).
+        reader (callable): read_trace, or read_source to also hash each file.
+
+    Yields:
+        tuple: Value returned by the reader for each file.
+    """
+    if workers <= 1:
+        for csv_file in csv_files:
+            yield reader(csv_file, landscape)
+        return
+
+    max_in_flight = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for csv_file in csv_files:
+            in_flight.append(executor.submit(_read_task, (reader, csv_file, landscape)))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def load_manifest(output_path):
+    """
+    Load the source manifest of a complete ragged catalog.
+
+    Args:
+        output_path (str): Directory of the catalog.
+
+    Returns:
+        dict or None: Size, mtime, content hash and catalog position of each source file, keyed by
+            name, or None if there is no complete catalog with a readable manifest matching it, in
+            which case the catalog is rebuilt.
+    """
+    manifest_path = os.path.join(output_path, MANIFEST_FILE)
+    if not RaggedCatalog.is_catalog(output_path) or not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        files = manifest['files']
+        num_events = len(RaggedCatalog(output_path))
+        positions = [entry['position'] for entry in files.values()]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        print(f'Ignoring the unreadable manifest of {output_path}')
+        return None
+    if (manifest.get('num_events', num_events) != num_events or len(set(positions)) != len(positions)
+            or not all(isinstance(position, int) and 0 <= position < num_events for position in positions)):
+        print(f'Ignoring the manifest of {output_path}, which does not match its catalog')
+        return None
+    return files
+
+
+def plan_update(sources, manifest):
+    """
+    Decide which source files have to be parsed and which events can be reused.
+
+    A file is unchanged if its size and mtime match the manifest, or if they differ but its
+    content hash does not (e.g. after a copy); only then is the file read.
+
+    Args:
+        sources (list): Name and path of the source file of each event, in catalog order.
+        manifest (dict or None): Manifest of the existing catalog.
+
+    Returns:
+        list: For each event, the manifest entry to reuse (with refreshed size and mtime), or None
+            if the file has to be parsed.
+    """
+    plan = []
+    for name, csv_file in sources:
+        entry = (manifest or {}).get(name)
+        if entry is None or not os.path.exists(csv_file):
+            plan.append(None)
+            continue
+        stat = os.stat(csv_file)
+        if (stat.st_size, stat.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+            if stat.st_size != entry['size'] or file_digest(csv_file) != entry['hash']:
+                plan.append(None)
+                continue
+        plan.append({**entry, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    return plan
+
+
+def write_events(output_path, output_format, key, metadata, sources, landscape, workers, time_column,
+                 velocity_column, rebuild=False):
+    """
+    Write the events of a set of source files, appending them one by one for the ragged format.
+
+    A ragged catalog written by a previous run is updated in place: with the manifest of its
+    source files, only new or changed files are parsed and appended, unchanged events keep their
+    samples, and events of deleted files are dropped. The HDF5 output is always rebuilt.
+
+    Args:
+        output_path (str): Ragged catalog directory or HDF5 file.
+        output_format (str): 'ragged' (incremental, bounded memory) or 'h5' (the original
+            pandas HDF5 layout, which has to hold every trace in memory before writing).
+        key (str): HDF5 key of the data.
+        metadata (pandas.DataFrame): Scalar metadata of each event.
+        sources (list): Name and path of the source CSV file of each event, in the order of metadata.
+        landscape (str): 'lunar' or 'mars'.
+        workers (int): Number of parsing processes.
+        time_column (str): Name of the time array column.
+        velocity_column (str): Name of the velocity array column.
+        rebuild (bool): Parse every file and rewrite the catalog from scratch.
+    """
+    if output_format == 'h5':
+        time_list, velocity_list = [], []
+        for times, velocity in read_traces([csv_file for _, csv_file in sources], landscape, workers):
+            time_list.append(times)
+            velocity_list.append(velocity)
+        dataset = metadata.copy()
+        dataset[time_column] = time_list
+        dataset[velocity_column] = velocity_list
+        dataset.to_hdf(output_path, key=key, mode='w')
+        print(f'File saved successfully: {output_path}')
+        return
+
+    manifest = None if rebuild else load_manifest(output_path)
+    plan = plan_update(sources, manifest)
+    previous = RaggedCatalog(output_path) if manifest is not None else None
+    to_parse = [csv_file for (_, csv_file), entry in zip(sources, plan) if entry is None]
+    traces = read_traces(to_parse, landscape, workers, reader=read_source)
+
+    # The positions of the old manifest are invalid as soon as the catalog is rewritten, so it is removed
+    # first and an interrupted update is redone from scratch
+    manifest_path = os.path.join(output_path, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    files = {}
+    num_parsed = 0
+    with RaggedCatalogWriter(output_path, time_column, velocity_column, append=previous is not None) as writer:
+        for i, ((name, csv_file), entry) in enumerate(zip(sources, plan)):
+            if entry is not None:
+                writer.reuse(previous, entry['position'], metadata.iloc[i].to_dict())
+            else:
+                times, velocity, digest = next(traces)
+                writer.append(metadata.iloc[i].to_dict(), times, velocity)
+                if digest is None:
+                    continue
+                num_parsed += 1
+                stat = os.stat(csv_file)
+                entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+            files[name] = {**entry, 'position': i}
+    del previous
+
+    num_dropped = len(set(manifest or {}) - set(files))
+    print(f'File saved successfully: {output_path} ({num_parsed} parsed, '
+          f'{len(sources) - len(to_parse)} reused, {num_dropped} dropped)')
+
+    # Reclaim the samples of changed and deleted files once they dominate the file
+    catalog = RaggedCatalog(output_path)
+    if catalog.dead_samples > COMPACT_DEAD_FRACTION * len(catalog.velocity):
+        del catalog
+        print(f'Compacted {output_path}: {compact_catalog(output_path)} samples reclaimed')
+    else:
+        del catalog
+
+    # The manifest is written last and atomically, so an interrupted update leaves no manifest behind
+    temp_path = f'{manifest_path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'format_version': 1, 'landscape': landscape, 'num_events': len(sources), 'files': files}, f,
+                  indent=2)
+    os.replace(temp_path, manifest_path)
+
+
+def ingest_train(landscape, cat_file, data_directory, output_path, output_format='ragged', workers=1,
+                 rebuild=False):
+    """
+    Ingest a training catalog and the event CSV files it refers to.
+
+    Args:
+        landscape (str): 'lunar' or 'mars'.
+        cat_file (str): Path to the catalog CSV file.
+        data_directory (str): Directory of the event CSV files.
+        output_path (str): Ragged catalog directory or HDF5 file to write.
+        output_format (str): 'ragged' or 'h5'.
+        workers (int): Number of parsing processes.
+        rebuild (bool): Parse every file instead of updating an existing ragged catalog.
+    """
+    catalog = pd.read_csv(cat_file)
+
+    # Lunar catalogs list filenames without extension, Mars catalogs with it
+    extension = '.csv' if landscape == 'lunar' else ''
+    sources = [(f'{filename}{extension}', os.path.join(data_directory, f'{filename}{extension}'))
+               for filename in catalog['filename']]
+
+    write_events(output_path, output_format, TRAIN_KEYS[landscape], catalog, sources, landscape, workers,
+                 *TRAIN_ARRAY_COLUMNS, rebuild=rebuild)
+
+
+def ingest_folder(landscape, folder_path, output_path, output_format='ragged', workers=1, rebuild=False):
+    """
+    Ingest all event CSV files of a test folder.
+
+    Args:
+        landscape (str): 'lunar' or 'mars'.
+        folder_path (str): Directory of the event CSV files.
+        output_path (str): Ragged catalog directory or HDF5 file to write.
+        output_format (str): 'ragged' or 'h5'.
+        workers (int): Number of parsing processes.
+        rebuild (bool): Parse every file instead of updating an existing ragged catalog.
+    """
+    filenames = sorted(file for file in os.listdir(folder_path) if file.endswith('.csv'))
+    metadata = pd.DataFrame({'filename': filenames})
+    sources = [(file, os.path.join(folder_path, file)) for file in filenames]
+    write_events(output_path, output_format, TEST_KEY, metadata, sources, landscape, workers, *TEST_ARRAY_COLUMNS,
+                 rebuild=rebuild)
+
+
+def ingest_test(landscape, base_directory, output_directory, output_format='ragged', workers=1, rebuild=False):
+    """
+    Ingest the test data of a landscape: one output per station folder on the Moon, one for Mars.
+
+    Args:
+        landscape (str): 'lunar' or 'mars'.
+        base_directory (str): Directory of the test data.
+        output_directory (str): Directory the outputs are written to.
+        output_format (str): 'ragged' or 'h5'.
+        workers (int): Number of parsing processes.
+        rebuild (bool): Parse every file instead of updating existing ragged catalogs.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    extension = '.h5' if output_format == 'h5' else ''
+    if landscape == 'mars':
+        output_path = os.path.join(output_directory, f'mars_lunar_test{extension}')
+        ingest_folder(landscape, base_directory, output_path, output_format, workers, rebuild)
+        return
+
+    for folder in sorted(os.listdir(base_directory)):
+        folder_path = os.path.join(base_directory, folder)
+        # Check if the current item is a directory
+        if os.path.isdir(folder_path):
+            output_path = os.path.join(output_directory, f'{folder}_lunar_test{extension}')
+            ingest_folder(landscape, folder_path, output_path, output_format, workers, rebuild)
+
+
+def parse_args():
+    # Set up argument parser with one command per dataset variant
+    parser = argparse.ArgumentParser(description="Ingest seismic CSV files into a catalog for Inference.py.")
+    subparsers = parser.add_subparsers(dest='variant', required=True)
+
+    for landscape in ('lunar', 'mars'):
+        train = subparsers.add_parser(f'{landscape}_train', help=f'Ingest the {landscape} training catalog.')
+        train.add_argument('--catalog_file', type=str, required=True, help='Path to the catalog CSV file.')
+        train.add_argument('--data_dir', type=str, required=True, help='Directory of the event CSV files.')
+        train.add_argument('--output', type=str, required=True,
+                           help='Ragged catalog directory (or *.h5 file with --format h5) to write.')
+
+        test = subparsers.add_parser(f'{landscape}_test', help=f'Ingest the {landscape} test data.')
+        test.add_argument('--data_dir', type=str, required=True, help='Directory of the test data.')
+        test.add_argument('--output_dir', type=str, required=True, help='Directory the outputs are written to.')
+
+        for subparser in (train, test):
+            subparser.add_argument('--format', type=str, default='ragged', choices=['ragged', 'h5'],
+                                   help='Output format (default is the incremental ragged catalog).')
+            subparser.add_argument('--workers', type=int, default=1,
+                                   help='Number of processes parsing CSV files in parallel (default is 1).')
+            subparser.add_argument('--rebuild', action='store_true',
+                                   help='Parse every file instead of updating an existing ragged catalog '
+                                        'with only new or changed files.')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    landscape, kind = args.variant.split('_')
+    if kind == 'train':
+        ingest_train(landscape, args.catalog_file, args.data_dir, args.output, args.format, args.workers,
+                     args.rebuild)
+    else:
+        ingest_test(landscape, args.data_dir, args.output_dir, args.format, args.workers, args.rebuild)
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import pandas as pd
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.fftpack import fft
+from scipy.fft import fft
 from scipy.signal import find_peaks
 pd.set_option('display.max_columns', None)
 
@@ -1,90 +1,310 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from scipy.signal import spectrogram
+from CatalogReader import open_catalog
+from Utils import array_digest
 import pandas as pd
-import os
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.signal import spectrogram
+import argparse
+import tempfile
+import shutil
+import os
+
+# Bump when a change of the spectrogram computation alters its arrays, so that older entries are never served
+SPECTROGRAM_VERSION = 1
+
+
+class SpectrogramCache:
+    """
+    Persistent, content-addressed cache of spectrograms.
+
+    Each entry is a directory named after the digest of the trace samples and the sampling frequency,
+    holding the frequency, time and power arrays as .npy files. Entries are read back as memory maps, so
+    re-plotting or analysing a catalog reads only the parts of the spectrograms it touches and never
+    recomputes an STFT. Entries are written to a temporary directory and renamed into place, which lets
+    the worker processes of a pool share the cache.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the SpectrogramCache class.
+
+        Args:
+            path (str): Directory of the cache, created if needed.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(velocity, fs):
+        """
+        Cache key of the spectrogram of a trace.
+
+        Args:
+            velocity (numpy.ndarray): Velocity samples of the trace.
+            fs (float): Sampling frequency.
+
+        Returns:
+            str: Hexadecimal digest.
+        """
+        return array_digest(velocity, fs, SPECTROGRAM_VERSION)
+
+    def get(self, key):
+        """
+        Look up the spectrogram of a key.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            tuple or None: Memory-mapped frequencies, times and power of the spectrogram, None if not cached.
+        """
+        entry_dir = os.path.join(self.path, key)
+        try:
+            return tuple(np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode='r') for name in ('f', 't', 'Sxx'))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, f, t, Sxx):
+        """
+        Store the spectrogram of a key.
+
+        Args:
+            key (str): Cache key.
+            f (numpy.ndarray): Frequencies.
+            t (numpy.ndarray): Times.
+            Sxx (numpy.ndarray): Power of each frequency (rows) and time (columns).
+        """
+        temp_dir = tempfile.mkdtemp(dir=self.path, prefix='.tmp-')
+        try:
+            for name, values in (('f', f), ('t', t), ('Sxx', Sxx)):
+                np.save(os.path.join(temp_dir, f'{name}.npy'), values)
+            os.rename(temp_dir, os.path.join(self.path, key))
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def spectrogram_peaks(f, t, Sxx, start_time):
+    """
+    Frequency of maximum power at the start of the event, and time and frequency of the global maximum.
+
+    Args:
+        f (numpy.ndarray): Frequencies.
+        t (numpy.ndarray): Times.
+        Sxx (numpy.ndarray): Power of each frequency (rows) and time (columns).
+        start_time (float): Ground truth start time of the event.
+
+    Returns:
+        dict: 'max_frequency' at the start time, 'global_max_time' and 'global_max_frequency'.
+    """
+    # Find the index in the `t` array that corresponds to the start time
+    start_time_index = np.argmin(np.abs(t - start_time))
+
+    # Find the maximum power across the entire time and frequency (first one in row order on ties)
+    max_freq_idx, max_time_idx = np.unravel_index(np.argmax(Sxx), Sxx.shape)
+    return {
+        'max_frequency': f[np.argmax(Sxx[:, start_time_index])],
+        'global_max_time': t[max_time_idx],
+        'global_max_frequency': f[max_freq_idx]
+    }
+
+
+def plot_spectrogram(f, t, Sxx, start_time, peaks, index, output_image_path):
+    """
+    Plot a spectrogram with the start of the event and its maximum power frequencies, and save it.
+
+    Args:
+        f (numpy.ndarray): Frequencies.
+        t (numpy.ndarray): Times.
+        Sxx (numpy.ndarray): Power of each frequency (rows) and time (columns).
+        start_time (float): Ground truth start time of the event.
+        peaks (dict): Maximum power frequencies, from spectrogram_peaks.
+        index: Index of the event in the catalog.
+        output_image_path (str): Path of the image.
+    """
+    # Imported on first use, so that analysing a catalog without images (--no_plots) never loads matplotlib
+    import matplotlib
+    matplotlib.use('Agg')  # Render to files only, never through an interactive backend
+    import matplotlib.pyplot as plt
 
-pd.set_option('display.max_columns', None)
+    plt.figure(figsize=(10, 6))
+    plt.pcolormesh(t, f, 10 * np.log10(Sxx), shading='gouraud')
+    plt.ylabel('Frequency [Hz]')
+    plt.xlabel('Time [s]')
+    plt.title(f'Spectrogram of Seismic Event {index}')
+    plt.colorbar(label='Power/Frequency (dB/Hz)')
 
-# Load the catalog
-loaded_cat = pd.read_hdf(r'D:\nasa_hackaton\data\processed_data\lunar_training.h5', key='catalog_data')
+    # Add a vertical red line where the true signal starts (using time_rel value)
+    plt.axvline(x=start_time, color='red', linestyle='--', linewidth=2, label="Signal Start")
 
-# Directory to save spectrograms
-saved_dir = 'output_spectrogram'  # Update with the directory where you want to save the spectrograms
-os.makedirs(saved_dir, exist_ok=True)
+    # Plot a vertical bar at the maximum frequency at the start time
+    max_frequency = peaks['max_frequency']
+    plt.scatter(start_time, max_frequency, color='blue', marker='o', s=100,
+                label=f"Max Frequency at Start Time: {max_frequency:.2f} Hz")
+    plt.axhline(y=max_frequency, color='blue', linestyle='--', linewidth=2)
 
-# Loop through the catalog to create and save spectrograms for each event
-for index, row in loaded_cat.iterrows():
-    event_time = row['np_time_rel(sec)']
-    event_velocity = row['np_velocity(m/s)']
-    event_start_time = row['time_rel(sec)']  # Extract the start time from time_rel column
+    # Plot a marker and horizontal line for the maximum frequency over the entire time
+    global_max_frequency = peaks['global_max_frequency']
+    plt.scatter(peaks['global_max_time'], global_max_frequency, color='green', marker='x', s=100,
+                label=f"Global Max Frequency: {global_max_frequency:.2f} Hz")
+    plt.axhline(y=global_max_frequency, color='green', linestyle='--', linewidth=2)
 
-    # Convert lists to numpy arrays
-    time_array = np.array(event_time)
-    velocity_array = np.array(event_velocity)
+    # Add a legend with the frequencies labeled
+    plt.legend(loc='upper left')
+    plt.savefig(output_image_path)
+    plt.close()
+
+
+def process_event(task):
+    """
+    Compute (or load from the cache) the spectrogram of an event, find its peaks and plot it.
+
+    Args:
+        task (tuple): Index, row of the catalog, image directory (None for no image) and cache directory
+            (None for no cache).
+
+    Returns:
+        tuple: Index, and either the peaks of the event (dict) or an error message (str).
+    """
+    index, row, saved_dir, cache_dir = task
+    time_array = np.asarray(row['np_time_rel(sec)'])
+    velocity_array = np.asarray(row['np_velocity(m/s)'])
+    start_time = row['time_rel(sec)']
 
     # Check if both arrays are not empty and have at least two points for computing the sampling frequency
-    if len(time_array) > 1 and len(velocity_array) > 1:
-        if len(time_array) == len(velocity_array):
-            # Create the spectrogram
-            try:
-                f, t, Sxx = spectrogram(velocity_array,
-                                        fs=1 / (time_array[1] - time_array[0]))  # fs is the sampling frequency
-
-                # Plot and save the spectrogram
-                plt.figure(figsize=(10, 6))
-                plt.pcolormesh(t, f, 10 * np.log10(Sxx), shading='gouraud')
-                plt.ylabel('Frequency [Hz]')
-                plt.xlabel('Time [s]')
-                plt.title(f'Spectrogram of Seismic Event {index}')
-                plt.colorbar(label='Power/Frequency (dB/Hz)')
-
-                # Add a vertical red line where the true signal starts (using time_rel value)
-                plt.axvline(x=event_start_time, color='red', linestyle='--', linewidth=2, label="Signal Start")
-
-                # Find the index in the `t` array that corresponds to the event_start_time
-                start_time_index = np.argmin(np.abs(t - event_start_time))
-
-                # Find the frequency with the maximum power at the start time index
-                max_freq_index = np.argmax(Sxx[:, start_time_index])
-                max_frequency = f[max_freq_index]
-                print(f"Max frequency at start time: {max_frequency} Hz")
-
-                # Plot a vertical bar at the maximum frequency at the start time
-                plt.scatter(event_start_time, max_frequency, color='blue', marker='o', s=100,
-                            label=f"Max Frequency at Start Time: {max_frequency:.2f} Hz")
-                plt.axhline(y=max_frequency, color='blue', linestyle='--', linewidth=2)
-
-                # Find the maximum energy (power) across the entire time and frequency
-                max_energy = 0
-                max_freq_idx = 0
-                max_time_idx = 0
-                for freq_idx, freq in enumerate(Sxx):
-                    for time_idx, energy in enumerate(freq):
-                        if energy > max_energy:
-                            max_energy = energy
-                            max_freq_idx = freq_idx
-                            max_time_idx = time_idx
-
-                # Find the corresponding time and frequency of the maximum power
-                global_max_time = t[max_time_idx]
-                global_max_frequency = f[max_freq_idx]
-                print(f"Max frequency over entire event: {global_max_frequency} Hz at time {global_max_time} s")
-
-                # Plot a marker and horizontal line for the maximum frequency over the entire time
-                plt.scatter(global_max_time, global_max_frequency, color='green', marker='x', s=100,
-                            label=f"Global Max Frequency: {global_max_frequency:.2f} Hz")
-                plt.axhline(y=global_max_frequency, color='green', linestyle='--', linewidth=2)
-
-                # Add a legend with the frequencies labeled
-                plt.legend(loc='upper left')
-
-                # Save the spectrogram using the filename in the file name
-                plt.savefig(f"{saved_dir}/spectrogram_event_{index}.png")
-                plt.close()
-            except Exception as e:
-                print(f"Error creating spectrogram for event {index}: {e}")
+    if len(time_array) <= 1 or len(velocity_array) <= 1:
+        return index, f"Error: Insufficient data for event {index}. Time or velocity array is too short."
+    if len(time_array) != len(velocity_array):
+        return index, f"Error: Time and velocity arrays for event {index} are not the same length."
+
+    try:
+        fs = 1 / (time_array[1] - time_array[0])
+        cache = SpectrogramCache(cache_dir) if cache_dir else None
+        key = cache.key(velocity_array, fs) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            f, t, Sxx = cached
         else:
-            print(f"Error: Time and velocity arrays for event {index} are not the same length.")
-    else:
-        print(f"Error: Insufficient data for event {index}. Time or velocity array is too short.")
+            f, t, Sxx = spectrogram(velocity_array, fs=fs)
+            if cache:
+                cache.put(key, f, t, Sxx)
+
+        peaks = spectrogram_peaks(f, t, Sxx, start_time)
+        if saved_dir is not None:
+            plot_spectrogram(f, t, Sxx, start_time, peaks, index,
+                             os.path.join(saved_dir, f'spectrogram_event_{index}.png'))
+        return index, {'cached': cached is not None, **peaks}
+    except Exception as e:
+        return index, f"Error creating spectrogram for event {index}: {e}"
+
+
+def create_spectrograms(data, saved_dir, cache_dir=None, workers=1, plot=True):
+    """
+    Create the spectrograms of every event of a catalog.
+
+    Args:
+        data: Catalog with an iterrows() method, e.g. from open_catalog.
+        saved_dir (str): Directory of the images and of the peaks table.
+        cache_dir (str or None): Directory of the spectrogram cache, None to always compute spectrograms.
+        workers (int): Number of processes computing spectrograms in parallel (1 is serial).
+        plot (bool): Save an image of each spectrogram.
+
+    Returns:
+        pandas.DataFrame: Peaks of each event with a spectrogram, indexed by event.
+    """
+    os.makedirs(saved_dir, exist_ok=True)
+    tasks = ((index, row, saved_dir if plot else None, cache_dir) for index, row in data.iterrows())
+
+    def results():
+        if workers <= 1:
+            yield from map(process_event, tasks)
+            return
+        # Keep a bounded number of events in flight so that rows are not all pickled up front
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque()
+            for task in tasks:
+                in_flight.append(executor.submit(process_event, task))
+                if len(in_flight) >= workers * 4:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    rows = {}
+    for index, result in results():
+        if isinstance(result, str):
+            print(result)
+            continue
+        print(f"Max frequency at start time: {result['max_frequency']} Hz")
+        print(f"Max frequency over entire event: {result['global_max_frequency']} Hz "
+              f"at time {result['global_max_time']} s")
+        rows[index] = result
+
+    peaks = pd.DataFrame.from_dict(rows, orient='index',
+                                   columns=['cached', 'max_frequency', 'global_max_time', 'global_max_frequency'])
+    peaks.to_csv(os.path.join(saved_dir, 'spectrogram_peaks.csv'), index_label='event')
+    return peaks
+
+
+def parse_args():
+    # Set up argument parser to get command-line arguments
+    parser = argparse.ArgumentParser(description="Create the spectrograms of the events of a catalog.")
+
+    # Argument for the path to the *.h5 input file
+    parser.add_argument(
+        '--input_file',
+        type=str,
+        required=True,
+        help='Path to the training HDF5 file (*.h5) or ragged catalog directory'
+    )
+
+    # Argument for the folder where the spectrograms will be saved
+    parser.add_argument(
+        '--output_dir',
+        type=str,
+        default='output_spectrogram',
+        help='Folder to save the spectrogram images and peaks table (default is output_spectrogram)'
+    )
+
+    # Optional arguments to configure the spectrogram cache
+    parser.add_argument(
+        '--cache_dir',
+        type=str,
+        default='.spectrogram_cache',
+        help='Directory of the memory-mapped spectrogram cache (default is .spectrogram_cache).'
+    )
+    parser.add_argument(
+        '--no_cache',
+        action='store_true',
+        help='Compute every spectrogram instead of loading unchanged ones from the cache.'
+    )
+
+    # Optional argument to compute spectrograms in a process pool
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of processes computing spectrograms in parallel (default is 1, serial).'
+    )
+
+    # Optional argument to only compute the peaks table
+    parser.add_argument(
+        '--no_plots',
+        action='store_true',
+        help='Skip the images and only save the peaks table.'
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    peaks = create_spectrograms(open_catalog(args.input_file), args.output_dir,
+                                None if args.no_cache else args.cache_dir, args.workers, not args.no_plots)
+    print(f"Spectrograms of {len(peaks)} events ({int(peaks['cached'].sum())} from the cache) "
+          f"saved to {args.output_dir}")
+
+
+# Entry point for the script
+if __name__ == "__main__":
+    main()
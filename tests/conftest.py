@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the repository modules importable when running from the tests folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+import asyncio
+import numpy as np
+import pytest
+from DetectionService import DetectionService, MicroBatcher
+
+FS = 6.625
+NUM_SAMPLES = 4096
+
+
+async def submit_all(batcher, key, items):
+    # Submit every item at once so that they share a batch
+    return await asyncio.gather(*(batcher.submit(key, item) for item in items), return_exceptions=True)
+
+
+def test_failing_item_fails_only_its_request():
+    def run_batch(key, items):
+        return [ValueError(f"bad item {item}") if item == 3 else item * 10 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(run_batch, max_batch_size=8, max_delay=0.05)
+        try:
+            return await submit_all(batcher, 'key', list(range(8))), batcher.num_batches
+        finally:
+            batcher.close()
+
+    results, num_batches = asyncio.run(run())
+    assert num_batches == 1
+    assert isinstance(results[3], ValueError)
+    for item, result in enumerate(results):
+        if item != 3:
+            assert result[:2] == (item * 10, 8)
+
+
+def test_nan_trace_does_not_fail_other_requests(monkeypatch):
+    service = DetectionService(max_batch_size=8, max_delay=0.05)
+    detector = service.detectors['lunar']
+
+    # Make the batched and the single-trace paths raise on a trace with a NaN, as a broken detector would
+    detect_onsets, detect_onset = detector.detect_onsets, detector.detect_onset
+
+    def failing_detect_onsets(traces, fs):
+        if np.isnan(traces).any():
+            raise IndexError("index 0 is out of bounds")
+        return detect_onsets(traces, fs)
+
+    def failing_detect_onset(trace, fs):
+        if np.isnan(trace).any():
+            raise IndexError("index 0 is out of bounds")
+        return detect_onset(trace, fs)
+
+    monkeypatch.setattr(detector, 'detect_onsets', failing_detect_onsets)
+    monkeypatch.setattr(detector, 'detect_onset', failing_detect_onset)
+
+    rng = np.random.default_rng(0)
+    traces = [rng.normal(size=NUM_SAMPLES) * 1e-9 for _ in range(8)]
+    traces[5][100] = np.nan
+    query = {'landscape': ['lunar'], 'fs': [str(FS)]}
+
+    async def run():
+        try:
+            return await asyncio.gather(*(service.detect(query, trace.astype('<f8').tobytes()) for trace in traces),
+                                        return_exceptions=True)
+        finally:
+            service.batcher.close()
+
+    responses = asyncio.run(run())
+    assert isinstance(responses[5], IndexError)
+    for i, response in enumerate(responses):
+        if i != 5:
+            assert response['batch_size'] == 8
+            assert response['onset_time'] == pytest.approx(detect_onset(traces[i], FS))
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dataset_creation'))
+import ingest
+from RaggedCatalog import RaggedCatalog
+
+
+def write_source(folder, name, value, num_samples=50):
+    """
+    Write an event CSV file whose velocity samples all equal `value`.
+
+    Args:
+        folder (str): Directory of the file.
+        name (str): File name.
+        value (float): Velocity of every sample.
+        num_samples (int): Number of samples.
+    """
+    times = np.arange(num_samples) / 6.625
+    pd.DataFrame({'time_rel(sec)': times, 'velocity(m/s)': np.full(num_samples, value)}).to_csv(
+        os.path.join(folder, name), index=False)
+
+
+def catalog_values(path):
+    # Velocity of each event of the catalog, keyed by its file name
+    catalog = RaggedCatalog(path)
+    return {row['filename']: float(np.unique(row['velocity(m/s)'])[0]) for _, row in catalog.iterrows()}
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt(*args, **kwargs):
+    raise Interrupted()
+
+
+@pytest.mark.parametrize('target, name', [
+    (ingest, 'print'),  # after the catalog is closed, before the manifest is written
+    (ingest.json, 'dump'),  # while the manifest is written
+])
+def test_interrupted_update_is_redone_from_scratch(tmp_path, monkeypatch, target, name):
+    sources, output = str(tmp_path / 'csv'), str(tmp_path / 'catalog')
+    os.makedirs(sources)
+    write_source(sources, 'b.csv', 2.0)
+    write_source(sources, 'c.csv', 3.0)
+    ingest.ingest_folder('lunar', sources, output)
+
+    # Adding a.csv shifts the positions of b.csv and c.csv in the catalog
+    write_source(sources, 'a.csv', 1.0)
+    monkeypatch.setattr(target, name, interrupt, raising=False)
+    with pytest.raises(Interrupted):
+        ingest.ingest_folder('lunar', sources, output)
+    monkeypatch.undo()
+
+    ingest.ingest_folder('lunar', sources, output)
+    assert catalog_values(output) == {'a.csv': 1.0, 'b.csv': 2.0, 'c.csv': 3.0}
+
+
+def test_unreadable_manifest_forces_a_rebuild(tmp_path):
+    sources, output = str(tmp_path / 'csv'), str(tmp_path / 'catalog')
+    os.makedirs(sources)
+    write_source(sources, 'b.csv', 2.0)
+    write_source(sources, 'c.csv', 3.0)
+    ingest.ingest_folder('lunar', sources, output)
+    with open(os.path.join(output, ingest.MANIFEST_FILE), 'w') as f:
+        f.write('{"format_version": 1, "files": {"b.c')
+    assert ingest.load_manifest(output) is None
+
+    write_source(sources, 'a.csv', 1.0)
+    ingest.ingest_folder('lunar', sources, output)
+    assert catalog_values(output) == {'a.csv': 1.0, 'b.csv': 2.0, 'c.csv': 3.0}
+    with open(os.path.join(output, ingest.MANIFEST_FILE)) as f:
+        assert set(json.load(f)['files']) == {'a.csv', 'b.csv', 'c.csv'}
+
+
+def test_manifest_not_matching_the_catalog_is_ignored(tmp_path):
+    sources, output = str(tmp_path / 'csv'), str(tmp_path / 'catalog')
+    os.makedirs(sources)
+    write_source(sources, 'b.csv', 2.0)
+    ingest.ingest_folder('lunar', sources, output)
+    manifest_path = os.path.join(output, ingest.MANIFEST_FILE)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['files']['b.csv']['position'] = 5
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+    assert ingest.load_manifest(output) is None
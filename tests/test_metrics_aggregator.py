@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from MetricsAggregator import MetricsAggregator
+
+
+def shard_results(prefix, num_events, offset):
+    """
+    Results of a shard whose events encode their position: the ground truth is the position and the
+    prediction is `offset` seconds late.
+
+    Args:
+        prefix (str): Prefix of the file names of the shard.
+        num_events (int): Number of events.
+        offset (float): Deviation of every prediction.
+
+    Returns:
+        pandas.DataFrame: The results.
+    """
+    position = np.arange(num_events, dtype=np.float64)
+    return pd.DataFrame({
+        'filename': [f'{prefix}_{i:05d}' for i in range(num_events)],
+        'onset_time_ground_truth': position,
+        'audio_duration': np.full(num_events, 10000.0),
+        'onset_time_predicted': position + offset
+    })
+
+
+def sampled_positions(aggregator, offset):
+    # The deviation tells the shard of a sampled event and its truth percentage tells its position
+    rows = aggregator.sample[np.isclose(aggregator.sample[:, 0], offset)]
+    return set(np.rint((100 - rows[:, 2]) * 100).astype(int))
+
+
+def test_merged_sample_keeps_different_positions_of_each_shard():
+    first, second = MetricsAggregator(reservoir_size=100), MetricsAggregator(reservoir_size=100)
+    first.update(shard_results('a', 1000, 1.0))
+    second.update(shard_results('b', 1000, 2.0))
+    first.merge(second)
+
+    from_first, from_second = sampled_positions(first, 1.0), sampled_positions(first, 2.0)
+    assert len(from_first) + len(from_second) == 100
+    assert len(from_first) > 0 and len(from_second) > 0
+    assert from_first != from_second
+
+
+def test_merged_sample_equals_the_sample_of_the_whole_catalog():
+    shards = [shard_results('a', 1000, 1.0), shard_results('b', 1000, 2.0)]
+    merged = MetricsAggregator(reservoir_size=100)
+    for shard in shards:
+        aggregator = MetricsAggregator(reservoir_size=100)
+        aggregator.update(shard)
+        merged.merge(aggregator)
+    whole = MetricsAggregator(reservoir_size=100)
+    whole.update(pd.concat(shards, ignore_index=True))
+
+    assert np.array_equal(np.sort(merged.sample_keys), np.sort(whole.sample_keys))
+
+
+def test_keys_without_file_names_depend_on_the_event():
+    first, second = MetricsAggregator(reservoir_size=100), MetricsAggregator(reservoir_size=100)
+    first.update(shard_results('a', 1000, 1.0).drop(columns='filename'))
+    second.update(shard_results('b', 1000, 2.0).drop(columns='filename'))
+    first.merge(second)
+
+    assert sampled_positions(first, 1.0) != sampled_positions(first, 2.0)
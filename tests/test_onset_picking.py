@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from SpectralFluxMethod import SpectralFlux
+
+FS = 6.625
+HEIGHT_FACTOR = 0.3
+MIN_TIME_BETWEEN_PEAKS = 0.1
+
+
+def pick_both(flux):
+    # Onset time from pick_onset and from the frame found by first_peak_above_height
+    time_vals = np.arange(len(flux)) / FS
+    expected = SpectralFlux.pick_onset(flux, time_vals, FS, HEIGHT_FACTOR, MIN_TIME_BETWEEN_PEAKS)
+    frame = SpectralFlux.first_peak_above_height(flux, FS, HEIGHT_FACTOR, MIN_TIME_BETWEEN_PEAKS)
+    return expected, None if frame is None else time_vals[frame]
+
+
+@pytest.mark.parametrize('flux', [
+    np.full(100, np.nan),
+    np.zeros(100),
+    np.array([1.0]),
+    np.concatenate((np.ones(10), [np.nan], np.ones(10))),
+    np.abs(np.random.default_rng(0).normal(size=1000)),
+], ids=['all_nan', 'all_zero', 'single_frame', 'one_nan', 'noise'])
+def test_first_peak_above_height_matches_pick_onset(flux):
+    expected, found = pick_both(flux)
+    assert found == expected
+
+
+
+def test_trace_with_nan_has_no_onset_in_both_precisions():
+    trace = np.random.default_rng(0).normal(size=6000)
+    trace[100] = np.nan
+    for dtype in ('float64', 'float32'):
+        detector = SpectralFlux(None, None, 'lunar', dtype=dtype)
+        assert detector.detect_onset(trace, FS) is None
+        assert detector.detect_onsets(np.stack((trace, trace)), FS) == [None, None]
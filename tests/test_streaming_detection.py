@@ -0,0 +1,58 @@
+import numpy as np
+from StreamingDetection import StreamingOnsetDetector
+
+FS = 20.0
+CUTOFF = 2.19
+
+
+def synthetic_trace(duration, bump_time, bump_amplitude, onset_time, onset_amplitude, rng):
+    """
+    Noise with a short low-level bump and a decaying seismic arrival.
+
+    Args:
+        duration (float): Length of the trace in seconds.
+        bump_time (float): Start of the bump in seconds.
+        bump_amplitude (float): Amplitude of the bump.
+        onset_time (float): Start of the arrival in seconds.
+        onset_amplitude (float): Amplitude of the arrival.
+        rng (numpy.random.Generator): Random generator.
+
+    Returns:
+        numpy.ndarray: Velocity samples.
+    """
+    t = np.arange(int(duration * FS)) / FS
+    trace = rng.normal(0.0, 1e-9, len(t))
+    bump = (t >= bump_time) & (t < bump_time + 5.0)
+    trace[bump] += bump_amplitude * np.sin(2 * np.pi * 1.0 * t[bump])
+    arrival = t >= onset_time
+    trace[arrival] += (onset_amplitude * np.exp(-(t[arrival] - onset_time) / 200.0)
+                       * np.sin(2 * np.pi * 1.2 * t[arrival]))
+    return trace
+
+
+def replay(detector, trace, chunk_seconds=60.0):
+    chunk_size = int(chunk_seconds * FS)
+    onsets = []
+    for start in range(0, len(trace), chunk_size):
+        onsets.extend(detector.process(trace[start:start + chunk_size]))
+    return onsets + detector.flush()
+
+
+def test_early_bump_is_not_reported_before_the_arrival():
+    # The bump stands out of the noise but stays below trigger_ratio times its level
+    trace = synthetic_trace(3000.0, bump_time=300.0, bump_amplitude=6e-10, onset_time=1650.0,
+                            onset_amplitude=1e-7, rng=np.random.default_rng(0))
+    onsets = replay(StreamingOnsetDetector(FS, CUTOFF), trace)
+
+    assert len(onsets) > 0
+    assert abs(onsets[0]['onset_time'] - 1650.0) < 10.0
+
+
+def test_running_max_follows_the_smoothed_flux():
+    trace = synthetic_trace(600.0, bump_time=100.0, bump_amplitude=3e-9, onset_time=400.0,
+                            onset_amplitude=1e-7, rng=np.random.default_rng(1))
+    detector = StreamingOnsetDetector(FS, CUTOFF)
+    onsets = replay(detector, trace)
+
+    assert len(onsets) == 1
+    assert detector._running_max >= onsets[0]['flux'] > 0.0